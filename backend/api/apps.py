@@ -7,3 +7,6 @@ class ApiConfig(AppConfig):
     """Класс конфигурации приложения api."""
     name = 'api'
     default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,78 @@
+"""Асинхронные представления для запуска под ASGI.
+
+Django 3.2 не умеет обращаться к базе данных асинхронно, поэтому
+синхронные представления DRF выполняются в отдельном пуле потоков
+ограниченного размера: цикл событий не блокируется медленными
+запросами, а число одновременных подключений к базе данных не
+превышает размера пула.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from foodgram.middleware import (close_unusable_connections,
+                                 set_statement_timeout)
+
+from .views import (CustomUserViewSet, IngredientViewSet, RecipeViewSet,
+                    TagViewSet)
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_VIEWS_THREADS,
+    thread_name_prefix='async-views',
+)
+
+
+def run_in_pool(view, request, *args, **kwargs):
+    """Выполнение представления и отрисовка ответа в потоке пула.
+
+    У потока пула свои подключения к базе данных, поэтому проверка
+    подключений и ограничение времени запросов выполняются здесь, а не
+    в промежуточных слоях.
+    """
+    close_old_connections()
+    try:
+        if settings.DB_CONN_HEALTH_CHECKS:
+            close_unusable_connections()
+        if settings.DB_STATEMENT_TIMEOUT:
+            set_statement_timeout()
+        response = view(request, *args, **kwargs)
+        if hasattr(response, 'render') and callable(response.render):
+            response = response.render()
+        return response
+    finally:
+        close_old_connections()
+
+
+def async_view(view):
+    """Асинхронная обёртка над синхронным представлением."""
+    run = sync_to_async(run_in_pool, thread_sensitive=False, executor=executor)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run(view, request, *args, **kwargs)
+
+    wrapper.csrf_exempt = getattr(view, 'csrf_exempt', False)
+    return wrapper
+
+
+recipe_list = async_view(
+    RecipeViewSet.as_view({'get': 'list', 'post': 'create'})
+)
+recipe_detail = async_view(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+tag_list = async_view(TagViewSet.as_view({'get': 'list'}))
+tag_detail = async_view(TagViewSet.as_view({'get': 'retrieve'}))
+ingredient_list = async_view(IngredientViewSet.as_view({'get': 'list'}))
+ingredient_detail = async_view(
+    IngredientViewSet.as_view({'get': 'retrieve'})
+)
+subscriptions = async_view(
+    CustomUserViewSet.as_view({'get': 'subscriptions'})
+)
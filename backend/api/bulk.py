@@ -0,0 +1,142 @@
+"""Массовые операции с избранным и корзиной покупок."""
+
+from django.db import transaction
+from recipes.models import (FavoriteRecipe, Recipe, ShoppingCart,
+                            ShoppingListItem)
+from users.models import CustomUser
+
+from .cache import invalidate_user_ids
+from .utils import change_counter, raw_delete
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+MISSING = 'missing'
+NOT_FOUND = 'not_found'
+
+
+class RecipeCollection:
+    """Избранное или корзина пользователя как набор рецептов.
+
+    Операции над списком id выполняются фиксированным числом запросов
+    независимо от его длины. Сигналы моделей при этом не вызываются,
+    поэтому счётчики, кэш id и список покупок обновляются здесь же.
+    """
+
+    def __init__(self, model, field, relation, counter, shopping_list=False):
+        self.model = model
+        self.field = field
+        self.relation = relation
+        self.counter = counter
+        self.shopping_list = shopping_list
+
+    def filter(self, user, recipe_ids=None):
+        queryset = self.model.objects.filter(user=user)
+        if recipe_ids is not None:
+            queryset = queryset.filter(**{f'{self.field}__in': recipe_ids})
+        return queryset
+
+    def present(self, user, recipe_ids):
+        return set(
+            self.filter(user, recipe_ids).values_list(self.field, flat=True)
+        )
+
+    @staticmethod
+    def lock(user):
+        """Блокировка строки пользователя до конца транзакции.
+
+        Параллельные операции одного пользователя выполняются по очереди,
+        так что добавленные и удалённые рецепты известны точно.
+        """
+        list(CustomUser.objects.select_for_update().filter(
+            id=user.id
+        ).values_list('id', flat=True))
+
+    def changed(self, user, recipe_ids, sign):
+        """Учёт добавленных или удалённых рецептов."""
+        if not recipe_ids:
+            return
+        change_counter(
+            Recipe.objects.filter(id__in=recipe_ids), self.counter, sign
+        )
+        if self.shopping_list:
+            ShoppingListItem.objects.add_recipes(user, recipe_ids, sign)
+        invalidate_user_ids(user.id, self.relation)
+
+    @transaction.atomic
+    def add(self, user, recipe_ids):
+        """Добавление рецептов; возвращает результат для каждого id."""
+        self.lock(user)
+        found = set(Recipe.objects.filter(
+            id__in=recipe_ids
+        ).values_list('id', flat=True))
+        present = self.present(user, found)
+        added = found - present
+        self.model.objects.bulk_create(
+            [
+                self.model(user=user, **{self.field: recipe_id})
+                for recipe_id in added
+            ],
+            ignore_conflicts=True,
+        )
+        self.changed(user, added, 1)
+        return [
+            {
+                'id': recipe_id,
+                'status': (
+                    ADDED if recipe_id in added
+                    else EXISTS if recipe_id in present
+                    else NOT_FOUND
+                ),
+            }
+            for recipe_id in recipe_ids
+        ]
+
+    @transaction.atomic
+    def remove(self, user, recipe_ids):
+        """Удаление рецептов; возвращает результат для каждого id."""
+        self.lock(user)
+        removed = self.present(user, recipe_ids)
+        if removed:
+            raw_delete(self.filter(user, removed))
+        self.changed(user, removed, -1)
+        return [
+            {
+                'id': recipe_id,
+                'status': REMOVED if recipe_id in removed else MISSING,
+            }
+            for recipe_id in recipe_ids
+        ]
+
+    @transaction.atomic
+    def discard(self, user, recipe_id):
+        """Удаление одного рецепта; возвращает, был ли он в наборе."""
+        self.lock(user)
+        deleted = raw_delete(self.filter(user, (recipe_id,)))
+        self.changed(user, (recipe_id,) if deleted else (), -1)
+        return bool(deleted)
+
+    @transaction.atomic
+    def clear(self, user):
+        """Удаление всех рецептов; возвращает их количество."""
+        self.lock(user)
+        change_counter(
+            Recipe.objects.filter(id__in=self.filter(user).values(
+                self.field
+            )),
+            self.counter, -1,
+        )
+        deleted = raw_delete(self.filter(user))
+        if self.shopping_list:
+            raw_delete(ShoppingListItem.objects.filter(user=user))
+        if deleted:
+            invalidate_user_ids(user.id, self.relation)
+        return deleted
+
+
+FAVORITES = RecipeCollection(
+    FavoriteRecipe, 'favorite_recipe_id', 'favorites', 'favorites_count'
+)
+SHOPPING_CART = RecipeCollection(
+    ShoppingCart, 'recipe_id', 'cart', 'in_carts_count', shopping_list=True
+)
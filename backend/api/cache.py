@@ -0,0 +1,141 @@
+"""Версионированный кэш ответов API."""
+
+from time import time_ns
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from foodgram.routers import read_from_primary
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import Subscribe
+
+USER_ID_SETS = {
+    'favorites': (FavoriteRecipe, 'favorite_recipe_id'),
+    'cart': (ShoppingCart, 'recipe_id'),
+    'subscriptions': (Subscribe, 'author_id'),
+}
+RECIPE_USER_FIELDS = ('is_favorited', 'is_in_shopping_cart')
+CACHE_NAMES = ('recipe',)
+
+
+def version_key(name):
+    return f'version:{name}'
+
+
+def initial_version():
+    """Начальная версия по времени.
+
+    Если memcached вытеснит ключ версии, новая версия не совпадёт
+    со старыми и не откроет доступ к устаревшим записям.
+    """
+    return time_ns()
+
+
+def get_version(name):
+    """Текущая версия закэшированных данных."""
+    return cache.get_or_set(version_key(name), initial_version, None)
+
+
+def bump_version(name):
+    """Новая версия данных после фиксации транзакции."""
+    def bump():
+        cache.add(version_key(name), initial_version(), None)
+        cache.incr(version_key(name))
+    transaction.on_commit(bump)
+
+
+def count_cache_access(name, hit):
+    """Учёт попаданий и промахов кэша."""
+    key = f'stats:{name}:{"hits" if hit else "misses"}'
+    cache.add(key, 0, None)
+    cache.incr(key)
+
+
+def get_cache_stats(name):
+    """Количество попаданий и промахов кэша."""
+    return {
+        'hits': cache.get(f'stats:{name}:hits', 0),
+        'misses': cache.get(f'stats:{name}:misses', 0),
+    }
+
+
+def get_user_ids(user, relation):
+    """Закэшированные id избранного, корзины или подписок пользователя."""
+    key = f'user:{user.id}:{relation}'
+    ids = cache.get(key)
+    if ids is None:
+        model, field = USER_ID_SETS[relation]
+        with read_from_primary():
+            ids = frozenset(
+                model.objects.filter(user=user).values_list(field, flat=True)
+            )
+        cache.set(key, ids, settings.RECIPE_CACHE_TIMEOUT)
+    return ids
+
+
+def invalidate_user_ids(user_id, relation):
+    """Сброс закэшированных id после фиксации транзакции."""
+    transaction.on_commit(
+        lambda: cache.delete(f'user:{user_id}:{relation}')
+    )
+
+
+def recipe_body_key(recipe_id, author_id):
+    return ':'.join(str(part) for part in (
+        'recipe', recipe_id,
+        get_version(f'recipe:{recipe_id}'),
+        get_version(f'author:{author_id}'),
+        get_version('tags'),
+        get_version('ingredients'),
+    ))
+
+
+def get_recipe_detail(request, recipe_id, build):
+    """Рецепт из кэша, дополненный флагами текущего пользователя.
+
+    Общая для всех часть ответа кэшируется по id и версиям рецепта,
+    автора и справочников; ``build`` возвращает её при промахе и
+    читает с основной базы данных. Ключ считается до ``build``: если
+    данные изменятся во время сборки, ответ запишется под старыми
+    версиями и следующий запрос его не прочитает. Возвращает данные
+    и признак попадания в кэш.
+    """
+    author_id = cache.get(f'recipe:{recipe_id}:author')
+    data = None
+    if author_id is not None:
+        data = cache.get(recipe_body_key(recipe_id, author_id))
+    hit = data is not None
+    count_cache_access('recipe', hit)
+    if not hit:
+        with read_from_primary():
+            if author_id is None:
+                author_id = Recipe.objects.filter(pk=recipe_id).values_list(
+                    'author_id', flat=True
+                ).first()
+            key = recipe_body_key(recipe_id, author_id)
+            data = build()
+        if data['author']['id'] == author_id:
+            cache.set(
+                f'recipe:{recipe_id}:author', author_id,
+                settings.RECIPE_CACHE_TIMEOUT
+            )
+            cache.set(key, data, settings.RECIPE_CACHE_TIMEOUT)
+        else:
+            author_id = data['author']['id']
+            cache.delete(f'recipe:{recipe_id}:author')
+    data = dict(data, author=dict(data['author']))
+    user = request.user
+    if user.is_authenticated:
+        data['is_favorited'] = (
+            data['id'] in get_user_ids(user, 'favorites')
+        )
+        data['is_in_shopping_cart'] = (
+            data['id'] in get_user_ids(user, 'cart')
+        )
+        data['author']['is_subscribed'] = (
+            author_id in get_user_ids(user, 'subscriptions')
+        )
+    else:
+        data.update(dict.fromkeys(RECIPE_USER_FIELDS, False))
+        data['author']['is_subscribed'] = False
+    return data, hit
@@ -0,0 +1,133 @@
+"""Экспорт списка покупок в разных форматах."""
+
+import csv
+import json
+from io import BytesIO
+from pathlib import Path
+
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen.canvas import Canvas
+from rest_framework.renderers import BaseRenderer
+
+PDF_FONT = 'DejaVuSans'
+PDF_FONT_PATH = Path(__file__).resolve().parent / 'fonts' / 'DejaVuSans.ttf'
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    """Псевдобуфер, возвращающий записанную строку."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListExporter(BaseRenderer):
+    """Базовый экспортёр списка покупок.
+
+    Экспортёры подключаются к действию как рендереры, поэтому формат
+    выбирается стандартно: параметром ``?format=`` или заголовком Accept.
+    """
+    charset = 'utf-8'
+    filename = 'shopping_list'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        """Отрисовка служебных ответов, например ошибок."""
+        return json.dumps(data, ensure_ascii=False).encode(self.charset)
+
+    def get_filename(self):
+        """Имя скачиваемого файла."""
+        return f'{self.filename}.{self.format}'
+
+    def stream(self, items):
+        """Построчная выдача списка покупок."""
+        raise NotImplementedError
+
+
+class TextExporter(ShoppingListExporter):
+    """Экспорт в текстовый файл."""
+    media_type = 'text/plain'
+    format = 'txt'
+
+    def stream(self, items):
+        yield 'Список покупок:\n\n'
+        for item in items:
+            yield (f'{item["name"]} ({item["measurement_unit"]})'
+                   f' — {item["amount"]}\n')
+
+
+class CSVExporter(ShoppingListExporter):
+    """Экспорт в csv."""
+    media_type = 'text/csv'
+    format = 'csv'
+
+    def stream(self, items):
+        writer = csv.writer(Echo())
+        yield writer.writerow(('name', 'measurement_unit', 'amount'))
+        for item in items:
+            yield writer.writerow((
+                item['name'], item['measurement_unit'], item['amount']
+            ))
+
+
+class JSONExporter(ShoppingListExporter):
+    """Экспорт в json."""
+    media_type = 'application/json'
+    format = 'json'
+
+    def stream(self, items):
+        yield '['
+        separator = ''
+        for item in items:
+            yield separator + json.dumps(item, ensure_ascii=False)
+            separator = ', '
+        yield ']'
+
+
+class PDFExporter(ShoppingListExporter):
+    """Экспорт в pdf со встроенным шрифтом для кириллицы.
+
+    Строки читаются из базы по мере заполнения страниц, а готовый
+    документ отдаётся частями: reportlab собирает файл только целиком.
+    """
+    media_type = 'application/pdf'
+    format = 'pdf'
+    charset = None
+    font_size = 12
+    leading = 18
+    margin = 50
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return json.dumps(data, ensure_ascii=False).encode()
+
+    def stream(self, items):
+        if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+            pdfmetrics.registerFont(TTFont(PDF_FONT, PDF_FONT_PATH))
+        output = BytesIO()
+        canvas = Canvas(output, pagesize=A4, pageCompression=1)
+        canvas.setTitle('Список покупок')
+        width, height = A4
+        top = height - self.margin
+        canvas.setFont(PDF_FONT, self.font_size)
+        canvas.drawString(self.margin, top, 'Список покупок:')
+        y = top - 2 * self.leading
+        for item in items:
+            if y < self.margin:
+                canvas.showPage()
+                canvas.setFont(PDF_FONT, self.font_size)
+                y = top
+            canvas.drawString(
+                self.margin, y,
+                f'{item["name"]} ({item["measurement_unit"]})'
+                f' — {item["amount"]}'
+            )
+            y -= self.leading
+        canvas.save()
+        output.seek(0)
+        yield from iter(lambda: output.read(PDF_CHUNK_SIZE), b'')
+
+
+SHOPPING_LIST_EXPORTERS = (
+    TextExporter, CSVExporter, JSONExporter, PDFExporter
+)
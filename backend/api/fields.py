@@ -0,0 +1,134 @@
+"""Поля сериализаторов приложения api."""
+
+import binascii
+import imghdr
+import uuid
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import (InMemoryUploadedFile,
+                                            TemporaryUploadedFile,
+                                            UploadedFile)
+from drf_extra_fields.fields import Base64FieldMixin, Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+
+BASE64_CHUNK_SIZE = 64 * 1024
+BASE64_HEADER = ';base64,'
+
+
+class RecipeImageField(Base64ImageField):
+    """Изображение в base64 или файлом формы.
+
+    Base64 декодируется частями в файл: небольшие изображения остаются
+    в памяти, большие пишутся во временный файл на диске, как файлы
+    обычной загрузки. Размер файла и число пикселей проверяются до
+    декодирования изображения.
+    """
+
+    def to_internal_value(self, data):
+        if data in self.EMPTY_VALUES:
+            return None
+        if isinstance(data, str):
+            data = self.decode(data)
+        elif not isinstance(data, UploadedFile):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        self.check_size(data.size)
+        extension = self.check_image(data)
+        if isinstance(data, (InMemoryUploadedFile, TemporaryUploadedFile)):
+            data.name = f'{self.get_file_name(None)}.{extension}'
+        return super(Base64FieldMixin, self).to_internal_value(data)
+
+    @staticmethod
+    def check_size(size):
+        max_size = settings.IMAGE_MAX_UPLOAD_SIZE
+        if size > max_size:
+            raise serializers.ValidationError(
+                f'Размер изображения не должен превышать {max_size} байт'
+            )
+
+    def get_file_name(self, decoded_file):
+        return str(uuid.uuid4())
+
+    def decode(self, base64_data):
+        """Декодирование base64 по частям без копии всей строки.
+
+        Пробелы и переносы строк отбрасываются, а символы, не вошедшие
+        в группу из четырёх, переносятся в следующую часть.
+        """
+        start = base64_data.find(BASE64_HEADER)
+        start = 0 if start == -1 else start + len(BASE64_HEADER)
+        size = (len(base64_data) - start) * 3 // 4
+        self.check_size(size)
+        if size > settings.FILE_UPLOAD_MAX_MEMORY_SIZE:
+            upload = TemporaryUploadedFile('image', None, size, None)
+        else:
+            upload = InMemoryUploadedFile(
+                BytesIO(), None, 'image', None, size, None
+            )
+        leftover = ''
+        try:
+            for offset in range(start, len(base64_data), BASE64_CHUNK_SIZE):
+                chunk = leftover + ''.join(
+                    base64_data[offset:offset + BASE64_CHUNK_SIZE].split()
+                )
+                end = len(chunk) - len(chunk) % 4
+                upload.write(binascii.a2b_base64(chunk[:end]))
+                leftover = chunk[end:]
+            if leftover:
+                raise ValueError('Неполная группа base64')
+        except (binascii.Error, ValueError):
+            upload.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        upload.size = upload.tell()
+        upload.seek(0)
+        return upload
+
+    def check_image(self, upload):
+        """Формат изображения и проверка числа пикселей по заголовку."""
+        extension = imghdr.what(None, upload.read(32))
+        upload.seek(0)
+        try:
+            with Image.open(upload) as image:
+                width, height = image.size
+                extension = extension or image.format.lower()
+        except (OSError, Image.DecompressionBombError):
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        finally:
+            upload.seek(0)
+        extension = 'jpg' if extension == 'jpeg' else extension
+        if extension not in self.ALLOWED_TYPES:
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        if width * height > settings.IMAGE_MAX_PIXELS:
+            raise serializers.ValidationError(
+                'Изображение не должно содержать больше '
+                f'{settings.IMAGE_MAX_PIXELS} пикселей'
+            )
+        return extension
+
+
+class RecipeImageVariantField(serializers.ReadOnlyField):
+    """Ссылка на копию изображения рецепта.
+
+    Без явного ``size`` списки получают маленькую копию, а отдельный
+    рецепт — большую.
+    """
+
+    def __init__(self, size=None, **kwargs):
+        self.size = size
+        super().__init__(**kwargs)
+
+    def to_representation(self, recipe):
+        size = self.size
+        if size is None:
+            many = isinstance(self.parent.parent, serializers.ListSerializer)
+            size = 'small' if many else 'large'
+        name = recipe.get_image_name(size)
+        if not name:
+            return None
+        url = default_storage.url(name)
+        request = self.context.get('request')
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
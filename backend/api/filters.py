@@ -3,18 +3,23 @@
 from django.contrib.auth import get_user_model
 from django_filters.rest_framework import FilterSet, filters
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_ingredients, search_recipes
 
 User = get_user_model()
 
 
 class IngredientFilter(FilterSet):
     """Фильтр ингредиентов."""
-    name = filters.CharFilter(lookup_expr='istartswith')
+    name = filters.CharFilter(method='search_name')
 
     class Meta:
         model = Ingredient
         fields = ('name',)
 
+    def search_name(self, queryset, name, value):
+        """Поиск по началу названия, подстроке и с опечатками."""
+        return search_ingredients(queryset, value)
+
 
 class RecipesFilter(FilterSet):
     """Фильтр рецептов."""
@@ -29,6 +34,11 @@ class RecipesFilter(FilterSet):
     is_in_shopping_cart = filters.BooleanFilter(
         method='get_is_in_shopping_cart',
     )
+    search = filters.CharFilter(method='get_search')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', 'popular'), ('trending', 'trending')),
+        method='get_ordering',
+    )
 
     class Meta:
         model = Recipe
@@ -47,3 +57,18 @@ class RecipesFilter(FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(recipe_shopping_cart__user=user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск рецептов."""
+        return search_recipes(queryset, value)
+
+    def get_ordering(self, queryset, name, value):
+        """Сортировка по популярности или тренду из таблицы рейтингов.
+
+        Рейтинг создаётся вместе с рецептом, поэтому соединение
+        внутреннее, а порядок совпадает с индексом рейтингов.
+        """
+        field = 'popularity' if value == 'popular' else 'trending_score'
+        return queryset.filter(ranking__isnull=False).order_by(
+            f'-ranking__{field}', '-ranking__recipe_id'
+        )
@@ -0,0 +1,145 @@
+import json
+import statistics
+from concurrent.futures import ThreadPoolExecutor
+from time import perf_counter
+
+import requests
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+PATHS = (
+    '/api/recipes/',
+    '/api/recipes/?limit=6&page=2',
+    '/api/tags/',
+    '/api/ingredients/?name=сол',
+    '/api/users/subscriptions/',
+)
+
+
+class Command(BaseCommand):
+    """Нагрузочное сравнение запущенных серверов.
+
+    Каждый сервер в течение ``--duration`` секунд опрашивается
+    ``--concurrency`` клиентами без пауз между запросами. Например,
+    синхронный и асинхронный режимы сравниваются так::
+
+        GUNICORN_BIND=:8000 gunicorn --config gunicorn.conf.py
+        SERVER_MODE=asgi ASYNC_VIEWS=1 GUNICORN_BIND=:8001 \\
+            gunicorn --config gunicorn.conf.py
+        python manage.py load_test --token <токен> \\
+            --target wsgi=http://localhost:8000 \\
+            --target asgi=http://localhost:8001
+    """
+    help = 'Пропускная способность и p99 задержки запущенных серверов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--target',
+            action='append',
+            help='Сервер в виде имя=адрес, можно указать несколько раз',
+        )
+        parser.add_argument(
+            '--path',
+            action='append',
+            help='Путь запроса, можно указать несколько раз',
+        )
+        parser.add_argument('--concurrency', type=int, default=32)
+        parser.add_argument('--duration', type=float, default=30)
+        parser.add_argument('--warmup', type=float, default=3)
+        parser.add_argument('--token', help='Токен пользователя')
+        parser.add_argument('--output', help='Файл для результатов в JSON')
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        targets = self.parse_targets(
+            options['target'] or ['default=http://localhost:8000']
+        )
+        paths = options['path'] or PATHS
+        headers = {}
+        if options['token']:
+            headers['Authorization'] = f'Token {options["token"]}'
+        results = {}
+        for name, url in targets.items():
+            self.run(url, paths, headers, options, options['warmup'])
+            result = self.run(
+                url, paths, headers, options, options['duration']
+            )
+            results[name] = result
+            self.stdout.write(
+                f'{name:8} {result["rps"]:9.1f} запросов/с  '
+                f'median {result["median_ms"]:9.3f} мс  '
+                f'p99 {result["p99_ms"]:9.3f} мс  '
+                f'ошибок {result["errors"]}'
+            )
+        if options['output']:
+            report = {
+                'created': timezone.now().isoformat(),
+                'concurrency': options['concurrency'],
+                'duration': options['duration'],
+                'paths': list(paths),
+                'results': results,
+            }
+            with open(options['output'], 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+
+    @staticmethod
+    def parse_targets(values):
+        targets = {}
+        for value in values:
+            name, separator, url = value.partition('=')
+            if not separator or not url:
+                raise CommandError(f'Ожидается имя=адрес: {value}')
+            targets[name] = url.rstrip('/')
+        return targets
+
+    def run(self, url, paths, headers, options, duration):
+        """Опрос сервера в течение ``duration`` секунд."""
+        deadline = perf_counter() + duration
+        with ThreadPoolExecutor(options['concurrency']) as executor:
+            clients = [
+                executor.submit(
+                    self.client, url, paths, headers, deadline, number
+                )
+                for number in range(options['concurrency'])
+            ]
+            timings, errors = [], 0
+            for client in clients:
+                client_timings, client_errors = client.result()
+                timings.extend(client_timings)
+                errors += client_errors
+        return self.summarize(timings, errors, duration)
+
+    @staticmethod
+    def client(url, paths, headers, deadline, number):
+        """Запросы одного клиента по кругу с разных путей."""
+        timings, errors = [], 0
+        with requests.Session() as session:
+            session.headers.update(headers)
+            index = number
+            while perf_counter() < deadline:
+                path = paths[index % len(paths)]
+                index += 1
+                start = perf_counter()
+                try:
+                    response = session.get(url + path, timeout=30)
+                    failed = response.status_code >= 400
+                except requests.RequestException:
+                    failed = True
+                timings.append((perf_counter() - start) * 1000)
+                errors += failed
+        return timings, errors
+
+    @staticmethod
+    def summarize(timings, errors, duration):
+        if not timings:
+            raise CommandError('Сервер не ответил ни на один запрос')
+        timings.sort()
+        return {
+            'requests': len(timings),
+            'errors': errors,
+            'rps': round(len(timings) / duration, 1),
+            'median_ms': round(statistics.median(timings), 3),
+            'p99_ms': round(
+                timings[min(len(timings) - 1, int(len(timings) * 0.99))], 3
+            ),
+        }
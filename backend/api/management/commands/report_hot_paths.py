@@ -0,0 +1,77 @@
+import json
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SORT_KEYS = {
+    'p95': lambda row: row['p95'],
+    'queries': lambda row: row['queries'],
+}
+
+
+def percentile(values, share):
+    """Значение, которого не превышает заданная доля отсортированных."""
+    index = max(0, int(round(share * len(values))) - 1)
+    return values[min(index, len(values) - 1)]
+
+
+class Command(BaseCommand):
+    """Отчёт о самых медленных представлениях по логу метрик."""
+    help = 'Самые медленные представления по логу метрик'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=getattr(settings, 'LOGGING', {}).get(
+                'handlers', {}
+            ).get('metrics', {}).get('filename'),
+            help='Лог метрик, по умолчанию INSTRUMENTATION_LOG_FILE',
+        )
+        parser.add_argument('--top', type=int, default=10)
+        parser.add_argument(
+            '--sort', choices=tuple(SORT_KEYS), default='p95'
+        )
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        if not options['path']:
+            raise CommandError('Не указан лог метрик')
+        endpoints = defaultdict(lambda: {
+            'durations': [], 'queries': [], 'duplicates': 0,
+        })
+        try:
+            with open(options['path'], encoding='utf-8') as log:
+                for line in log:
+                    try:
+                        entry = json.loads(line[line.index('{'):])
+                    except ValueError:
+                        continue
+                    endpoint = endpoints[entry['method'], entry['view']]
+                    endpoint['durations'].append(entry['duration_ms'])
+                    endpoint['queries'].append(entry['queries'])
+                    endpoint['duplicates'] += bool(entry['duplicates'])
+        except OSError as error:
+            raise CommandError(f'Не удалось прочитать лог: {error}')
+        rows = []
+        for (method, view), endpoint in endpoints.items():
+            durations = sorted(endpoint['durations'])
+            rows.append({
+                'endpoint': f'{method} {view}',
+                'requests': len(durations),
+                'p50': percentile(durations, 0.5),
+                'p95': percentile(durations, 0.95),
+                'queries': max(endpoint['queries']),
+                'duplicates': endpoint['duplicates'],
+            })
+        rows.sort(key=SORT_KEYS[options['sort']], reverse=True)
+        self.stdout.write(
+            f'{"Представление":50} {"Запросов":>9} {"p50, мс":>9} '
+            f'{"p95, мс":>9} {"SQL max":>8} {"N+1":>5}'
+        )
+        for row in rows[:options['top']]:
+            self.stdout.write(
+                f'{row["endpoint"]:50} {row["requests"]:>9} '
+                f'{row["p50"]:>9.1f} {row["p95"]:>9.1f} '
+                f'{row["queries"]:>8} {row["duplicates"]:>5}'
+            )
@@ -1,10 +1,76 @@
 """Кастомные вьюсеты для приложения api."""
 
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags, quote_etag
+from foodgram.routers import read_from_replica
 from rest_framework import mixins, viewsets
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+from .reference import get_reference_data
 
 
 class CreateDestroyViewSet(mixins.CreateModelMixin,
                            mixins.DestroyModelMixin,
                            viewsets.GenericViewSet):
     """Вьюсет для создания и удаления."""
-    pass
+
+    @staticmethod
+    def save_unique(serializer, message, **kwargs):
+        """Сохранение, повтор которого отклоняет ограничение уникальности.
+
+        Проверка и вставка выполняются одним запросом, поэтому
+        параллельный повтор получает ошибку 400, а не IntegrityError.
+        """
+        try:
+            with transaction.atomic():
+                return serializer.save(**kwargs)
+        except IntegrityError:
+            raise ValidationError({'errors': message})
+
+
+class ReferenceDataMixin:
+    """Отдача полного списка справочных данных из кэша.
+
+    Запросы с параметрами фильтрации обрабатываются как обычно.
+    """
+    reference_dataset = None
+
+    def list(self, request, *args, **kwargs):
+        if request.query_params:
+            return super().list(request, *args, **kwargs)
+        version, content = get_reference_data(self.reference_dataset)
+        etag = quote_etag(f'{self.reference_dataset}-{version}')
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            response = HttpResponseNotModified()
+        else:
+            response = HttpResponse(content, content_type='application/json')
+        response['ETag'] = etag
+        patch_cache_control(
+            response, public=True, max_age=settings.REFERENCE_DATA_MAX_AGE
+        )
+        return response
+
+
+class ReplicaReadMixin:
+    """Чтение безопасных запросов с реплики базы данных.
+
+    Данные, которые кладутся в общий кэш, всё равно читаются с основной
+    базы через ``read_from_primary``.
+    """
+    _replica_token = None
+
+    def initial(self, request, *args, **kwargs):
+        self._replica_token = read_from_replica.set(
+            request.method in SAFE_METHODS
+        )
+        super().initial(request, *args, **kwargs)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        if self._replica_token is not None:
+            read_from_replica.reset(self._replica_token)
+            self._replica_token = None
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -1,9 +1,215 @@
 """Кастомная пагинация для приложения api."""
 
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as BinasciiError
+from collections import OrderedDict
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet
+from django.db.models import Q
+from recipes.models import FeedItem
+from rest_framework.exceptions import NotFound, ValidationError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     """Пагинатор, позволяющий пользователю устанавливать
-     размер страницы для каждого запроса."""
+     размер страницы для каждого запроса.
+
+    Если вьюсет задаёт ``keyset_ordering``, а в запросе передан параметр
+    ``cursor`` (для первой страницы пустой), страницы выбираются по
+    ключу сортировки вместо OFFSET. Формат ответа при этом не меняется.
+    Запрос с другой сортировкой, например по рейтингу или релевантности
+    поиска, листается по номерам страниц. Вьюсет с ``keyset_only``
+    листается только по курсору и другую сортировку не принимает.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    invalid_ordering_message = 'Сортировка не поддерживается.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset_ordering = getattr(view, 'keyset_ordering', None)
+        keyset_only = getattr(view, 'keyset_only', False)
+        if (self.keyset_ordering is not None
+                and not self.has_keyset_ordering(queryset)):
+            if keyset_only:
+                raise ValidationError(self.invalid_ordering_message)
+            self.keyset_ordering = None
+        if (self.keyset_ordering is None
+                or (self.cursor_query_param not in request.query_params
+                    and not keyset_only)):
+            self.keyset_ordering = None
+            return super().paginate_queryset(queryset, request, view)
+        return self.paginate_keyset(queryset, request)
+
+    def has_keyset_ordering(self, queryset):
+        """Сортирован ли queryset по умолчанию или по ключу пагинации."""
+        ordering = tuple(queryset.query.order_by)
+        return not ordering or ordering == tuple(self.keyset_ordering)
+
+    def get_paginated_response(self, data):
+        if self.keyset_ordering is None:
+            return super().get_paginated_response(data)
+        return Response(OrderedDict([
+            ('count', self.count),
+            ('next', self.next_link),
+            ('previous', self.previous_link),
+            ('results', data),
+        ]))
+
+    def paginate_keyset(self, queryset, request):
+        """Страница после (или до) позиции из курсора."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        self.count = self.get_cached_count(queryset)
+        position, reverse = self.decode_cursor(
+            request.query_params.get(self.cursor_query_param)
+        )
+        ordering = self.keyset_ordering
+        if reverse:
+            ordering = tuple(
+                field[1:] if field.startswith('-') else f'-{field}'
+                for field in ordering
+            )
+        page = self.get_keyset_page(
+            queryset, ordering, position, page_size + 1
+        )
+        has_more = len(page) > page_size
+        page = page[:page_size]
+        if reverse:
+            page.reverse()
+        has_next = True if reverse else has_more
+        has_previous = has_more if reverse else position is not None
+        self.next_link = (
+            self.encode_cursor(page[-1], reverse=False)
+            if page and has_next else None
+        )
+        self.previous_link = (
+            self.encode_cursor(page[0], reverse=True)
+            if page and has_previous else None
+        )
+        return page
+
+    def get_keyset_page(self, queryset, ordering, position, limit):
+        """Первые ``limit`` объектов после позиции в заданном порядке."""
+        queryset = queryset.order_by(*ordering)
+        if position is not None:
+            queryset = queryset.filter(self.keyset_filter(ordering, position))
+        return list(queryset[:limit])
+
+    @staticmethod
+    def keyset_filter(ordering, position):
+        """Условие «строго после позиции» для составного ключа.
+
+        Нестрогое сравнение по первому полю дублирует условие, чтобы база
+        начинала просмотр индекса сразу с позиции.
+        """
+        condition = Q()
+        equal = {}
+        for field, value in zip(ordering, position):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            condition |= Q(**equal, **{f'{name}__{lookup}': value})
+            equal[name] = value
+        first = ordering[0].lstrip('-')
+        lookup = 'lte' if ordering[0].startswith('-') else 'gte'
+        return Q(**{f'{first}__{lookup}': position[0]}) & condition
+
+    def encode_cursor(self, obj, reverse):
+        """Ссылка на страницу с позицией объекта в курсоре."""
+        position = [
+            getattr(obj, field.lstrip('-')) for field in self.keyset_ordering
+        ]
+        cursor = urlsafe_b64encode(
+            json.dumps([position, reverse], default=str).encode()
+        ).decode()
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, cursor):
+        """Позиция и направление из курсора."""
+        if not cursor:
+            return None, False
+        try:
+            position, reverse = json.loads(urlsafe_b64decode(cursor.encode()))
+            if len(position) != len(self.keyset_ordering):
+                raise ValueError
+        except (BinasciiError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        return position, bool(reverse)
+
+    @staticmethod
+    def get_cached_count(queryset):
+        """Количество объектов, закэшированное на короткое время."""
+        try:
+            sql, params = queryset.query.sql_with_params()
+        except EmptyResultSet:
+            return 0
+        key = 'pagination-count:' + md5(
+            f'{sql}:{params}'.encode()
+        ).hexdigest()
+        count = cache.get(key)
+        if count is None:
+            count = queryset.count()
+            cache.set(key, count, settings.PAGINATION_COUNT_CACHE_TIMEOUT)
+        return count
+
+
+class FeedPagination(CustomPageNumberPagination):
+    """Пагинация ленты подписок по курсору.
+
+    Записи ленты листаются по индексу ``(user, -pub_date, -recipe)``,
+    рецепты авторов без раскладки — по индексу рецептов автора. Страница
+    собирается слиянием двух выборок, каждая из которых ограничена
+    размером страницы.
+    """
+    feed_fields = {'pub_date': 'pub_date', 'id': 'recipe_id'}
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.user = request.user
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_cached_count(self, queryset):
+        return super().get_cached_count(
+            FeedItem.objects.recipes(self.user, queryset)
+        )
+
+    def get_keyset_page(self, queryset, ordering, position, limit):
+        feed_ordering = tuple(
+            ('-' if field.startswith('-') else '')
+            + self.feed_fields[field.lstrip('-')]
+            for field in ordering
+        )
+        items = super().get_keyset_page(
+            FeedItem.objects.filter(
+                user=self.user, recipe__in=queryset.values('pk')
+            ).only('recipe_id', 'pub_date'),
+            feed_ordering, position, limit,
+        )
+        recipes = {
+            recipe.pk: recipe
+            for recipe in queryset.filter(
+                pk__in=[item.recipe_id for item in items]
+            )
+        }
+        recipes.update(
+            (recipe.pk, recipe) for recipe in super().get_keyset_page(
+                queryset.filter(
+                    author__in=FeedItem.objects.pulled_authors(self.user)
+                ),
+                ordering, position, limit,
+            )
+        )
+        return sorted(
+            recipes.values(),
+            key=lambda recipe: (recipe.pub_date, recipe.pk),
+            reverse=ordering[0].startswith('-'),
+        )[:limit]
@@ -0,0 +1,60 @@
+"""Парсеры запросов приложения api."""
+
+import json
+
+from django.conf import settings
+from django.utils.datastructures import MultiValueDict
+from rest_framework import status
+from rest_framework.exceptions import APIException, ParseError
+from rest_framework.parsers import DataAndFiles, JSONParser, MultiPartParser
+
+
+class RequestTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = 'Слишком большой запрос.'
+    default_code = 'request_too_large'
+
+
+class RequestSizeLimitMixin:
+    """Отказ в разборе запроса, заявленный размер которого больше
+    ``RECIPE_MAX_REQUEST_SIZE``, до чтения тела запроса."""
+
+    def check_request_size(self, parser_context):
+        request = (parser_context or {}).get('request')
+        if request is None:
+            return
+        try:
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            length = 0
+        if length > settings.RECIPE_MAX_REQUEST_SIZE:
+            raise RequestTooLarge()
+
+
+class RecipeJSONParser(RequestSizeLimitMixin, JSONParser):
+    """JSON с ограничением размера запроса."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        self.check_request_size(parser_context)
+        return super().parse(stream, media_type, parser_context)
+
+
+class RecipeMultiPartParser(RequestSizeLimitMixin, MultiPartParser):
+    """Форма с рецептом в поле ``data`` в виде JSON и изображением
+    в поле ``image`` в виде файла.
+
+    Файл изображения сохраняется обработчиками загрузки Django и не
+    читается в память целиком.
+    """
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        self.check_request_size(parser_context)
+        parsed = super().parse(stream, media_type, parser_context)
+        try:
+            data = json.loads(parsed.data.get('data') or '{}')
+        except ValueError as exc:
+            raise ParseError(f'Ошибка разбора JSON: {exc}')
+        if not isinstance(data, dict):
+            raise ParseError('Поле data должно содержать объект')
+        data.update(parsed.files.dict())
+        return DataAndFiles(data, MultiValueDict())
@@ -0,0 +1,29 @@
+"""Кэш справочных данных: тегов и ингредиентов."""
+
+from django.conf import settings
+from django.core.cache import cache
+from foodgram.routers import read_from_primary
+from recipes.models import Ingredient, Tag
+from rest_framework.renderers import JSONRenderer
+
+from .cache import get_version
+from .serializers import IngredientSerializer, TagSerializer
+
+REFERENCE_DATASETS = {
+    'tags': (Tag, TagSerializer),
+    'ingredients': (Ingredient, IngredientSerializer),
+}
+
+
+def get_reference_data(dataset):
+    """Версия и готовый JSON набора справочных данных."""
+    version = get_version(dataset)
+    key = f'reference:{dataset}:{version}'
+    content = cache.get(key)
+    if content is None:
+        model, serializer_class = REFERENCE_DATASETS[dataset]
+        with read_from_primary():
+            data = serializer_class(model.objects.all(), many=True).data
+        content = JSONRenderer().render(data)
+        cache.set(key, content, settings.REFERENCE_DATA_CACHE_TIMEOUT)
+    return version, content
@@ -0,0 +1,53 @@
+"""Связи текущего пользователя с отображаемыми объектами."""
+
+from recipes.models import FavoriteRecipe, ShoppingCart
+from users.models import Subscribe
+
+
+class ViewerRelations:
+    """Избранное, корзина и подписки пользователя в пределах запроса.
+
+    Загружает только id, пересекающиеся с отображаемыми объектами:
+    не больше трёх запросов на пачку объектов, дальше проверки по
+    множествам без обращений к базе данных.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.recipe_ids = set()
+        self.author_ids = set()
+        self.favorites = set()
+        self.cart = set()
+        self.subscriptions = set()
+
+    def load(self, recipe_ids=(), author_ids=()):
+        """Подгрузка связей для ещё не проверенных объектов."""
+        if not self.user.is_authenticated:
+            return
+        recipe_ids = set(recipe_ids) - self.recipe_ids
+        author_ids = set(author_ids) - self.author_ids
+        if recipe_ids:
+            self.recipe_ids |= recipe_ids
+            self.favorites.update(FavoriteRecipe.objects.filter(
+                user=self.user, favorite_recipe_id__in=recipe_ids
+            ).values_list('favorite_recipe_id', flat=True))
+            self.cart.update(ShoppingCart.objects.filter(
+                user=self.user, recipe_id__in=recipe_ids
+            ).values_list('recipe_id', flat=True))
+        if author_ids:
+            self.author_ids |= author_ids
+            self.subscriptions.update(Subscribe.objects.filter(
+                user=self.user, author_id__in=author_ids
+            ).values_list('author_id', flat=True))
+
+    def is_favorited(self, recipe_id):
+        self.load(recipe_ids=(recipe_id,))
+        return recipe_id in self.favorites
+
+    def is_in_shopping_cart(self, recipe_id):
+        self.load(recipe_ids=(recipe_id,))
+        return recipe_id in self.cart
+
+    def is_subscribed(self, author_id):
+        self.load(author_ids=(author_id,))
+        return author_id in self.subscriptions
@@ -1,17 +1,65 @@
 """Сериализаторы для приложения API."""
 
+from collections import OrderedDict
+
+from django.conf import settings
 from django.contrib.auth.hashers import check_password
 from django.db import transaction
 from djoser.serializers import (PasswordSerializer, UserCreateSerializer,
                                 UserSerializer)
-from drf_extra_fields.fields import Base64ImageField
-from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
-                            Recipe, ShoppingCart, Tag)
+from recipes.images import schedule_image_processing
+from recipes.models import (FavoriteRecipe, FeedItem, Ingredient,
+                            IngredientAmount, Recipe, ShoppingCart,
+                            ShoppingListItem, Tag, prefetch_recipe_relations)
+from recipes.search import update_search_vectors
+from recipes.snapshots import build_snapshot
 from rest_framework import serializers
 from users.models import CustomUser, Subscribe
 
+from .fields import RecipeImageField, RecipeImageVariantField
+from .relations import ViewerRelations
+
+
+class ViewerRelationsListSerializer(serializers.ListSerializer):
+    """Список, заранее загружающий связи пользователя со всеми объектами."""
+
+    def to_representation(self, data):
+        objects = list(data.all() if hasattr(data, 'all') else data)
+        self.child.preload_viewer_relations(objects)
+        return super().to_representation(objects)
+
+
+class RecipeListSerializer(ViewerRelationsListSerializer):
+    """Список рецептов, подгружающий связи только для рецептов без снимка."""
+
+    def to_representation(self, data):
+        objects = list(data.all() if hasattr(data, 'all') else data)
+        prefetch_recipe_relations(
+            [recipe for recipe in objects if recipe.snapshot is None]
+        )
+        return super().to_representation(objects)
+
+
+class ViewerRelationsMixin:
+    """Доступ к связям текущего пользователя из контекста сериализатора."""
+
+    @property
+    def viewer_relations(self):
+        relations = self.context.get('viewer_relations')
+        if relations is None:
+            relations = ViewerRelations(self.context.get('request').user)
+            self.context['viewer_relations'] = relations
+        return relations
+
+    def preload_viewer_relations(self, objects):
+        """Загрузка связей для пачки объектов.
+
+        По умолчанию ничего не загружает: связи запрашиваются
+        при первом обращении к ним.
+        """
+
 
-class UserListSerializer(UserSerializer):
+class UserListSerializer(ViewerRelationsMixin, UserSerializer):
     """Сериализатор для отображения информации о пользователе."""
     is_subscribed = serializers.SerializerMethodField()
 
@@ -19,15 +67,18 @@ class UserListSerializer(UserSerializer):
         model = CustomUser
         fields = ('email', 'id', 'username', 'first_name',
                   'last_name', 'is_subscribed')
+        list_serializer_class = ViewerRelationsListSerializer
+
+    def preload_viewer_relations(self, objects):
+        self.viewer_relations.load(author_ids=(
+            user.id for user in objects if not hasattr(user, 'is_subscribed')
+        ))
 
     def get_is_subscribed(self, obj):
         """Получение подписок."""
-        request = self.context.get('request')
-
-        return (self.context.get('request').user.is_authenticated
-                and Subscribe.objects.filter(
-                    user=request.user, author=obj
-        ).exists())
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+        return self.viewer_relations.is_subscribed(obj.id)
 
 
 class UserCreateSerializer(UserCreateSerializer):
@@ -93,7 +144,8 @@ class IngredientsCreateSerializer(serializers.ModelSerializer):
         fields = ('id', 'amount')
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class RecipeReadSerializer(ViewerRelationsMixin,
+                           serializers.ModelSerializer):
     """Сериализатор для отображения рецептов."""
     ingredients = IngrediendAmountSerializer(
         many=True,
@@ -109,6 +161,7 @@ class RecipeReadSerializer(serializers.ModelSerializer):
     )
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image = RecipeImageVariantField(source='*')
 
     class Meta:
         model = Recipe
@@ -116,27 +169,63 @@ class RecipeReadSerializer(serializers.ModelSerializer):
             'id', 'tags', 'author', 'ingredients', 'is_favorited',
             'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'
         )
+        list_serializer_class = RecipeListSerializer
+
+    def preload_viewer_relations(self, objects):
+        objects = [
+            recipe for recipe in objects
+            if not hasattr(recipe, 'is_favorited')
+        ]
+        self.viewer_relations.load(
+            recipe_ids=(recipe.id for recipe in objects),
+            author_ids=(recipe.author_id for recipe in objects),
+        )
+
+    def to_representation(self, instance):
+        """Отображение рецепта; теги, автор и ингредиенты из снимка."""
+        snapshot = instance.snapshot
+        if snapshot is None:
+            prefetch_recipe_relations([instance])
+            if hasattr(instance, 'author_is_subscribed'):
+                instance.author.is_subscribed = instance.author_is_subscribed
+            return super().to_representation(instance)
+        data = OrderedDict()
+        for field in self._readable_fields:
+            if field.field_name in snapshot:
+                data[field.field_name] = snapshot[field.field_name]
+            else:
+                data[field.field_name] = field.to_representation(
+                    field.get_attribute(instance)
+                )
+        data['author'] = dict(
+            data['author'], is_subscribed=self.get_author_is_subscribed(
+                instance
+            )
+        )
+        return data
+
+    def get_author_is_subscribed(self, obj):
+        """Подписка на автора рецепта."""
+        if hasattr(obj, 'author_is_subscribed'):
+            return obj.author_is_subscribed
+        return self.viewer_relations.is_subscribed(obj.author_id)
 
     def get_is_favorited(self, obj):
         """Получение избранных рецептов."""
-        return (self.context.get('request').user.is_authenticated
-                and FavoriteRecipe.objects.filter(
-                    user=self.context.get('request').user,
-                    favorite_recipe=obj
-        ).exists())
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return self.viewer_relations.is_favorited(obj.id)
 
     def get_is_in_shopping_cart(self, obj):
         """Получение рецептов в списке покупок."""
-        return (self.context.get('request').user.is_authenticated
-                and ShoppingCart.objects.filter(
-                    user=self.context.get('request').user,
-                    recipe=obj
-        ).exists())
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return self.viewer_relations.is_in_shopping_cart(obj.id)
 
 
 class RecipeCreateSerializer(serializers.ModelSerializer):
     """Сериализатор для создания рецепта."""
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = RecipeImageField(max_length=None, use_url=True)
     ingredients = IngredientsCreateSerializer(many=True)
     author = serializers.PrimaryKeyRelatedField(read_only=True)
 
@@ -155,12 +244,12 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
             )
 
         ingredient_ids = [item['id'] for item in ingredients]
-        if not Ingredient.objects.filter(id__in=ingredient_ids).exists():
-            invalid_ingredients = (
-                set(ingredient_ids) - set(Ingredient.objects.values_list(
-                    'id', flat=True
-                ))
-            )
+        found_ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        invalid_ingredients = [
+            ingredient_id for ingredient_id in dict.fromkeys(ingredient_ids)
+            if ingredient_id not in found_ingredients
+        ]
+        if invalid_ingredients:
             raise serializers.ValidationError(
                 {
                     'ingredients': [
@@ -169,6 +258,8 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
                     ]
                 }
             )
+        for item in ingredients:
+            item['ingredient'] = found_ingredients[item['id']]
 
         if len(ingredients) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
@@ -198,17 +289,69 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
 
         return data
 
+    @staticmethod
+    def cache_relations(recipe, ingredient_amounts, tags):
+        """Сохранение связей рецепта для отображения без запросов."""
+        recipe._prefetched_objects_cache = {
+            'recipe': ingredient_amounts,
+            'tags': sorted(tags, key=lambda tag: tag.name),
+        }
+
     @staticmethod
     def create_ingredients(ingredients, recipe):
         """Создание ингредиентов."""
-        for ingredient in ingredients:
-            IngredientAmount.objects.bulk_create([
-                IngredientAmount(
-                    recipe=recipe,
-                    ingredient_id=ingredient.get('id'),
-                    amount=ingredient.get('amount'),
-                )
-            ])
+        return IngredientAmount.objects.bulk_create([
+            IngredientAmount(
+                recipe=recipe,
+                ingredient=ingredient.get('ingredient'),
+                amount=ingredient.get('amount'),
+            )
+            for ingredient in ingredients
+        ])
+
+    @staticmethod
+    def update_ingredients(ingredients, recipe):
+        """Обновление только изменившихся ингредиентов.
+
+        Возвращает прежние количества и актуальный список ингредиентов.
+        """
+        current = {
+            ingredient_amount.ingredient_id: ingredient_amount
+            for ingredient_amount in recipe.recipe.all()
+        }
+        old_amounts = {
+            ingredient_id: ingredient_amount.amount
+            for ingredient_id, ingredient_amount in current.items()
+        }
+        new_amounts = {item['id']: item['amount'] for item in ingredients}
+        changed = []
+        for ingredient_id, amount in new_amounts.items():
+            ingredient_amount = current.get(ingredient_id)
+            if ingredient_amount and ingredient_amount.amount != amount:
+                ingredient_amount.amount = amount
+                changed.append(ingredient_amount)
+        IngredientAmount.objects.bulk_update(changed, ('amount',))
+        removed = current.keys() - new_amounts.keys()
+        if removed:
+            recipe.recipe.filter(ingredient_id__in=removed).delete()
+        created = RecipeCreateSerializer.create_ingredients(
+            (item for item in ingredients if item['id'] not in current),
+            recipe,
+        )
+        kept = [
+            ingredient_amount for ingredient_id, ingredient_amount
+            in current.items() if ingredient_id not in removed
+        ]
+        return old_amounts, kept + created
+
+    def save(self, **kwargs):
+        """Сохранение рецепта с закрытием временного файла изображения."""
+        try:
+            return super().save(**kwargs)
+        finally:
+            image = self.validated_data.get('image')
+            if image is not None:
+                image.close()
 
     @transaction.atomic
     def create(self, validated_data):
@@ -217,18 +360,43 @@ class RecipeCreateSerializer(serializers.ModelSerializer):
         tags = validated_data.pop('tags')
         recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
-        self.create_ingredients(ingredients, recipe)
+        self.cache_relations(
+            recipe, self.create_ingredients(ingredients, recipe), tags
+        )
+        recipe.snapshot = build_snapshot(recipe)
+        Recipe.objects.filter(pk=recipe.pk).update(snapshot=recipe.snapshot)
+        update_search_vectors(Recipe.objects.filter(pk=recipe.pk))
+        FeedItem.objects.fan_out(recipe)
+        schedule_image_processing(recipe.id)
         return recipe
 
     @transaction.atomic
     def update(self, instance, validated_data):
         """Обновление рецепта."""
+        prefetch_recipe_relations([instance])
+        ingredient_amounts = None
         if 'ingredients' in validated_data:
             ingredients = validated_data.pop('ingredients')
-            instance.ingredients.clear()
-            self.create_ingredients(ingredients, instance)
-        instance.tags.set(validated_data.pop('tags'))
-        return super().update(instance, validated_data)
+            old_amounts, ingredient_amounts = self.update_ingredients(
+                ingredients, instance
+            )
+            ShoppingListItem.objects.change_recipe(
+                instance,
+                old_amounts,
+                {item['id']: item['amount'] for item in ingredients},
+            )
+        tags = validated_data.pop('tags')
+        instance.tags.set(tags)
+        if ingredient_amounts is not None:
+            self.cache_relations(instance, ingredient_amounts, tags)
+        if 'image' in validated_data:
+            validated_data['image_variants'] = None
+        validated_data['snapshot'] = build_snapshot(instance)
+        instance = super().update(instance, validated_data)
+        update_search_vectors(Recipe.objects.filter(pk=instance.pk))
+        if instance.image_variants is None:
+            schedule_image_processing(instance.id)
+        return instance
 
     def to_representation(self, instance):
         """Отображение рецепта."""
@@ -264,6 +432,8 @@ class SetPasswordSerializer(PasswordSerializer):
 
 class SubscribeRecipeSerializer(serializers.ModelSerializer):
     """Сериализатор для рецептов пользователя."""
+    image = RecipeImageVariantField(source='*', size='small')
+
     class Meta:
         model = Recipe
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -289,7 +459,7 @@ class SubscribeSerializer(serializers.ModelSerializer):
     recipes = serializers.SerializerMethodField()
     is_subscribed = serializers.SerializerMethodField()
     recipes_count = serializers.ReadOnlyField(
-        source='author.recipe.count')
+        source='author.recipes_count')
 
     class Meta:
         model = Subscribe
@@ -303,25 +473,21 @@ class SubscribeSerializer(serializers.ModelSerializer):
         if user.id == int(author):
             raise serializers.ValidationError({
                 'errors': 'Нельзя подписаться на самого себя'})
-        if Subscribe.objects.filter(user=user, author=author).exists():
-            raise serializers.ValidationError({
-                'errors': 'Вы уже подписаны на данного пользователя'})
         return data
 
     def get_recipes(self, obj):
         """Получение рецептов пользователя."""
-        recipes = obj.author.recipe.all()
-        recipes_limit = self.context.get('recipes_limit')
-        if recipes_limit:
-            recipes = recipes[:int(recipes_limit)]
+        recipes = getattr(obj.author, 'latest_recipes', None)
+        if recipes is None:
+            recipes = obj.author.recipe.all()
+            recipes_limit = self.context.get('recipes_limit')
+            if recipes_limit:
+                recipes = recipes[:int(recipes_limit)]
         return SubscribeRecipeSerializer(recipes, many=True).data
 
     def get_is_subscribed(self, obj):
-        """Проверка подписки."""
-        return Subscribe.objects.filter(
-            user=self.context.get('request').user,
-            author=obj.author
-        ).exists()
+        """Сериализуемая подписка всегда принадлежит пользователю."""
+        return True
 
 
 class FavoriteRecipeSerializer(serializers.ModelSerializer):
@@ -332,9 +498,9 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
     name = serializers.ReadOnlyField(
         source='favorite_recipe.name',
     )
-    image = serializers.CharField(
-        source='favorite_recipe.image',
-        read_only=True,
+    image = RecipeImageVariantField(
+        source='favorite_recipe',
+        size='small',
     )
     cooking_time = serializers.ReadOnlyField(
         source='favorite_recipe.cooking_time',
@@ -344,16 +510,6 @@ class FavoriteRecipeSerializer(serializers.ModelSerializer):
         model = FavoriteRecipe
         fields = ('id', 'name', 'image', 'cooking_time')
 
-    def validate(self, data):
-        """Проверка валидности."""
-        user = self.context.get('request').user
-        recipe = self.context.get('recipe_id')
-        if FavoriteRecipe.objects.filter(user=user,
-                                         favorite_recipe=recipe).exists():
-            raise serializers.ValidationError({
-                'errors': 'Рецепт уже в избранном'})
-        return data
-
 
 class ShoppingCartSerializer(serializers.ModelSerializer):
     """Сериализатор для рецептов в списке покупок."""
@@ -363,9 +519,9 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
     name = serializers.ReadOnlyField(
         source='recipe.name',
     )
-    image = serializers.CharField(
-        source='recipe.image',
-        read_only=True,
+    image = RecipeImageVariantField(
+        source='recipe',
+        size='small',
     )
     cooking_time = serializers.ReadOnlyField(
         source='recipe.cooking_time',
@@ -375,12 +531,15 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         model = ShoppingCart
         fields = ('id', 'name', 'image', 'cooking_time')
 
-    def validate(self, data):
-        """Проверка валидности."""
-        user = self.context.get('request').user
-        recipe = self.context.get('recipe_id')
-        if ShoppingCart.objects.filter(user=user,
-                                       recipe=recipe).exists():
-            raise serializers.ValidationError({
-                'errors': 'Рецепт уже добавлен в список покупок'})
-        return data
+
+class RecipeIdsSerializer(serializers.Serializer):
+    """Список id рецептов для массовых операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=settings.RECIPE_BULK_MAX_SIZE,
+    )
+
+    def validate_recipes(self, value):
+        """Повторяющиеся id учитываются один раз."""
+        return list(dict.fromkeys(value))
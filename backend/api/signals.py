@@ -0,0 +1,69 @@
+"""Сигналы приложения api."""
+
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from recipes.models import (FavoriteRecipe, Ingredient, IngredientAmount,
+                            Recipe, ShoppingCart, Tag)
+from recipes.snapshots import AUTHOR_FIELDS
+from users.models import CustomUser, Subscribe
+
+from .cache import bump_version, invalidate_user_ids
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def bump_tags_version(**kwargs):
+    """Новая версия кэша тегов."""
+    bump_version('tags')
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def bump_ingredients_version(**kwargs):
+    """Новая версия кэша ингредиентов."""
+    bump_version('ingredients')
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+def bump_recipe_version(instance, **kwargs):
+    """Новая версия кэша рецепта."""
+    bump_version(f'recipe:{instance.pk}')
+
+
+@receiver((post_save, post_delete), sender=IngredientAmount)
+def bump_recipe_ingredients_version(instance, **kwargs):
+    """Новая версия кэша рецепта после изменения ингредиентов."""
+    bump_version(f'recipe:{instance.recipe_id}')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipe_tags_version(instance, action, **kwargs):
+    """Новая версия кэша рецепта после изменения тегов."""
+    if action.startswith('post_') and isinstance(instance, Recipe):
+        bump_version(f'recipe:{instance.pk}')
+
+
+@receiver(post_save, sender=CustomUser)
+def bump_author_version(instance, update_fields, **kwargs):
+    """Новая версия кэша рецептов автора после изменения его данных."""
+    if update_fields is not None and not (
+        set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    bump_version(f'author:{instance.pk}')
+
+
+@receiver((post_save, post_delete), sender=FavoriteRecipe)
+def invalidate_favorites(instance, **kwargs):
+    """Сброс кэша избранного пользователя."""
+    invalidate_user_ids(instance.user_id, 'favorites')
+
+
+@receiver((post_save, post_delete), sender=ShoppingCart)
+def invalidate_cart(instance, **kwargs):
+    """Сброс кэша корзины пользователя."""
+    invalidate_user_ids(instance.user_id, 'cart')
+
+
+@receiver((post_save, post_delete), sender=Subscribe)
+def invalidate_subscriptions(instance, **kwargs):
+    """Сброс кэша подписок пользователя."""
+    invalidate_user_ids(instance.user_id, 'subscriptions')
@@ -0,0 +1,698 @@
+"""Тесты приложения api."""
+
+import base64
+import ctypes
+import gc
+import json
+import os
+import tempfile
+import threading
+import time
+from io import BytesIO
+from unittest import skipUnless
+from unittest.mock import patch
+
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import (TestCase, TransactionTestCase, override_settings,
+                         skipUnlessDBFeature)
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from foodgram.routers import ReplicaRouter, read_from_replica
+from PIL import Image
+from recipes.models import (FavoriteRecipe, FeedItem, Ingredient,
+                            IngredientAmount, Recipe, RecipeRanking,
+                            ShoppingCart, Tag)
+from recipes.snapshots import update_snapshots
+from rest_framework import serializers
+from rest_framework.test import (APIClient, APIRequestFactory,
+                                 force_authenticate)
+from users.models import CustomUser, Subscribe
+
+from .bulk import FAVORITES
+from .cache import bump_version, get_recipe_detail, get_version, version_key
+from .fields import RecipeImageField
+from .serializers import (RecipeReadSerializer, ViewerRelationsListSerializer,
+                          ViewerRelationsMixin)
+from .views import RecipeViewSet
+
+MEDIA_ROOT = tempfile.mkdtemp()
+PROC_STATUS = '/proc/self/status'
+
+
+def create_user(number):
+    return CustomUser.objects.create_user(
+        username=f'user{number}',
+        email=f'user{number}@example.com',
+        password='password-123',
+        first_name='Имя',
+        last_name='Фамилия',
+    )
+
+
+def create_recipe(author, ingredients, tags, name='Рецепт'):
+    """Рецепт с ингредиентами и тегами, созданный без API."""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        text='Описание',
+        cooking_time=10,
+        image='recipes/images/test.png',
+    )
+    IngredientAmount.objects.bulk_create(
+        IngredientAmount(recipe=recipe, ingredient=ingredient, amount=number)
+        for number, ingredient in enumerate(ingredients, start=1)
+    )
+    recipe.tags.set(tags)
+    return recipe
+
+
+def read_memory(field):
+    """Поле ``VmRSS`` или ``VmHWM`` из статуса процесса в байтах."""
+    with open(PROC_STATUS) as status:
+        for line in status:
+            if line.startswith(f'{field}:'):
+                return int(line.split()[1]) * 1024
+
+
+def peak_rss_growth(function):
+    """Рост пикового RSS процесса за время вызова ``function``.
+
+    Пик сбрасывается до текущего RSS записью в ``clear_refs``.
+    """
+    gc.collect()
+    malloc_trim = getattr(ctypes.CDLL(None), 'malloc_trim', None)
+    if malloc_trim is not None:
+        malloc_trim(0)
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    start = read_memory('VmRSS')
+    function()
+    return read_memory('VmHWM') - start
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class ConcurrencyTestCase(TransactionTestCase):
+    """Одновременный запуск функции в нескольких потоках."""
+
+    THREADS = 8
+
+    def run_threads(self, target, count=None):
+        """Вызов ``target`` с номером потока; возвращает результаты."""
+        count = count or self.THREADS
+        barrier = threading.Barrier(count)
+        results = [None] * count
+        errors = []
+
+        def run(number):
+            try:
+                barrier.wait()
+                results[number] = target(number)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=run, args=(number,))
+            for number in range(count)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        return results
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT)
+class APITestCase(TestCase):
+    """Общие данные: пользователи, теги и ингредиенты."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [create_user(number) for number in range(4)]
+        cls.tags = [
+            Tag.objects.create(
+                name=f'Тег {number}', color=f'#00000{number}',
+                slug=f'tag{number}',
+            )
+            for number in range(3)
+        ]
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(60)
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.user = self.users[0]
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+
+class RecipeQueryCountTest(APITestCase):
+    """Количество запросов списка и рецепта не зависит от размера."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        viewer = cls.users[0]
+        for number in range(60):
+            author = cls.users[1 + number % 3]
+            recipe = create_recipe(
+                author, cls.ingredients[:1 + number % 50], cls.tags[:2],
+                name=f'Рецепт {number}',
+            )
+            if number % 2:
+                FavoriteRecipe.objects.create(
+                    user=viewer, favorite_recipe=recipe
+                )
+            if number % 3:
+                ShoppingCart.objects.create(user=viewer, recipe=recipe)
+        Subscribe.objects.create(user=viewer, author=cls.users[1])
+        cls.small = Recipe.objects.get(name='Рецепт 0')
+        cls.large = Recipe.objects.get(name='Рецепт 49')
+
+    def count_queries(self, url, client=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = (client or self.client).get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def assert_queries(self, expected, urls, client=None):
+        """Одинаковое заданное число запросов для всех адресов."""
+        counts = {url: self.count_queries(url, client)[0] for url in urls}
+        self.assertEqual(set(counts.values()), {expected}, counts)
+
+    def list_urls(self):
+        return [f'/api/recipes/?limit={limit}' for limit in (2, 6, 50)]
+
+    def detail_urls(self):
+        return [
+            f'/api/recipes/{recipe.id}/'
+            for recipe in (self.small, self.large)
+        ]
+
+    def test_list(self):
+        self.assert_queries(5, self.list_urls())
+
+    def test_list_with_snapshots(self):
+        update_snapshots(Recipe.objects.all())
+        self.assert_queries(2, self.list_urls())
+        self.assert_queries(2, self.list_urls(), client=APIClient())
+
+    def test_list_flags(self):
+        update_snapshots(Recipe.objects.all())
+        _, response = self.count_queries('/api/recipes/?limit=50')
+        favorites = set(FavoriteRecipe.objects.filter(
+            user=self.user
+        ).values_list('favorite_recipe_id', flat=True))
+        cart = set(ShoppingCart.objects.filter(
+            user=self.user
+        ).values_list('recipe_id', flat=True))
+        for data in response.data['results']:
+            self.assertEqual(data['is_favorited'], data['id'] in favorites)
+            self.assertEqual(data['is_in_shopping_cart'], data['id'] in cart)
+            self.assertEqual(
+                data['author']['is_subscribed'],
+                data['author']['id'] == self.users[1].id,
+            )
+
+    def test_detail(self):
+        self.assert_queries(8, self.detail_urls())
+
+    def test_detail_with_snapshots(self):
+        update_snapshots(Recipe.objects.all())
+        self.assert_queries(5, self.detail_urls())
+
+    def test_detail_cache_hit(self):
+        url = f'/api/recipes/{self.large.id}/'
+        self.client.get(url)
+        with self.assertNumQueries(0):
+            response = self.client.get(url)
+        self.assertEqual(response['X-Cache'], 'HIT')
+
+    def test_detail_changed_during_build(self):
+        """Ответ, собранный во время изменения рецепта, не читается."""
+        recipe = self.large
+        request = APIRequestFactory().get(f'/api/recipes/{recipe.id}/')
+        request.user = self.user
+
+        def build():
+            data = RecipeReadSerializer(
+                Recipe.objects.get(pk=recipe.pk),
+                context={'request': request},
+            ).data
+            cache.incr(version_key(f'recipe:{recipe.id}'))
+            return data
+
+        self.assertFalse(get_recipe_detail(request, recipe.id, build)[1])
+        self.assertFalse(get_recipe_detail(request, recipe.id, build)[1])
+
+
+class CacheVersionTest(TestCase):
+    """Версии кэша в общем хранилище."""
+
+    def setUp(self):
+        cache.clear()
+
+    def test_bump(self):
+        version = get_version('tags')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('tags')
+        self.assertEqual(get_version('tags'), version + 1)
+
+    def test_evicted_version_is_new(self):
+        """После вытеснения ключа версия не повторяет прежние."""
+        version = get_version('tags')
+        with self.captureOnCommitCallbacks(execute=True):
+            bump_version('tags')
+        cache.delete(version_key('tags'))
+        self.assertGreater(get_version('tags'), version + 1)
+
+    def test_author_fields(self):
+        """Версию автора меняют только поля из ответа."""
+        user = create_user(1)
+        key = f'author:{user.pk}'
+        version = get_version(key)
+        user.last_login = timezone.now()
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=('last_login',))
+        self.assertEqual(get_version(key), version)
+        user.first_name = 'Новое имя'
+        with self.captureOnCommitCallbacks(execute=True):
+            user.save(update_fields=('first_name',))
+        self.assertEqual(get_version(key), version + 1)
+
+    def test_metrics(self):
+        self.client.get('/api/recipes/0/')
+        response = self.client.get('/metrics')
+        self.assertContains(
+            response,
+            'foodgram_cache_requests_total{cache="recipe",result="misses"} 1',
+        )
+
+
+class ViewerRelationsMixinTest(APITestCase):
+    """Сериализатор без собственной загрузки связей."""
+
+    def test_default_preload(self):
+        class TagSerializer(ViewerRelationsMixin, serializers.ModelSerializer):
+            class Meta:
+                model = Tag
+                fields = ('id',)
+                list_serializer_class = ViewerRelationsListSerializer
+
+        data = TagSerializer(Tag.objects.order_by('id'), many=True).data
+        self.assertEqual([item['id'] for item in data], [
+            tag.id for tag in self.tags
+        ])
+
+
+class ReplicaReadTest(APITestCase):
+    """Данные для общего кэша читаются с основной базы данных."""
+
+    def get_replica_reads(self, url):
+        reads = []
+        db_for_read = ReplicaRouter.db_for_read
+
+        def record(router, model, **hints):
+            reads.append(read_from_replica.get())
+            return db_for_read(router, model, **hints)
+
+        with patch.object(ReplicaRouter, 'db_for_read', record):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(reads)
+        return reads
+
+    def test_reference_data(self):
+        self.assertNotIn(True, self.get_replica_reads('/api/tags/'))
+
+    def test_recipe_detail(self):
+        recipe = create_recipe(self.users[1], self.ingredients[:2], self.tags)
+        self.assertNotIn(
+            True, self.get_replica_reads(f'/api/recipes/{recipe.id}/')
+        )
+        self.assertIn(True, self.get_replica_reads('/api/recipes/'))
+
+
+class CounterConcurrencyTest(ConcurrencyTestCase):
+    """Счётчики при параллельных добавлениях и удалениях."""
+
+    ROUNDS = 5
+
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.recipes = [
+            create_recipe(self.author, (), (), name=f'Рецепт {number}')
+            for number in range(3)
+        ]
+        self.users = [create_user(number) for number in range(self.THREADS)]
+
+    def hammer(self, number):
+        client = APIClient()
+        client.force_authenticate(self.users[number])
+        subscribe = f'/api/users/{self.author.id}/subscribe/'
+        for round_number in range(self.ROUNDS):
+            client.post(subscribe)
+            for recipe in self.recipes:
+                client.post(f'/api/recipes/{recipe.id}/favorite/')
+                client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+            removed = self.recipes[:(number + round_number) % 3]
+            for recipe in removed:
+                client.delete(f'/api/recipes/{recipe.id}/favorite/')
+                client.delete(f'/api/recipes/{recipe.id}/shopping_cart/')
+            if (number + round_number) % 2:
+                client.delete(subscribe)
+            client.post('/api/recipes/favorite/', {
+                'recipes': [recipe.id for recipe in removed],
+            }, format='json')
+
+    def assert_counters(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.favorites_count, recipe.favorite_recipe.count()
+            )
+            self.assertEqual(
+                recipe.in_carts_count, recipe.recipe_shopping_cart.count()
+            )
+        self.author.refresh_from_db()
+        self.assertEqual(
+            self.author.followers_count, self.author.following.count()
+        )
+
+    def test_add_and_remove(self):
+        self.run_threads(self.hammer)
+        self.assert_counters()
+
+    def test_reconcile_waits_for_changes(self):
+        """Пересчёт не теряет изменение из незавершённой транзакции."""
+        recipe = self.recipes[0]
+        changed = threading.Event()
+
+        def run(number):
+            if number:
+                changed.wait()
+                call_command('reconcile_counters')
+                return
+            with transaction.atomic():
+                FAVORITES.add(self.users[0], [recipe.id])
+                changed.set()
+                time.sleep(0.5)
+
+        Recipe.objects.filter(pk=recipe.pk).update(favorites_count=5)
+        self.run_threads(run, 2)
+        self.assert_counters()
+
+    def assert_waits_for_bulk(self, method, url):
+        """Запрос ждёт массовую операцию того же пользователя."""
+        user = self.users[0]
+        locked = threading.Event()
+        finished = []
+
+        def run(number):
+            if number:
+                locked.wait()
+                client = APIClient()
+                client.force_authenticate(user)
+                response = getattr(client, method)(url)
+                finished.append('single')
+                return response.status_code
+            with transaction.atomic():
+                FAVORITES.lock(user)
+                locked.set()
+                time.sleep(0.5)
+                finished.append('bulk')
+
+        _, status_code = self.run_threads(run, 2)
+        self.assertLess(status_code, 300)
+        self.assertEqual(finished, ['bulk', 'single'])
+
+    def test_single_changes_wait_for_bulk(self):
+        recipe = self.recipes[0]
+        for method, path in (
+            ('post', 'favorite'),
+            ('post', 'shopping_cart'),
+            ('delete', 'favorite'),
+            ('delete', 'shopping_cart'),
+        ):
+            with self.subTest(method=method, path=path):
+                self.assert_waits_for_bulk(
+                    method, f'/api/recipes/{recipe.id}/{path}/'
+                )
+        self.assert_counters()
+
+
+class DuplicateRequestTest(ConcurrencyTestCase):
+    """Параллельные повторы одного запроса: один успех, остальные отказы."""
+
+    def setUp(self):
+        cache.clear()
+        self.author = create_user('author')
+        self.user = create_user('reader')
+        self.recipe = create_recipe(self.author, (), ())
+
+    def fire(self, method, url):
+        """Одновременная отправка запроса из всех потоков."""
+        def run(number):
+            client = APIClient()
+            client.force_authenticate(self.user)
+            return getattr(client, method)(url).status_code
+
+        return sorted(self.run_threads(run))
+
+    def assert_duplicates(self, url, rows, missing_status=400):
+        self.assertEqual(
+            self.fire('post', url), [201] + [400] * (self.THREADS - 1)
+        )
+        self.assertEqual(rows.count(), 1)
+        self.assertEqual(
+            self.fire('delete', url),
+            [204] + [missing_status] * (self.THREADS - 1),
+        )
+        self.assertEqual(rows.count(), 0)
+
+    def test_favorite(self):
+        self.assert_duplicates(
+            f'/api/recipes/{self.recipe.id}/favorite/',
+            FavoriteRecipe.objects.filter(user=self.user),
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 0)
+
+    def test_shopping_cart(self):
+        self.assert_duplicates(
+            f'/api/recipes/{self.recipe.id}/shopping_cart/',
+            ShoppingCart.objects.filter(user=self.user),
+            missing_status=404,
+        )
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.in_carts_count, 0)
+
+    def test_subscribe(self):
+        self.assert_duplicates(
+            f'/api/users/{self.author.id}/subscribe/',
+            Subscribe.objects.filter(user=self.user),
+        )
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.followers_count, 0)
+
+    def test_counters_after_add(self):
+        """Счётчики увеличиваются один раз на успешное добавление."""
+        for path in ('favorite', 'shopping_cart'):
+            self.fire('post', f'/api/recipes/{self.recipe.id}/{path}/')
+        self.fire('post', f'/api/users/{self.author.id}/subscribe/')
+        self.recipe.refresh_from_db()
+        self.author.refresh_from_db()
+        self.assertEqual(self.recipe.favorites_count, 1)
+        self.assertEqual(self.recipe.in_carts_count, 1)
+        self.assertEqual(self.author.followers_count, 1)
+
+
+@override_settings(FEED_FANOUT_MAX_FOLLOWERS=3)
+class FeedTest(APITestCase):
+    """Лента подписок: слияние разложенных и выбираемых при чтении."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        viewer, small, large, other = cls.users
+        for author in (small, large):
+            Subscribe.objects.create(user=viewer, author=author)
+        start = timezone.now()
+        for number in range(14):
+            if number == 6:
+                large.followers_count = 3
+                large.save(update_fields=('followers_count',))
+            recipe = create_recipe(
+                (small, large, other)[number % 3], (), (),
+                name=f'Рецепт {number}',
+            )
+            recipe.pub_date = start - timezone.timedelta(
+                minutes=number // 2
+            )
+            Recipe.objects.filter(pk=recipe.pk).update(
+                pub_date=recipe.pub_date
+            )
+            FeedItem.objects.fan_out(recipe)
+        cls.expected = list(Recipe.objects.filter(
+            author__in=(small, large)
+        ).order_by('-pub_date', '-id').values_list('id', flat=True))
+
+    def walk(self, url, link):
+        pages = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            pages.append([
+                recipe['id'] for recipe in response.data['results']
+            ])
+            url = response.data[link]
+        return pages, response
+
+    def test_pages(self):
+        pages, response = self.walk('/api/recipes/feed/?limit=3', 'next')
+        self.assertEqual(sum(pages, []), self.expected)
+        self.assertEqual(response.data['count'], len(self.expected))
+        self.assertTrue(FeedItem.objects.filter(
+            recipe__author=self.users[2]
+        ).exists())
+        back, _ = self.walk(response.data['previous'], 'previous')
+        self.assertEqual(back[::-1], pages[:-1])
+
+    def test_filters(self):
+        recipe_id = self.expected[4]
+        Recipe.objects.get(pk=recipe_id).tags.set(self.tags[:1])
+        response = self.client.get(
+            f'/api/recipes/feed/?tags={self.tags[0].slug}'
+        )
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipe_id],
+        )
+
+    def test_other_ordering(self):
+        """Курсор не подменяет сортировку по рейтингу."""
+        popular = self.expected[-1]
+        RecipeRanking.objects.update_or_create(
+            recipe_id=popular, defaults={'popularity': 10}
+        )
+        response = self.client.get(
+            '/api/recipes/?ordering=popular&cursor=&limit=3'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'][0]['id'], popular)
+        self.assertIn('page=2', response.data['next'])
+        response = self.client.get('/api/recipes/feed/?ordering=popular')
+        self.assertEqual(response.status_code, 400)
+
+
+class RecipeImageFieldTest(TestCase):
+    """Декодирование изображения в base64."""
+
+    def setUp(self):
+        output = BytesIO()
+        Image.new('RGB', (40, 30), 'green').save(output, 'PNG')
+        self.image = output.getvalue()
+
+    def decode(self, data):
+        upload = RecipeImageField().decode(data)
+        try:
+            return upload.read()
+        finally:
+            upload.close()
+
+    def test_line_wrapped(self):
+        """Переносы строк не сдвигают группы на границах частей."""
+        data = 'data:image/png;base64,' + base64.encodebytes(
+            self.image
+        ).decode().replace('\n', '\r\n ')
+        for chunk_size in (5, 7, 64 * 1024):
+            with self.subTest(chunk_size=chunk_size), patch(
+                'api.fields.BASE64_CHUNK_SIZE', chunk_size
+            ):
+                self.assertEqual(self.decode(data), self.image)
+
+    def test_incomplete(self):
+        data = base64.b64encode(self.image).decode()[:-1]
+        with self.assertRaises(serializers.ValidationError):
+            self.decode(data)
+
+
+@skipUnless(os.path.exists(PROC_STATUS), 'Пиковый RSS читается из /proc')
+@override_settings(
+    IMAGE_MAX_UPLOAD_SIZE=32 * 1024 ** 2,
+    RECIPE_MAX_REQUEST_SIZE=64 * 1024 ** 2,
+)
+class ImageUploadMemoryTest(APITestCase):
+    """Пиковый RSS при загрузке изображения в 20 МБ.
+
+    Тело запроса собирается до замера, так что в рост пика входят
+    только копии, которые делает сервер при разборе запроса.
+    """
+
+    IMAGE_SIZE = 20 * 1024 ** 2
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        side = int((cls.IMAGE_SIZE / 3) ** 0.5)
+        image = Image.frombytes(
+            'RGB', (side, side), os.urandom(side * side * 3)
+        )
+        output = BytesIO()
+        image.save(output, 'PNG', compress_level=0)
+        cls.image = output.getvalue()
+
+    def payload(self):
+        return {
+            'name': 'Большое изображение',
+            'text': 'Описание',
+            'cooking_time': 10,
+            'tags': [self.tags[0].id],
+            'ingredients': [{'id': self.ingredients[0].id, 'amount': 10}],
+        }
+
+    def upload(self, request):
+        force_authenticate(request, self.user)
+        view = RecipeViewSet.as_view({'post': 'create'})
+        response = None
+
+        def create():
+            nonlocal response
+            response = view(request)
+
+        growth = peak_rss_growth(create)
+        self.assertEqual(response.status_code, 201, response.data)
+        return growth
+
+    def test_base64(self):
+        """Декодированное изображение не держится в памяти целиком."""
+        payload = self.payload()
+        payload['image'] = (
+            'data:image/png;base64,' + base64.b64encode(self.image).decode()
+        )
+        body = json.dumps(payload)
+        del payload
+        request = APIRequestFactory().generic(
+            'POST', '/api/recipes/', body, 'application/json'
+        )
+        growth = self.upload(request)
+        self.assertLess(growth, 2 * len(body) + self.IMAGE_SIZE // 4)
+
+    def test_multipart(self):
+        """Файл формы пишется на диск, а не в память."""
+        request = APIRequestFactory().post('/api/recipes/', {
+            'data': json.dumps(self.payload()),
+            'image': SimpleUploadedFile(
+                'image.png', self.image, content_type='image/png'
+            ),
+        }, format='multipart')
+        growth = self.upload(request)
+        self.assertLess(growth, self.IMAGE_SIZE // 4)
@@ -1,3 +1,4 @@
+from django.conf import settings
 from django.urls import include, path
 from rest_framework import routers
 
@@ -33,3 +34,32 @@ urlpatterns = [
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
 ]
+
+if settings.ASYNC_VIEWS:
+    from . import async_views
+
+    urlpatterns = [
+        path('recipes/', async_views.recipe_list, name='recipes-list'),
+        path(
+            'recipes/<int:pk>/',
+            async_views.recipe_detail,
+            name='recipes-detail'
+        ),
+        path('tags/', async_views.tag_list, name='tags-list'),
+        path('tags/<int:pk>/', async_views.tag_detail, name='tags-detail'),
+        path(
+            'ingredients/',
+            async_views.ingredient_list,
+            name='ingredients-list'
+        ),
+        path(
+            'ingredients/<int:pk>/',
+            async_views.ingredient_detail,
+            name='ingredients-detail'
+        ),
+        path(
+            'users/subscriptions/',
+            async_views.subscriptions,
+            name='users-subscriptions'
+        ),
+    ] + urlpatterns
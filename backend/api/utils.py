@@ -1,19 +1,80 @@
-from django.db.models import Sum
-
-
-def generate_shopping_list(user):
-    """Создание списка покупок."""
-    text = 'Список покупок:\n\n'
-    ingredient_name = 'recipe__recipe__ingredient__name'
-    ingredient_unit = 'recipe__recipe__ingredient__measurement_unit'
-    recipe_amount = 'recipe__recipe__amount'
-    amount_sum = 'recipe__recipe__amount__sum'
-    cart = user.shopping_cart.select_related('recipe').values(
-        ingredient_name, ingredient_unit).annotate(Sum(
-            recipe_amount)).order_by(ingredient_name)
-    text += '\n'.join(
-        f'{item[ingredient_name]} ({item[ingredient_unit]})'
-        f' — {item[amount_sum]}\n'
-        for item in cart
+from collections import defaultdict
+from hashlib import md5
+
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.utils.http import quote_etag
+from recipes.models import Recipe, ShoppingListItem
+
+from .cache import get_version
+
+SHOPPING_LIST_CHUNK_SIZE = 500
+
+
+def shopping_list_items(user):
+    """Суммарное количество ингредиентов из корзины пользователя.
+
+    Строки читаются курсором на стороне сервера, не загружая весь список.
+    """
+    return ShoppingListItem.objects.filter(user=user).values(
+        name=F('ingredient__name'),
+        measurement_unit=F('ingredient__measurement_unit'),
+        amount=F('total_amount'),
+    ).order_by('name').iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
+
+
+def shopping_list_etag(user, export_format):
+    """ETag по содержимому корзины или None, если корзина пуста.
+
+    Считается по строкам списка в порядке ингредиентов и по версии
+    справочника ингредиентов, поэтому меняется и при их переименовании.
+    """
+    digest = md5(f'{export_format}:{get_version("ingredients")}'.encode())
+    rows = ShoppingListItem.objects.filter(user=user).order_by(
+        'ingredient_id'
+    ).values_list('ingredient_id', 'total_amount')
+    empty = True
+    for ingredient_id, amount in rows.iterator(
+            chunk_size=SHOPPING_LIST_CHUNK_SIZE):
+        digest.update(f':{ingredient_id}={amount}'.encode())
+        empty = False
+    if empty:
+        return None
+    return quote_etag(digest.hexdigest())
+
+
+def get_recipes_limit(request):
+    """Ограничение количества рецептов из параметров запроса."""
+    recipes_limit = request.query_params.get('recipes_limit')
+    if recipes_limit and recipes_limit.isdigit():
+        return int(recipes_limit)
+    return None
+
+
+def attach_latest_recipes(subscriptions, recipes_limit=None):
+    """Подгрузка последних рецептов авторов для страницы подписок."""
+    authors = [subscription.author for subscription in subscriptions]
+    recipes_by_author = defaultdict(list)
+    recipes = Recipe.objects.latest_for_authors(
+        (author.id for author in authors), recipes_limit
+    ).only(
+        'id', 'author_id', 'name', 'image', 'image_variants', 'cooking_time',
+        'pub_date',
     )
-    return text
+    for recipe in recipes:
+        recipes_by_author[recipe.author_id].append(recipe)
+    for author in authors:
+        author.latest_recipes = recipes_by_author[author.id]
+
+
+def change_counter(queryset, field, delta):
+    """Атомарное изменение денормализованного счётчика."""
+    queryset.update(**{field: Greatest(F(field) + delta, 0)})
+
+
+def raw_delete(queryset):
+    """Удаление одним запросом без сигналов и каскадов.
+
+    Возвращает количество удалённых строк.
+    """
+    return queryset._raw_delete(queryset.db)
@@ -1,8 +1,11 @@
-from django.http import HttpResponse
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponseNotModified, StreamingHttpResponse
 from django.shortcuts import get_object_or_404
+from django.utils.http import parse_etags
 from djoser.views import UserViewSet
-from recipes.models import (FavoriteRecipe, Ingredient, Recipe, ShoppingCart,
-                            Tag)
+from recipes.models import (FavoriteRecipe, FeedItem, Ingredient, Recipe,
+                            ShoppingCart, ShoppingListItem, Tag)
 from rest_framework import status, viewsets
 from rest_framework.decorators import action
 from rest_framework.exceptions import ValidationError
@@ -11,15 +14,22 @@ from rest_framework.permissions import (SAFE_METHODS, IsAuthenticated,
 from rest_framework.response import Response
 from users.models import CustomUser, Subscribe
 
+from .bulk import FAVORITES, SHOPPING_CART
+from .cache import get_recipe_detail, invalidate_user_ids
+from .exporters import SHOPPING_LIST_EXPORTERS
 from .filters import IngredientFilter, RecipesFilter
-from .mixins import CreateDestroyViewSet
+from .mixins import CreateDestroyViewSet, ReferenceDataMixin, ReplicaReadMixin
+from .pagination import FeedPagination
+from .parsers import RecipeJSONParser, RecipeMultiPartParser
 from .permissions import IsAuthorOrReadOnly
 from .serializers import (FavoriteRecipeSerializer, IngredientSerializer,
-                          RecipeCreateSerializer, RecipeReadSerializer,
-                          SetPasswordSerializer, ShoppingCartSerializer,
-                          SubscribeSerializer, TagSerializer,
-                          UserCreateSerializer, UserListSerializer)
-from .utils import generate_shopping_list
+                          RecipeCreateSerializer, RecipeIdsSerializer,
+                          RecipeReadSerializer, SetPasswordSerializer,
+                          ShoppingCartSerializer, SubscribeSerializer,
+                          TagSerializer, UserCreateSerializer,
+                          UserListSerializer)
+from .utils import (attach_latest_recipes, change_counter, get_recipes_limit,
+                    raw_delete, shopping_list_etag, shopping_list_items)
 
 
 class CustomUserViewSet(UserViewSet):
@@ -46,12 +56,17 @@ class CustomUserViewSet(UserViewSet):
         permission_classes=(IsAuthenticated,))
     def subscriptions(self, request):
         """Подписки."""
-        queryset = Subscribe.objects.filter(user=request.user)
+        self.keyset_ordering = ('-id',)
+        queryset = Subscribe.objects.filter(
+            user=request.user
+        ).select_related('author')
         pages = self.paginate_queryset(queryset)
+        recipes_limit = get_recipes_limit(request)
+        attach_latest_recipes(pages, recipes_limit)
         serializer = SubscribeSerializer(
             pages,
             many=True,
-            context={'request': request},
+            context={'request': request, 'recipes_limit': recipes_limit},
         )
         return self.get_paginated_response(serializer.data)
 
@@ -68,47 +83,53 @@ class SubscribeViewSet(CreateDestroyViewSet):
         """Получение контекста."""
         context = super().get_serializer_context()
         context['author_id'] = self.kwargs.get('user_id')
-        context['resipes_limit'] = self.request.query_params.get(
-            'recipes_limit',
-        )
+        context['recipes_limit'] = get_recipes_limit(self.request)
         return context
 
+    @transaction.atomic
     def perform_create(self, serializer):
         """Создание подписки."""
-        serializer.save(
-            user=self.request.user,
-            author=get_object_or_404(
-                CustomUser,
-                id=self.kwargs.get('user_id')
-            )
+        author = get_object_or_404(CustomUser, id=self.kwargs.get('user_id'))
+        self.save_unique(
+            serializer, 'Вы уже подписаны на данного пользователя',
+            user=self.request.user, author=author,
+        )
+        FeedItem.objects.backfill(self.request.user, author)
+        change_counter(
+            CustomUser.objects.filter(id=author.id), 'followers_count', 1
         )
 
     @action(methods=('delete',), detail=True)
+    @transaction.atomic
     def delete(self, request, user_id):
         """Удаление подписки."""
-        get_object_or_404(CustomUser, id=user_id)
-        if not Subscribe.objects.filter(
-                user=request.user, author_id=user_id).exists():
+        author = get_object_or_404(CustomUser, id=user_id)
+        if not raw_delete(Subscribe.objects.filter(
+                user=request.user, author=author)):
             return Response({'errors': 'Вы не были подписаны на автора'},
                             status=status.HTTP_400_BAD_REQUEST)
-        get_object_or_404(
-            Subscribe,
-            user=request.user,
-            author_id=user_id
-        ).delete()
+        invalidate_user_ids(request.user.id, 'subscriptions')
+        FeedItem.objects.trim(request.user, author)
+        change_counter(
+            CustomUser.objects.filter(id=user_id), 'followers_count', -1
+        )
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(ReplicaReadMixin, ReferenceDataMixin,
+                 viewsets.ReadOnlyModelViewSet):
     """Вьюсет для тегов."""
+    reference_dataset = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = None
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(ReplicaReadMixin, ReferenceDataMixin,
+                        viewsets.ReadOnlyModelViewSet):
     """Вьюсет для ингредиентов."""
+    reference_dataset = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
@@ -116,11 +137,16 @@ class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     filterset_class = IngredientFilter
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
+class RecipeViewSet(ReplicaReadMixin, viewsets.ModelViewSet):
     """Вьюсет для рецептов."""
-    queryset = Recipe.objects.all()
     permission_classes = (IsAuthenticatedOrReadOnly, IsAuthorOrReadOnly)
     filterset_class = RecipesFilter
+    keyset_ordering = ('-pub_date', '-id')
+    parser_classes = (RecipeJSONParser, RecipeMultiPartParser)
+
+    def get_queryset(self):
+        """Рецепты с флагами текущего пользователя."""
+        return Recipe.objects.with_user_annotations(self.request.user)
 
     def get_serializer_class(self):
         """Сериализатор для отображения информации о рецепте."""
@@ -128,9 +154,36 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return RecipeReadSerializer
         return RecipeCreateSerializer
 
+    def retrieve(self, request, *args, **kwargs):
+        """Рецепт из кэша с флагами текущего пользователя."""
+        data, hit = get_recipe_detail(
+            request,
+            self.kwargs['pk'],
+            lambda: super(RecipeViewSet, self).retrieve(
+                request, *args, **kwargs
+            ).data,
+        )
+        return Response(data, headers={'X-Cache': 'HIT' if hit else 'MISS'})
+
+    @transaction.atomic
     def perform_create(self, serializer):
         """Создание рецепта."""
         serializer.save(author=self.request.user)
+        change_counter(
+            CustomUser.objects.filter(id=self.request.user.id),
+            'recipes_count', 1
+        )
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        """Удаление рецепта вместе с его ингредиентами в списках покупок."""
+        for user_id in ShoppingListItem.objects.remove_from_carts(instance):
+            invalidate_user_ids(user_id, 'cart')
+        change_counter(
+            CustomUser.objects.filter(id=instance.author_id),
+            'recipes_count', -1
+        )
+        instance.delete()
 
     def update(self, request, *args, **kwargs):
         """Обновление рецепта."""
@@ -154,25 +207,96 @@ class RecipeViewSet(viewsets.ModelViewSet):
                 status=status.HTTP_400_BAD_REQUEST
             )
 
+    @action(
+        detail=False,
+        permission_classes=(IsAuthenticated,),
+        pagination_class=FeedPagination,
+    )
+    def feed(self, request):
+        """Лента рецептов авторов из подписок."""
+        self.keyset_only = True
+        pages = self.paginate_queryset(
+            self.filter_queryset(self.get_queryset())
+        )
+        serializer = self.get_serializer(pages, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    def bulk_change(self, request, collection):
+        """Добавление или удаление списка рецептов."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            results = collection.add(request.user, recipe_ids)
+        else:
+            results = collection.remove(request.user, recipe_ids)
+        return Response({'results': results})
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,),
+    )
+    def favorite_bulk(self, request):
+        """Массовое добавление и удаление избранных рецептов."""
+        return self.bulk_change(request, FAVORITES)
+
+    @action(
+        detail=False,
+        methods=('post', 'delete'),
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,),
+    )
+    def shopping_cart_bulk(self, request):
+        """Массовое добавление и удаление рецептов в корзине."""
+        return self.bulk_change(request, SHOPPING_CART)
+
+    @action(
+        detail=False,
+        methods=('delete',),
+        url_path='shopping_cart/clear',
+        permission_classes=(IsAuthenticated,),
+    )
+    def clear_shopping_cart(self, request):
+        """Очистка корзины покупок."""
+        SHOPPING_CART.clear(request.user)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
     @action(
         detail=False,
         methods=('get',),
         url_path='download_shopping_cart',
-        pagination_class=None
+        pagination_class=None,
+        permission_classes=(IsAuthenticated,),
+        renderer_classes=SHOPPING_LIST_EXPORTERS,
     )
     def download_file(self, request):
         """Скачивание списка покупок."""
         user = request.user
-        if not user.shopping_cart.exists():
+        exporter = request.accepted_renderer
+        etag = shopping_list_etag(user, exporter.format)
+        if etag is None:
             return Response(
                 'В корзине нет товаров', status=status.HTTP_400_BAD_REQUEST
             )
-        response = HttpResponse(
-            generate_shopping_list(user),
-            content_type='text/plain'
+        if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+            return HttpResponseNotModified(headers={'ETag': etag})
+        items = shopping_list_items(user)
+        if isinstance(request._request, ASGIRequest):
+            # Под ASGI Django 3.2 читает потоковый ответ в цикле событий,
+            # где запросы к базе данных запрещены.
+            items = list(items)
+        response = StreamingHttpResponse(
+            exporter.stream(items),
+            content_type=(
+                f'{exporter.media_type}; charset={exporter.charset}'
+                if exporter.charset else exporter.media_type
+            ),
         )
-        filename = 'shopping_list.txt'
+        filename = exporter.get_filename()
         response['Content-Disposition'] = f'attachment; filename={filename}'
+        response['ETag'] = etag
         return response
 
 
@@ -185,36 +309,23 @@ class FavoriteRecipeViewSet(CreateDestroyViewSet):
         user = self.request.user.id
         return FavoriteRecipe.objects.filter(user=user)
 
-    def get_serializer_context(self):
-        """Получение контекста."""
-        context = super().get_serializer_context()
-        context['recipe_id'] = self.kwargs.get('recipe_id')
-        return context
-
+    @transaction.atomic
     def perform_create(self, serializer):
         """Создание избранных рецептов."""
-        serializer.save(
-            user=self.request.user,
-            favorite_recipe=get_object_or_404(
-                Recipe,
-                id=self.kwargs.get('recipe_id')
-            )
+        recipe = get_object_or_404(Recipe, id=self.kwargs.get('recipe_id'))
+        FAVORITES.lock(self.request.user)
+        self.save_unique(
+            serializer, 'Рецепт уже в избранном',
+            user=self.request.user, favorite_recipe=recipe,
         )
+        FAVORITES.changed(self.request.user, (recipe.id,), 1)
 
     @action(methods=('delete',), detail=True)
     def delete(self, request, recipe_id):
         """Удаление избранных рецептов."""
-        user = request.user
-        if not user.favorite.select_related(
-                'favorite_recipe').filter(
-                    favorite_recipe_id=recipe_id).exists():
+        if not FAVORITES.discard(request.user, int(recipe_id)):
             return Response({'errors': 'Рецепт не в избранном'},
                             status=status.HTTP_400_BAD_REQUEST)
-
-        get_object_or_404(
-            FavoriteRecipe,
-            user=user,
-            favorite_recipe_id=recipe_id).delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
 
@@ -227,12 +338,7 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
         user = self.request.user.id
         return ShoppingCart.objects.filter(user=user)
 
-    def get_serializer_context(self):
-        """Получение контекста."""
-        context = super().get_serializer_context()
-        context['recipe_id'] = self.kwargs.get('recipe_id')
-        return context
-
+    @transaction.atomic
     def perform_create(self, serializer):
         """Создание корзины покупок."""
         recipe_id = self.kwargs.get('recipe_id')
@@ -243,19 +349,19 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
         except Recipe.DoesNotExist:
             raise ValidationError({'errors': 'Рецепт не существует'}, code=400)
 
-        serializer.save(user=user, recipe=recipe)
+        SHOPPING_CART.lock(user)
+        self.save_unique(
+            serializer, 'Рецепт уже добавлен в список покупок',
+            user=user, recipe=recipe,
+        )
+        SHOPPING_CART.changed(user, (recipe.id,), 1)
 
     @action(methods=('delete',), detail=True)
     def delete(self, request, recipe_id):
         """Удаление из корзины покупок."""
-        cart_item = ShoppingCart.objects.filter(
-            user=request.user, recipe_id=recipe_id
-        ).first()
-
-        if not cart_item:
+        if not SHOPPING_CART.discard(request.user, int(recipe_id)):
             return Response(
                 {'errors': 'Рецепта нет в корзине'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        cart_item.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -0,0 +1,12 @@
+"""Замеры производительности.
+
+Запускаются отдельно от тестов::
+
+    pytest benchmarks --benchmark-json=benchmarks.json
+
+Объём данных задаёт переменная окружения ``BENCHMARK_SCALE``: при
+значении 1 он соответствует описанию замера, по умолчанию данные
+уменьшены в сто раз.
+
+Сценарии нагрузки на HTTP API для Locust описаны в ``locustfile.py``.
+"""
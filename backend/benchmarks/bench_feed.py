@@ -0,0 +1,90 @@
+"""Лента подписок: раскладка на 10 000 подписчиков и чтение страниц."""
+
+import pytest
+from django.core.management import call_command
+from recipes.models import FeedItem, Recipe
+from users.models import Subscribe
+
+from .utils import (BATCH_SIZE, client_for, create_ingredients, create_recipes,
+                    create_users, scaled)
+
+pytestmark = pytest.mark.django_db
+
+FOLLOWERS = 10_000
+AUTHORS = 20
+RECIPES_PER_AUTHOR = 50
+PAGE_SIZE = 10
+
+
+@pytest.fixture(scope='module')
+def corpus(django_db_setup, django_db_blocker):
+    """У каждого автора ``FOLLOWERS`` подписчиков, среди них читатель.
+
+    Лента читателя заполнена рецептами всех авторов, так что порог
+    раскладки определяет, откуда они выбираются при чтении.
+    """
+    with django_db_blocker.unblock():
+        reader, *followers = create_users(scaled(FOLLOWERS), 'follower')
+        authors = create_users(AUTHORS, 'author')
+        Subscribe.objects.bulk_create(
+            (
+                Subscribe(user=user, author=author)
+                for user in (reader, *followers)
+                for author in authors
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        call_command('reconcile_counters')
+        recipes = create_recipes(
+            authors, AUTHORS * RECIPES_PER_AUTHOR, create_ingredients(20)
+        )
+        FeedItem.objects.bulk_create(
+            (
+                FeedItem(user=reader, recipe=recipe, pub_date=recipe.pub_date)
+                for recipe in recipes
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        yield reader, authors[0]
+        call_command('flush', interactive=False, verbosity=0)
+
+
+def test_fan_out(benchmark, settings, corpus):
+    """Раскладка нового рецепта по лентам всех подписчиков автора."""
+    settings.FEED_FANOUT_MAX_FOLLOWERS = FOLLOWERS + 1
+    _, author = corpus
+    recipes = iter(Recipe.objects.filter(author=author).select_related(
+        'author'
+    ))
+
+    def setup():
+        return (next(recipes),), {}
+
+    benchmark.pedantic(FeedItem.objects.fan_out, setup=setup, rounds=5)
+
+
+@pytest.mark.parametrize('depth', (0, 20))
+@pytest.mark.parametrize('mode', ('inbox', 'pulled'))
+def test_read_page(benchmark, settings, corpus, mode, depth):
+    """Страница ленты: первая и после ``depth`` страниц.
+
+    В режиме ``inbox`` рецепты читаются из ленты, в режиме ``pulled``
+    все авторы выше порога раскладки и выбираются при чтении.
+    """
+    reader, _ = corpus
+    if mode == 'inbox':
+        settings.FEED_FANOUT_MAX_FOLLOWERS = FOLLOWERS + 1
+    else:
+        settings.FEED_FANOUT_MAX_FOLLOWERS = 1
+        FeedItem.objects.filter(user=reader).delete()
+    client = client_for(reader)
+    url = f'/api/recipes/feed/?limit={PAGE_SIZE}'
+    for _ in range(depth):
+        url = client.get(url).data['next']
+
+    def get():
+        response = client.get(url)
+        assert response.status_code == 200
+        assert len(response.data['results']) == PAGE_SIZE
+
+    benchmark(get)
@@ -0,0 +1,118 @@
+"""Горячие пути сериализаторов и списка покупок на синтетических данных."""
+
+import pytest
+from api.exporters import TextExporter
+from api.serializers import RecipeReadSerializer, SubscribeSerializer
+from api.utils import attach_latest_recipes, shopping_list_items
+from django.conf import settings
+from django.core.management import call_command
+from django.db.models import Count
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from users.models import CustomUser, Subscribe
+
+from .utils import client_for, create_ingredients, create_tags, scaled
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZE = settings.REST_FRAMEWORK['PAGE_SIZE']
+RECIPES_LIMIT = 3
+DATA = {
+    'users': 10_000,
+    'recipes': 100_000,
+    'favorites': 500_000,
+    'carts': 200_000,
+    'subscriptions': 200_000,
+}
+
+
+@pytest.fixture(scope='module')
+def corpus(django_db_setup, django_db_blocker):
+    """Данные ``generate_fake_data`` и самый активный пользователь."""
+    with django_db_blocker.unblock():
+        create_tags()
+        create_ingredients(200)
+        call_command(
+            'generate_fake_data', seed=1, stdout=None,
+            **{name: scaled(count) for name, count in DATA.items()},
+        )
+        top = Subscribe.objects.values('user').annotate(
+            count=Count('id')
+        ).order_by('-count', 'user').first()
+        yield CustomUser.objects.get(pk=top['user'])
+        call_command('flush', interactive=False, verbosity=0)
+
+
+@pytest.fixture
+def context(corpus):
+    request = Request(APIRequestFactory().get('/api/recipes/'))
+    request.user = corpus
+    return {'request': request, 'recipes_limit': RECIPES_LIMIT}
+
+
+def without_snapshots(recipes):
+    recipes = list(recipes)
+    for recipe in recipes:
+        recipe.snapshot = None
+    return recipes
+
+
+def test_recipe_list(benchmark, corpus, context):
+    benchmark(lambda: RecipeReadSerializer(
+        Recipe.objects.with_user_annotations(corpus)[:PAGE_SIZE],
+        many=True, context=context,
+    ).data)
+
+
+def test_recipe_list_relational(benchmark, corpus, context):
+    """Список без снимков: связи читаются из таблиц."""
+    benchmark(lambda: RecipeReadSerializer(
+        without_snapshots(
+            Recipe.objects.with_user_annotations(corpus)[:PAGE_SIZE]
+        ),
+        many=True, context=context,
+    ).data)
+
+
+def test_recipe_detail(benchmark, corpus, context):
+    recipe = Recipe.objects.order_by('id').first()
+    benchmark(lambda: RecipeReadSerializer(
+        Recipe.objects.with_user_annotations(corpus).get(pk=recipe.pk),
+        context=context,
+    ).data)
+
+
+def test_subscriptions(benchmark, corpus, context):
+    def serialize():
+        page = list(Subscribe.objects.filter(
+            user=corpus
+        ).select_related('author').order_by('-id')[:PAGE_SIZE])
+        attach_latest_recipes(page, RECIPES_LIMIT)
+        return SubscribeSerializer(page, many=True, context=context).data
+
+    assert serialize()
+    benchmark(serialize)
+
+
+def test_shopping_list(benchmark, corpus):
+    assert benchmark(lambda: ''.join(
+        TextExporter().stream(shopping_list_items(corpus))
+    ))
+
+
+@pytest.mark.parametrize('url', (
+    '/api/recipes/',
+    '/api/users/subscriptions/',
+    '/api/recipes/download_shopping_cart/',
+))
+def test_endpoint(benchmark, corpus, url):
+    """Ответ API целиком, вместе с авторизацией и отрисовкой."""
+    client = client_for(corpus)
+
+    def get():
+        response = client.get(url)
+        assert response.status_code in (200, 400)
+        return b''.join(response) if response.streaming else response.content
+
+    benchmark(get)
@@ -0,0 +1,92 @@
+"""Загрузка каталога из 1 000 000 ингредиентов."""
+
+import csv
+import json
+
+import pytest
+from api.utils import raw_delete
+from django.core.management import call_command
+from recipes.models import Ingredient
+
+from .utils import BATCH_SIZE, scaled
+
+pytestmark = pytest.mark.django_db
+
+INGREDIENTS = 1_000_000
+UNITS = ('г', 'кг', 'мл', 'шт.', 'по вкусу')
+
+
+def rows():
+    for number in range(scaled(INGREDIENTS)):
+        yield {
+            'name': f'ингредиент {number}',
+            'measurement_unit': UNITS[number % len(UNITS)],
+        }
+
+
+@pytest.fixture(scope='module')
+def catalog(tmp_path_factory):
+    """Каталог в CSV и JSONL."""
+    directory = tmp_path_factory.mktemp('catalog')
+    paths = {
+        'csv': directory / 'ingredients.csv',
+        'jsonl': directory / 'ingredients.jsonl',
+    }
+    with open(paths['csv'], 'w', encoding='utf-8', newline='') as output:
+        writer = csv.DictWriter(output, ('name', 'measurement_unit'))
+        writer.writeheader()
+        writer.writerows(rows())
+    with open(paths['jsonl'], 'w', encoding='utf-8') as output:
+        for row in rows():
+            output.write(json.dumps(row, ensure_ascii=False) + '\n')
+    return {name: str(path) for name, path in paths.items()}
+
+
+def clear():
+    raw_delete(Ingredient.objects.all())
+
+
+def bulk_create_all(path):
+    """Прежняя загрузка: весь файл одним ``bulk_create``."""
+    with open(path, encoding='utf-8') as source:
+        Ingredient.objects.bulk_create(
+            [Ingredient(**row) for row in csv.DictReader(source)],
+            batch_size=BATCH_SIZE,
+        )
+
+
+def test_bulk_create_all(benchmark, catalog):
+    benchmark.pedantic(
+        bulk_create_all, (catalog['csv'],), setup=clear, rounds=3
+    )
+
+
+@pytest.mark.parametrize('file_format', ('csv', 'jsonl'))
+def test_import(benchmark, catalog, file_format):
+    """Загрузка в пустую таблицу пачками с обновлением по ключу."""
+    benchmark.pedantic(
+        call_command, ('import_ingredients', '--path', catalog[file_format]),
+        setup=clear, rounds=3,
+    )
+    assert Ingredient.objects.count() == scaled(INGREDIENTS)
+
+
+def test_import_copy(benchmark, catalog):
+    benchmark.pedantic(
+        call_command,
+        ('import_ingredients', '--path', catalog['csv'], '--copy'),
+        setup=clear, rounds=3,
+    )
+    assert Ingredient.objects.count() == scaled(INGREDIENTS)
+
+
+@pytest.mark.parametrize('copy', (False, True), ids=('batches', 'copy'))
+def test_reimport(benchmark, catalog, copy):
+    """Повторная загрузка того же каталога: все записи пропускаются."""
+    args = ['import_ingredients', '--path', catalog['csv']]
+    if copy:
+        args.append('--copy')
+    clear()
+    call_command(*args)
+    benchmark.pedantic(call_command, args, rounds=3)
+    assert Ingredient.objects.count() == scaled(INGREDIENTS)
@@ -0,0 +1,38 @@
+"""Поиск ингредиентов: индекс в памяти, pg_trgm и фильтр по префиксу."""
+
+import pytest
+from recipes.models import Ingredient
+from recipes.search import ingredient_search_index, search_ingredients
+
+from .utils import load_ingredients
+
+pytestmark = pytest.mark.django_db
+
+QUERIES = {
+    'prefix': 'сыр',
+    'substring': 'соус',
+    'typo': 'памидор',
+}
+
+
+@pytest.fixture
+def ingredients():
+    load_ingredients()
+    ingredient_search_index.invalidate()
+
+
+@pytest.mark.parametrize('query', QUERIES.values(), ids=QUERIES.keys())
+@pytest.mark.parametrize('backend', ('memory', 'postgres'))
+def test_search(benchmark, settings, ingredients, backend, query):
+    settings.INGREDIENT_SEARCH_BACKEND = backend
+    benchmark(lambda: list(search_ingredients(
+        Ingredient.objects.all(), query
+    )))
+
+
+@pytest.mark.parametrize('query', QUERIES.values(), ids=QUERIES.keys())
+def test_istartswith(benchmark, ingredients, query):
+    """Прежний фильтр ``IngredientFilter`` без ограничения выдачи."""
+    benchmark(lambda: list(Ingredient.objects.filter(
+        name__istartswith=query
+    )))
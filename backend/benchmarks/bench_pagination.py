@@ -0,0 +1,66 @@
+"""Страницы списка рецептов с 1 по 10 000: OFFSET и курсор."""
+
+import json
+from base64 import urlsafe_b64encode
+
+import pytest
+from django.core.management import call_command
+from recipes.models import Recipe
+
+from .utils import (client_for, create_ingredients, create_recipes,
+                    create_tags, create_users, scaled)
+
+pytestmark = pytest.mark.django_db
+
+PAGE_SIZE = 10
+PAGES = scaled(10_000)
+PAGE_NUMBERS = [
+    number for number in (1, 10, 100, 1000, 10_000) if number <= PAGES
+]
+
+
+@pytest.fixture(scope='module')
+def corpus(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        create_recipes(
+            create_users(scaled(1000)), PAGES * PAGE_SIZE,
+            create_ingredients(50), tags=create_tags(),
+        )
+        yield
+        call_command('flush', interactive=False, verbosity=0)
+
+
+def cursor_for(page):
+    """Курсор страницы: позиция последнего рецепта предыдущей."""
+    if page == 1:
+        return ''
+    last = Recipe.objects.order_by('-pub_date', '-id').values_list(
+        'pub_date', 'id'
+    )[(page - 1) * PAGE_SIZE - 1]
+    return urlsafe_b64encode(
+        json.dumps([list(last), False], default=str).encode()
+    ).decode()
+
+
+def get(client, url):
+    response = client.get(url)
+    assert response.status_code == 200
+    assert len(response.data['results']) == PAGE_SIZE
+    return response
+
+
+@pytest.mark.parametrize('page', PAGE_NUMBERS)
+def test_offset(benchmark, corpus, page):
+    client = client_for()
+    benchmark(get, client, f'/api/recipes/?limit={PAGE_SIZE}&page={page}')
+
+
+@pytest.mark.parametrize('page', PAGE_NUMBERS)
+def test_cursor(benchmark, corpus, page):
+    client = client_for()
+    url = f'/api/recipes/?limit={PAGE_SIZE}&cursor={cursor_for(page)}'
+    first = get(client, url).data['results'][0]['id']
+    assert first == Recipe.objects.order_by('-pub_date', '-id').values_list(
+        'id', flat=True
+    )[(page - 1) * PAGE_SIZE]
+    benchmark(get, client, url)
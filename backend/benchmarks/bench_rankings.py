@@ -0,0 +1,83 @@
+"""Пересчёт рейтингов и сортировка по ним при 1 000 000 избранных."""
+
+import pytest
+from django.core.management import call_command
+from recipes.models import FavoriteRecipe, RankingCheckpoint
+
+from .utils import (BATCH_SIZE, client_for, create_ingredients, create_recipes,
+                    create_tags, create_users, scaled)
+
+pytestmark = pytest.mark.django_db
+
+FAVORITES = 1_000_000
+PER_USER = 100
+NEW_FAVORITES = 10_000
+
+
+def create_favorites(users, recipes, per_user, offset=0):
+    """Избранное: у каждого пользователя свои ``per_user`` рецептов."""
+    FavoriteRecipe.objects.bulk_create(
+        (
+            FavoriteRecipe(
+                user=user,
+                favorite_recipe=recipes[
+                    (number * 7 + offset + index) % len(recipes)
+                ],
+            )
+            for number, user in enumerate(users)
+            for index in range(per_user)
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+@pytest.fixture(scope='module')
+def corpus(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        users = create_users(scaled(FAVORITES // PER_USER))
+        recipes = create_recipes(
+            users, scaled(FAVORITES // 10), create_ingredients(50),
+            tags=create_tags(),
+        )
+        create_favorites(users, recipes, PER_USER)
+        call_command('reconcile_counters')
+        yield users, recipes
+        call_command('flush', interactive=False, verbosity=0)
+
+
+def test_full_refresh(benchmark, corpus):
+    """Первый пересчёт по всему избранному."""
+    def setup():
+        RankingCheckpoint.objects.all().delete()
+
+    benchmark.pedantic(
+        call_command, ('refresh_rankings',), setup=setup, rounds=3
+    )
+
+
+def test_incremental_refresh(benchmark, corpus):
+    """Пересчёт после добавления новой порции избранного."""
+    users, recipes = corpus
+    call_command('refresh_rankings')
+    per_user = max(1, scaled(NEW_FAVORITES) // len(users))
+    offsets = iter(range(PER_USER, 10 ** 6, per_user))
+
+    def setup():
+        create_favorites(users, recipes, per_user, next(offsets))
+
+    benchmark.pedantic(
+        call_command, ('refresh_rankings',), setup=setup, rounds=5
+    )
+
+
+@pytest.mark.parametrize('ordering', ('popular', 'trending'))
+def test_ordered_page(benchmark, corpus, ordering):
+    call_command('refresh_rankings')
+    client = client_for()
+
+    def get():
+        response = client.get(f'/api/recipes/?ordering={ordering}&limit=10')
+        assert response.status_code == 200
+
+    benchmark(get)
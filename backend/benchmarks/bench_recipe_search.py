@@ -0,0 +1,48 @@
+"""Полнотекстовый поиск по синтетическому корпусу из 100 000 рецептов."""
+
+import pytest
+from django.core.management import call_command
+from recipes.models import Recipe
+from recipes.search import search_recipes, update_search_vectors
+
+from .utils import (BATCH_SIZE, create_recipes, create_tags, create_users,
+                    load_ingredients, scaled)
+
+pytestmark = pytest.mark.django_db
+
+RECIPES = 100_000
+QUERIES = {
+    'word': 'сыр',
+    'phrase': 'томатный соус',
+    'name': 'рецепт 42',
+    'missing': 'несуществующее',
+}
+
+
+@pytest.fixture(scope='module')
+def corpus(django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        recipes = create_recipes(
+            create_users(scaled(1000)), scaled(RECIPES), load_ingredients(),
+            per_recipe=8, tags=create_tags(),
+        )
+        for start in range(0, len(recipes), BATCH_SIZE):
+            update_search_vectors(Recipe.objects.filter(
+                id__in=[
+                    recipe.id for recipe in recipes[start:start + BATCH_SIZE]
+                ]
+            ))
+        yield
+        call_command('flush', interactive=False, verbosity=0)
+
+
+@pytest.mark.parametrize('query', QUERIES.values(), ids=QUERIES.keys())
+def test_first_page(benchmark, corpus, query):
+    benchmark(lambda: list(search_recipes(
+        Recipe.objects.defer('search_vector'), query
+    )[:10]))
+
+
+@pytest.mark.parametrize('query', QUERIES.values(), ids=QUERIES.keys())
+def test_count(benchmark, corpus, query):
+    benchmark(lambda: search_recipes(Recipe.objects.all(), query).count())
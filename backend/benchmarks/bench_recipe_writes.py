@@ -0,0 +1,93 @@
+"""Создание и обновление рецептов с 5, 50 и 500 ингредиентами."""
+
+import pytest
+from api.serializers import RecipeCreateSerializer
+from recipes.models import Recipe
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from .utils import IMAGE, create_ingredients, create_tags, create_users
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def context(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.IMAGE_PROCESSING_MODE = 'worker'
+    request = Request(APIRequestFactory().post('/api/recipes/'))
+    request.user = create_users(1)[0]
+    return {'request': request}
+
+
+@pytest.fixture
+def ingredients():
+    return create_ingredients(600)
+
+
+@pytest.fixture
+def tags():
+    return create_tags()
+
+
+def recipe_data(ingredients, tags, amount=1):
+    return {
+        'name': 'Рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': [tag.id for tag in tags],
+        'ingredients': [
+            {'id': ingredient.id, 'amount': amount}
+            for ingredient in ingredients
+        ],
+    }
+
+
+def save(context, data, instance=None):
+    if instance is not None:
+        instance = Recipe.objects.get(pk=instance.pk)
+    serializer = RecipeCreateSerializer(
+        instance, data=data, partial=instance is not None, context=context
+    )
+    serializer.is_valid(raise_exception=True)
+    return serializer.save(author=context['request'].user)
+
+
+@pytest.mark.parametrize('size', (5, 50, 500))
+def test_create(benchmark, context, ingredients, tags, size):
+    data = recipe_data(ingredients[:size], tags)
+    benchmark(save, context, data)
+
+
+@pytest.mark.parametrize('size', (5, 50, 500))
+def test_update_one_amount(benchmark, context, ingredients, tags, size):
+    """Изменение количества одного ингредиента."""
+    recipe = save(context, recipe_data(ingredients[:size], tags))
+    data = recipe_data(ingredients[:size], tags[:2])
+    del data['image']
+    amounts = iter(range(2, 10 ** 6))
+
+    def update():
+        data['ingredients'][0]['amount'] = next(amounts)
+        save(context, data, recipe)
+
+    benchmark(update)
+
+
+@pytest.mark.parametrize('size', (5, 50, 500))
+def test_update_replace_half(benchmark, context, ingredients, tags, size):
+    """Замена половины ингредиентов рецепта."""
+    recipe = save(context, recipe_data(ingredients[:size], tags))
+    variants = [
+        recipe_data(ingredients[:size], tags),
+        recipe_data(ingredients[size // 2:size + size // 2], tags),
+    ]
+    for data in variants:
+        del data['image']
+    rounds = iter(range(10 ** 6))
+
+    def update():
+        save(context, variants[next(rounds) % 2], recipe)
+
+    benchmark(update)
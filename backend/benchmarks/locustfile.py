@@ -0,0 +1,214 @@
+"""Сценарии нагрузки на HTTP API в формате Locust.
+
+Запуск против сервера с данными ``generate_fake_data``::
+
+    locust -f benchmarks/locustfile.py --host http://localhost:8000
+
+Locust в зависимости проекта не входит. Без него каждый сценарий можно
+один раз прогнать для проверки, времена ответов выводятся в JSON::
+
+    python benchmarks/locustfile.py http://localhost:8000
+
+Пользователи входят под учётными записями ``generate_fake_data``;
+их число задаёт переменная окружения ``FAKE_USERS``.
+"""
+
+import json
+import os
+import random
+import sys
+from time import perf_counter
+
+import requests
+
+FAKE_USERS = int(os.getenv('FAKE_USERS', 1000))
+FAKE_PASSWORD = 'fake-password'
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAA'
+    'FklEQVR4nGP8//8/AwMDEwMDAwMDAwAkBgMB/DXemwAAAABJRU5ErkJggg=='
+)
+
+
+def log_in(client):
+    """Вход случайным пользователем, возвращает его токен."""
+    number = random.randint(1, FAKE_USERS)
+    response = client.post('/api/auth/token/login/', json={
+        'email': f'fake{number}@example.com',
+        'password': FAKE_PASSWORD,
+    }, name='/api/auth/token/login/')
+    response.raise_for_status()
+    token = response.json()['auth_token']
+    client.headers['Authorization'] = f'Token {token}'
+    return token
+
+
+def pick_recipe(client, page=1):
+    response = client.get(
+        f'/api/recipes/?page={page}', name='/api/recipes/?page=[page]'
+    )
+    response.raise_for_status()
+    return random.choice(response.json()['results'])
+
+
+def browse(client):
+    """Гость листает рецепты, фильтрует по тегу и открывает рецепт."""
+    tag = random.choice(client.get('/api/tags/', name='/api/tags/').json())
+    client.get(
+        f'/api/recipes/?tags={tag["slug"]}', name='/api/recipes/?tags=[slug]'
+    )
+    recipe = pick_recipe(client, random.randint(1, 20))
+    client.get(f'/api/recipes/{recipe["id"]}/', name='/api/recipes/[id]/')
+    client.get('/api/ingredients/?name=сол', name='/api/ingredients/?name=')
+
+
+def plan_meals(client):
+    """Пользователь собирает корзину и скачивает список покупок."""
+    recipe_ids = [
+        pick_recipe(client, page)['id'] for page in range(1, 4)
+    ]
+    for recipe_id in recipe_ids:
+        client.post(
+            f'/api/recipes/{recipe_id}/favorite/',
+            name='/api/recipes/[id]/favorite/',
+        )
+    client.post('/api/recipes/shopping_cart/', json={
+        'recipes': recipe_ids,
+    }, name='/api/recipes/shopping_cart/')
+    client.get(
+        '/api/recipes/?is_in_shopping_cart=1',
+        name='/api/recipes/?is_in_shopping_cart=1',
+    )
+    client.get(
+        '/api/recipes/download_shopping_cart/',
+        name='/api/recipes/download_shopping_cart/',
+    )
+    client.delete('/api/recipes/shopping_cart/', json={
+        'recipes': recipe_ids,
+    }, name='/api/recipes/shopping_cart/')
+    for recipe_id in recipe_ids:
+        client.delete(
+            f'/api/recipes/{recipe_id}/favorite/',
+            name='/api/recipes/[id]/favorite/',
+        )
+
+
+def follow(client):
+    """Пользователь подписывается на автора и читает ленту."""
+    author = pick_recipe(client, random.randint(1, 20))['author']
+    subscribe = f'/api/users/{author["id"]}/subscribe/'
+    client.post(subscribe, name='/api/users/[id]/subscribe/')
+    client.get(
+        '/api/users/subscriptions/?recipes_limit=3',
+        name='/api/users/subscriptions/',
+    )
+    client.get('/api/recipes/feed/', name='/api/recipes/feed/')
+    client.delete(subscribe, name='/api/users/[id]/subscribe/')
+
+
+def publish(client):
+    """Автор публикует рецепт, правит его и удаляет."""
+    tag = random.choice(client.get('/api/tags/', name='/api/tags/').json())
+    ingredients = client.get(
+        '/api/ingredients/?name=сол', name='/api/ingredients/?name='
+    ).json()[:3]
+    recipe = {
+        'name': 'Нагрузочный рецепт',
+        'text': 'Описание',
+        'cooking_time': 10,
+        'image': IMAGE,
+        'tags': [tag['id']],
+        'ingredients': [
+            {'id': ingredient['id'], 'amount': 100}
+            for ingredient in ingredients
+        ],
+    }
+    response = client.post(
+        '/api/recipes/', json=recipe, name='/api/recipes/ POST'
+    )
+    if response.status_code != 201:
+        return
+    url = f'/api/recipes/{response.json()["id"]}/'
+    client.patch(
+        url, json=dict(recipe, cooking_time=20), name='/api/recipes/[id]/'
+    )
+    client.delete(url, name='/api/recipes/[id]/')
+
+
+JOURNEYS = {
+    'browse': (browse, False),
+    'plan_meals': (plan_meals, True),
+    'follow': (follow, True),
+    'publish': (publish, True),
+}
+
+try:
+    from locust import HttpUser, between, task
+except ImportError:
+    pass
+else:
+    class Guest(HttpUser):
+        weight = 3
+        wait_time = between(1, 3)
+
+        @task
+        def browse(self):
+            browse(self.client)
+
+    class Cook(HttpUser):
+        weight = 2
+        wait_time = between(1, 5)
+
+        def on_start(self):
+            log_in(self.client)
+
+        @task(3)
+        def browse(self):
+            browse(self.client)
+
+        @task(2)
+        def plan_meals(self):
+            plan_meals(self.client)
+
+        @task(2)
+        def follow(self):
+            follow(self.client)
+
+        @task(1)
+        def publish(self):
+            publish(self.client)
+
+
+class Session(requests.Session):
+    """Клиент с базовым адресом и параметром ``name``, как в Locust."""
+
+    def __init__(self, host):
+        super().__init__()
+        self.host = host.rstrip('/')
+        self.timings = []
+
+    def request(self, method, url, name=None, **kwargs):
+        start = perf_counter()
+        response = super().request(method, self.host + url, **kwargs)
+        self.timings.append({
+            'name': name or url,
+            'method': method,
+            'status': response.status_code,
+            'ms': round((perf_counter() - start) * 1000, 3),
+        })
+        return response
+
+
+def main(host):
+    """Однократный прогон всех сценариев без Locust."""
+    results = {}
+    for name, (journey, authenticated) in JOURNEYS.items():
+        with Session(host) as client:
+            if authenticated:
+                log_in(client)
+            journey(client)
+            results[name] = client.timings
+    json.dump(results, sys.stdout, ensure_ascii=False, indent=2)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1] if len(sys.argv) > 1 else 'http://localhost:8000')
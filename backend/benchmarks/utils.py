@@ -0,0 +1,115 @@
+"""Данные для замеров производительности."""
+
+import csv
+import os
+from pathlib import Path
+
+from django.contrib.auth.hashers import make_password
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from rest_framework.test import APIClient
+from users.models import CustomUser
+
+INGREDIENTS_CSV = (
+    Path(__file__).resolve().parents[1] / 'data' / 'ingredients.csv'
+)
+SCALE = float(os.getenv('BENCHMARK_SCALE', '0.01'))
+BATCH_SIZE = 5000
+IMAGE = (
+    'data:image/png;base64,iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAA'
+    'FklEQVR4nGP8//8/AwMDEwMDAwMDAwAkBgMB/DXemwAAAABJRU5ErkJggg=='
+)
+
+
+def scaled(count):
+    """Объём данных с учётом ``BENCHMARK_SCALE``."""
+    return max(1, int(count * SCALE))
+
+
+def create_users(count, prefix='user'):
+    password = make_password('password-123')
+    return CustomUser.objects.bulk_create(
+        (
+            CustomUser(
+                username=f'{prefix}{number}',
+                email=f'{prefix}{number}@example.com',
+                password=password,
+                first_name='Имя',
+                last_name='Фамилия',
+            )
+            for number in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def create_ingredients(count, prefix='Ингредиент'):
+    return Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=f'{prefix} {number}', measurement_unit='г')
+            for number in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+def load_ingredients():
+    """Ингредиенты из справочника проекта."""
+    with open(INGREDIENTS_CSV, encoding='utf-8') as data:
+        return Ingredient.objects.bulk_create(
+            Ingredient(**row) for row in csv.DictReader(data)
+        )
+
+
+def create_tags(count=3):
+    return Tag.objects.bulk_create(
+        Tag(name=f'Тег {number}', color=f'#00000{number}', slug=f'tag{number}')
+        for number in range(count)
+    )
+
+
+def create_recipes(authors, count, ingredients, per_recipe=5, tags=()):
+    """Рецепты пачками, по ``per_recipe`` ингредиентов в каждом."""
+    recipes = Recipe.objects.bulk_create(
+        (
+            Recipe(
+                author=authors[number % len(authors)],
+                name=f'Рецепт {number}',
+                text=f'Описание рецепта {number}',
+                cooking_time=10,
+                image='recipes/images/test.png',
+            )
+            for number in range(count)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    IngredientAmount.objects.bulk_create(
+        (
+            IngredientAmount(
+                recipe=recipe,
+                ingredient=ingredients[
+                    (number + offset) % len(ingredients)
+                ],
+                amount=offset + 1,
+            )
+            for number, recipe in enumerate(recipes)
+            for offset in range(min(per_recipe, len(ingredients)))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Through = Recipe.tags.through
+    Through.objects.bulk_create(
+        (
+            Through(recipe=recipe, tag=tag)
+            for recipe in recipes
+            for tag in tags
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    return recipes
+
+
+def client_for(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
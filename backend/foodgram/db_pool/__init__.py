@@ -0,0 +1 @@
+"""PostgreSQL с пулом подключений внутри процесса."""
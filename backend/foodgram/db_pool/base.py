@@ -0,0 +1,84 @@
+"""Бэкенд PostgreSQL, берущий подключения из пула процесса.
+
+Django закрывает подключение в конце запроса, а этот бэкенд вместо
+закрытия возвращает его в пул. Размер пула задаётся параметром
+``pool_size`` в ``OPTIONS``; если свободных подключений нет, поток
+ждёт не дольше ``pool_timeout`` секунд.
+"""
+
+from threading import BoundedSemaphore, Lock
+
+import psycopg2.extras
+from django.db import OperationalError
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+from psycopg2.pool import ThreadedConnectionPool
+
+DEFAULT_POOL_TIMEOUT = 10
+
+_pools = {}
+_pools_lock = Lock()
+
+
+class ConnectionPool:
+    """Пул подключений одного алиаса базы данных."""
+
+    def __init__(self, size, timeout, conn_params):
+        self.timeout = timeout
+        self.slots = BoundedSemaphore(size)
+        self.pool = ThreadedConnectionPool(0, size, **conn_params)
+
+    def getconn(self):
+        if not self.slots.acquire(timeout=self.timeout):
+            raise OperationalError(
+                'Нет свободных подключений к базе данных в пуле'
+            )
+        try:
+            return self.pool.getconn()
+        except Exception:
+            self.slots.release()
+            raise
+
+    def putconn(self, connection):
+        try:
+            self.pool.putconn(connection, close=bool(connection.closed))
+        finally:
+            self.slots.release()
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+
+    def get_connection_params(self):
+        conn_params = super().get_connection_params()
+        self.pool_size = conn_params.pop('pool_size')
+        self.pool_timeout = conn_params.pop(
+            'pool_timeout', DEFAULT_POOL_TIMEOUT
+        )
+        return conn_params
+
+    def get_pool(self, conn_params):
+        with _pools_lock:
+            if self.alias not in _pools:
+                _pools[self.alias] = ConnectionPool(
+                    self.pool_size, self.pool_timeout, conn_params
+                )
+            return _pools[self.alias]
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool(conn_params).getconn()
+        options = self.settings_dict['OPTIONS']
+        self.isolation_level = options.get(
+            'isolation_level', connection.isolation_level
+        )
+        if self.isolation_level != connection.isolation_level:
+            connection.set_session(isolation_level=self.isolation_level)
+        psycopg2.extras.register_default_jsonb(
+            conn_or_curs=connection, loads=lambda x: x
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                return _pools[self.alias].putconn(self.connection)
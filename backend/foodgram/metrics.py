@@ -0,0 +1,218 @@
+"""Метрики запросов к API.
+
+Метрики копятся в памяти процесса и отдаются в текстовом формате
+Prometheus. Каждый запрос дополнительно пишется строкой JSON в лог
+``foodgram.metrics``, по которому команда ``report_hot_paths`` строит
+отчёт о самых медленных представлениях.
+"""
+
+import json
+import logging
+import re
+from collections import Counter
+from contextvars import ContextVar
+from threading import Lock
+from time import perf_counter
+
+from api.cache import CACHE_NAMES, get_cache_stats
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger('foodgram.metrics')
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SKIPPED_STATEMENTS = ('SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK')
+PARAMS_LIST = re.compile(r'\((?:%s, )+%s\)')
+NUMBER = re.compile(r'\b\d+\b')
+
+current_stats = ContextVar('current_stats', default=None)
+
+
+def normalize_sql(sql):
+    """SQL без различий в длине списков параметров и в числах."""
+    return NUMBER.sub('?', PARAMS_LIST.sub('(%s, ...)', sql))
+
+
+class RequestStats:
+    """Запросы к базе данных одного HTTP-запроса.
+
+    Экземпляр становится текущим через ``current_stats`` и получает
+    запросы от ``record_query``.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0
+        self.render_time = 0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        start = perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += perf_counter() - start
+            self.queries += 1
+            if not sql.startswith(SKIPPED_STATEMENTS):
+                self.statements[normalize_sql(sql)] += 1
+
+    def duplicates(self):
+        """Запросы, повторившиеся подозрительно много раз (N+1)."""
+        threshold = settings.INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD
+        return [
+            {'sql': sql, 'count': count}
+            for sql, count in self.statements.most_common()
+            if count >= threshold
+        ]
+
+
+def record_query(execute, sql, params, many, context):
+    """Обёртка подключений, передающая запросы текущему ``RequestStats``.
+
+    Переменная контекста копируется и в потоки ``sync_to_async``, так
+    что учитываются запросы, выполненные в пуле потоков.
+    """
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    return stats(execute, sql, params, many, context)
+
+
+def instrument_connection(sender=None, connection=None, **kwargs):
+    """Подключение ``record_query`` к подключению к базе данных.
+
+    Обработчик сигнала ``connection_created``: у каждого потока свои
+    подключения, и обёртка добавляется там, где выполняются запросы.
+    """
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class EndpointMetrics:
+    """Накопленные метрики одного представления и метода."""
+    __slots__ = (
+        'requests', 'buckets', 'duration', 'queries', 'sql_time',
+        'render_time', 'response_bytes', 'duplicates',
+    )
+
+    def __init__(self):
+        self.requests = 0
+        self.buckets = [0] * len(DURATION_BUCKETS)
+        self.duration = 0
+        self.queries = 0
+        self.sql_time = 0
+        self.render_time = 0
+        self.response_bytes = 0
+        self.duplicates = 0
+
+
+class MetricsRegistry:
+    """Метрики всех представлений процесса."""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._endpoints = {}
+
+    def observe(self, view, method, duration, stats, response_bytes,
+                duplicates):
+        with self._lock:
+            metrics = self._endpoints.get((view, method))
+            if metrics is None:
+                metrics = self._endpoints[view, method] = EndpointMetrics()
+            metrics.requests += 1
+            for index, bound in enumerate(DURATION_BUCKETS):
+                if duration <= bound:
+                    metrics.buckets[index] += 1
+            metrics.duration += duration
+            metrics.queries += stats.queries
+            metrics.sql_time += stats.sql_time
+            metrics.render_time += stats.render_time
+            metrics.response_bytes += response_bytes
+            metrics.duplicates += bool(duplicates)
+
+    def render(self):
+        """Метрики в текстовом формате Prometheus."""
+        with self._lock:
+            endpoints = sorted(self._endpoints.items())
+            lines = [
+                '# TYPE foodgram_request_duration_seconds histogram',
+            ]
+            for (view, method), metrics in endpoints:
+                labels = f'view="{view}",method="{method}"'
+                for bound, count in zip(DURATION_BUCKETS, metrics.buckets):
+                    lines.append(
+                        'foodgram_request_duration_seconds_bucket'
+                        f'{{{labels},le="{bound}"}} {count}'
+                    )
+                lines += [
+                    'foodgram_request_duration_seconds_bucket'
+                    f'{{{labels},le="+Inf"}} {metrics.requests}',
+                    f'foodgram_request_duration_seconds_sum{{{labels}}} '
+                    f'{metrics.duration}',
+                    f'foodgram_request_duration_seconds_count{{{labels}}} '
+                    f'{metrics.requests}',
+                ]
+            for name, attribute in (
+                ('foodgram_db_queries_total', 'queries'),
+                ('foodgram_db_query_duration_seconds_total', 'sql_time'),
+                ('foodgram_render_duration_seconds_total', 'render_time'),
+                ('foodgram_response_bytes_total', 'response_bytes'),
+                ('foodgram_duplicate_query_requests_total', 'duplicates'),
+            ):
+                lines.append(f'# TYPE {name} counter')
+                lines += [
+                    f'{name}{{view="{view}",method="{method}"}} '
+                    f'{getattr(metrics, attribute)}'
+                    for (view, method), metrics in endpoints
+                ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def record(request, response, duration, stats):
+    """Учёт завершённого запроса в метриках и в логе."""
+    match = request.resolver_match
+    view = match.view_name if match is not None else 'unresolved'
+    response_bytes = 0 if response.streaming else len(response.content)
+    duplicates = stats.duplicates()
+    registry.observe(
+        view, request.method, duration, stats, response_bytes, duplicates
+    )
+    level = logging.WARNING if duplicates else logging.INFO
+    if logger.isEnabledFor(level):
+        logger.log(level, json.dumps({
+            'view': view,
+            'method': request.method,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'queries': stats.queries,
+            'sql_ms': round(stats.sql_time * 1000, 3),
+            'render_ms': round(stats.render_time * 1000, 3),
+            'bytes': response_bytes,
+            'duplicates': duplicates,
+        }, ensure_ascii=False))
+
+
+def render_cache_stats():
+    """Попадания и промахи кэша в текстовом формате Prometheus.
+
+    Счётчики хранятся в самом кэше и общие для всех процессов.
+    """
+    lines = ['# TYPE foodgram_cache_requests_total counter']
+    for name in CACHE_NAMES:
+        for result, count in get_cache_stats(name).items():
+            lines.append(
+                'foodgram_cache_requests_total'
+                f'{{cache="{name}",result="{result}"}} {count}'
+            )
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Метрики процесса для Prometheus."""
+    return HttpResponse(
+        registry.render() + render_cache_stats(),
+        content_type='text/plain; version=0.0.4',
+    )
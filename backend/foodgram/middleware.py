@@ -0,0 +1,117 @@
+"""Промежуточные слои проекта."""
+
+import asyncio
+from time import perf_counter
+
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.deprecation import MiddlewareMixin
+
+from .metrics import RequestStats, current_stats, instrument_connection, record
+
+
+def close_unusable_connections():
+    """Закрытие оборвавшихся подключений текущего потока.
+
+    Подключение, оборвавшееся со стороны сервера, закрывается, и
+    Django откроет новое вместо ошибки в середине запроса.
+    """
+    for connection in connections.all():
+        if (connection.connection is not None
+                and not connection.in_atomic_block
+                and not connection.is_usable()):
+            connection.close()
+
+
+def set_statement_timeout():
+    """Ограничение ``DB_STATEMENT_TIMEOUT`` для подключений текущего потока.
+
+    Ограничение задаётся на сессию, а не в параметрах подключения, чтобы
+    не действовать на миграции и команды управления. Постоянное
+    подключение настраивается один раз.
+    """
+    for connection in connections.all():
+        connection.ensure_connection()
+        if getattr(connection, 'statement_timeout_for', None) is (
+            connection.connection
+        ):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute(
+                'SET statement_timeout = %s', [settings.DB_STATEMENT_TIMEOUT]
+            )
+        if not connection.in_atomic_block:
+            connection.statement_timeout_for = connection.connection
+
+
+class ConnectionHealthCheckMiddleware(MiddlewareMixin):
+    """Проверка постоянных подключений к базе данных перед запросом."""
+
+    def process_request(self, request):
+        close_unusable_connections()
+
+
+class StatementTimeoutMiddleware(MiddlewareMixin):
+    """Ограничение времени запросов к базе данных для HTTP-запросов."""
+
+    def process_request(self, request):
+        set_statement_timeout()
+
+
+class InstrumentationMiddleware:
+    """Сбор времени ответа, числа и времени запросов к базе данных,
+    времени отрисовки и размера ответа для каждого представления.
+
+    Работает и под WSGI, и под ASGI без перехода в синхронный поток.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+        connection_created.connect(
+            instrument_connection, dispatch_uid='foodgram.instrumentation'
+        )
+        for connection in connections.all():
+            instrument_connection(connection=connection)
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        stats, token = self.start(request)
+        start = perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        record(request, response, perf_counter() - start, stats)
+        return response
+
+    async def __acall__(self, request):
+        stats, token = self.start(request)
+        start = perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        record(request, response, perf_counter() - start, stats)
+        return response
+
+    @staticmethod
+    def start(request):
+        stats = RequestStats()
+        request.instrumentation = stats
+        return stats, current_stats.set(stats)
+
+    def process_template_response(self, request, response):
+        stats = request.instrumentation
+        start = perf_counter()
+
+        def rendered(response):
+            stats.render_time += perf_counter() - start
+
+        response.add_post_render_callback(rendered)
+        return response
@@ -0,0 +1,45 @@
+"""Маршрутизация запросов между основной базой данных и репликой."""
+
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+
+REPLICA = 'replica'
+
+read_from_replica = ContextVar('read_from_replica', default=False)
+
+
+@contextmanager
+def read_from_primary():
+    """Чтение с основной базы данных внутри блока.
+
+    Нужно для данных, которые кладутся в общий кэш: отстающая реплика
+    оставила бы в нём устаревшие данные под новой версией.
+    """
+    token = read_from_replica.set(False)
+    try:
+        yield
+    finally:
+        read_from_replica.reset(token)
+
+
+class ReplicaRouter:
+    """Чтение с реплики, если её включил текущий запрос.
+
+    Запись и миграции всегда идут в основную базу данных.
+    """
+
+    def db_for_read(self, model, **hints):
+        if read_from_replica.get() and REPLICA in settings.DATABASES:
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db != REPLICA
@@ -28,6 +28,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
@@ -68,14 +69,94 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 0))
+
+DB_STATEMENT_TIMEOUT = int(os.getenv('DB_STATEMENT_TIMEOUT', 0))
+
+DB_CONN_HEALTH_CHECKS = (
+    os.getenv('DB_CONN_HEALTH_CHECKS', 'true').lower() in ('1', 'true')
+)
+
+DB_OPTIONS = {}
+if DB_POOL_SIZE:
+    DB_OPTIONS['pool_size'] = DB_POOL_SIZE
+    DB_OPTIONS['pool_timeout'] = float(os.getenv('DB_POOL_TIMEOUT', 10))
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': (
+            'foodgram.db_pool' if DB_POOL_SIZE
+            else 'django.db.backends.postgresql'
+        ),
         'NAME': os.getenv('POSTGRES_DB', 'foodgram'),
         'USER': os.getenv('POSTGRES_USER', 'foodgram'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD', ''),
         'HOST': os.getenv('DB_HOST', ''),
-        'PORT': os.getenv('DB_PORT', 5432)
+        'PORT': os.getenv('DB_PORT', 5432),
+        'CONN_MAX_AGE': (
+            0 if DB_POOL_SIZE else int(os.getenv('DB_CONN_MAX_AGE', 60))
+        ),
+        'OPTIONS': DB_OPTIONS,
+    }
+}
+
+if os.getenv('DB_REPLICA_HOST'):
+    DATABASES['replica'] = {
+        **DATABASES['default'],
+        'HOST': os.getenv('DB_REPLICA_HOST'),
+        'PORT': os.getenv('DB_REPLICA_PORT', DATABASES['default']['PORT']),
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['foodgram.routers.ReplicaRouter']
+
+if DB_STATEMENT_TIMEOUT:
+    MIDDLEWARE.insert(0, 'foodgram.middleware.StatementTimeoutMiddleware')
+
+if DB_CONN_HEALTH_CHECKS:
+    MIDDLEWARE.insert(0, 'foodgram.middleware.ConnectionHealthCheckMiddleware')
+
+INSTRUMENTATION_ENABLED = (
+    os.getenv('INSTRUMENTATION_ENABLED', 'true').lower() in ('1', 'true')
+)
+
+INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD = int(
+    os.getenv('INSTRUMENTATION_DUPLICATE_QUERY_THRESHOLD', 5)
+)
+
+if INSTRUMENTATION_ENABLED:
+    MIDDLEWARE.insert(0, 'foodgram.middleware.InstrumentationMiddleware')
+
+if os.getenv('INSTRUMENTATION_LOG_FILE'):
+    LOGGING = {
+        'version': 1,
+        'disable_existing_loggers': False,
+        'formatters': {
+            'message': {'format': '%(message)s'},
+        },
+        'handlers': {
+            'metrics': {
+                'class': 'logging.FileHandler',
+                'filename': os.getenv('INSTRUMENTATION_LOG_FILE'),
+                'formatter': 'message',
+            },
+        },
+        'loggers': {
+            'foodgram.metrics': {
+                'handlers': ('metrics',),
+                'level': 'INFO',
+                'propagate': False,
+            },
+        },
+    }
+
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
 
@@ -109,6 +190,10 @@ REST_FRAMEWORK = {
     'PAGE_SIZE': 6,
 }
 
+PAGINATION_COUNT_CACHE_TIMEOUT = int(
+    os.getenv('PAGINATION_COUNT_CACHE_TIMEOUT', 60)
+)
+
 DJOSER = {
     'VIEWSET': 'api.views.CustomUserViewSet',
     'HIDE_USERS': False,
@@ -141,3 +226,41 @@ MEDIA_ROOT = BASE_DIR / 'media'
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 AUTH_USER_MODEL = 'users.CustomUser'
+
+INGREDIENT_SEARCH_BACKEND = os.getenv('INGREDIENT_SEARCH_BACKEND', 'memory')
+
+INGREDIENT_SEARCH_LIMIT = 50
+
+REFERENCE_DATA_CACHE_TIMEOUT = 60 * 60 * 24
+
+REFERENCE_DATA_MAX_AGE = int(os.getenv('REFERENCE_DATA_MAX_AGE', 60))
+
+RECIPE_CACHE_TIMEOUT = 60 * 60
+
+TRENDING_HALF_LIFE_HOURS = float(os.getenv('TRENDING_HALF_LIFE_HOURS', 72))
+
+RANKING_PENDING_ID_TIMEOUT = int(
+    os.getenv('RANKING_PENDING_ID_TIMEOUT', 60 * 60)
+)
+
+FEED_FANOUT_MAX_FOLLOWERS = int(os.getenv('FEED_FANOUT_MAX_FOLLOWERS', 1000))
+
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', 50))
+
+IMAGE_PROCESSING_MODE = os.getenv('IMAGE_PROCESSING_MODE', 'thread')
+
+IMAGE_WORKER_THREADS = int(os.getenv('IMAGE_WORKER_THREADS', 2))
+
+IMAGE_MAX_UPLOAD_SIZE = int(os.getenv('IMAGE_MAX_UPLOAD_SIZE', 10 * 1024 ** 2))
+
+IMAGE_MAX_PIXELS = int(os.getenv('IMAGE_MAX_PIXELS', 40_000_000))
+
+RECIPE_MAX_REQUEST_SIZE = int(
+    os.getenv('RECIPE_MAX_REQUEST_SIZE', 16 * 1024 ** 2)
+)
+
+RECIPE_BULK_MAX_SIZE = int(os.getenv('RECIPE_BULK_MAX_SIZE', 100))
+
+ASYNC_VIEWS = os.getenv('ASYNC_VIEWS', '').lower() in ('1', 'true')
+
+ASYNC_VIEWS_THREADS = int(os.getenv('ASYNC_VIEWS_THREADS', 16))
@@ -0,0 +1,94 @@
+"""Тесты промежуточных слоёв проекта."""
+
+import asyncio
+import time
+
+from api.async_views import async_view
+from asgiref.sync import async_to_sync, sync_to_async
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory, TestCase, override_settings
+from recipes.models import Tag
+
+from .middleware import (ConnectionHealthCheckMiddleware,
+                         InstrumentationMiddleware, StatementTimeoutMiddleware)
+
+
+def show_statement_timeout(request):
+    with connection.cursor() as cursor:
+        cursor.execute('SHOW statement_timeout')
+        return HttpResponse(cursor.fetchone()[0])
+
+
+@override_settings(DB_STATEMENT_TIMEOUT=1234)
+class StatementTimeoutMiddlewareTest(TestCase):
+    """Ограничение времени запросов задаётся на время HTTP-запроса."""
+
+    def setUp(self):
+        self.request = RequestFactory().get('/')
+
+    def test_sync(self):
+        middleware = StatementTimeoutMiddleware(show_statement_timeout)
+        self.assertEqual(middleware(self.request).content, b'1234ms')
+
+    def test_async(self):
+        middleware = StatementTimeoutMiddleware(
+            sync_to_async(show_statement_timeout)
+        )
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(self.request)
+        self.assertEqual(response.content, b'1234ms')
+
+
+class ConnectionHealthCheckMiddlewareTest(TestCase):
+
+    def test_async(self):
+        async def get_response(request):
+            return HttpResponse()
+
+        middleware = ConnectionHealthCheckMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+        response = async_to_sync(middleware)(RequestFactory().get('/'))
+        self.assertEqual(response.status_code, 200)
+
+
+class InstrumentationMiddlewareTest(TestCase):
+
+    def test_async_requests_run_concurrently(self):
+        async def get_response(request):
+            await asyncio.sleep(0.5)
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(get_response)
+        self.assertTrue(asyncio.iscoroutinefunction(middleware))
+
+        async def run():
+            return await asyncio.gather(*(
+                middleware(RequestFactory().get('/')) for _ in range(4)
+            ))
+
+        start = time.perf_counter()
+        async_to_sync(run)()
+        self.assertLess(time.perf_counter() - start, 1)
+
+    def test_pool_thread_queries(self):
+        """Учитываются запросы представлений из пула потоков."""
+        def view(request):
+            Tag.objects.count()
+            Tag.objects.exists()
+            connection.close()
+            return HttpResponse()
+
+        middleware = InstrumentationMiddleware(async_view(view))
+        request = RequestFactory().get('/')
+        async_to_sync(middleware)(request)
+        self.assertEqual(request.instrumentation.queries, 2)
+
+    def test_sync_queries(self):
+        def view(request):
+            Tag.objects.count()
+            return HttpResponse()
+
+        request = RequestFactory().get('/')
+        InstrumentationMiddleware(view)(request)
+        self.assertEqual(request.instrumentation.queries, 1)
@@ -0,0 +1,19 @@
+"""Настройки gunicorn.
+
+``SERVER_MODE=asgi`` запускает приложение через воркеры uvicorn,
+по умолчанию используются синхронные WSGI-воркеры.
+"""
+
+import os
+
+server_mode = os.getenv('SERVER_MODE', 'wsgi')
+
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8080')
+workers = int(os.getenv('GUNICORN_WORKERS', 1))
+
+if server_mode == 'asgi':
+    wsgi_app = 'foodgram.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+else:
+    wsgi_app = 'foodgram.wsgi:application'
+    worker_class = 'sync'
@@ -1,8 +1,9 @@
 from django.contrib import admin
-from django.db.models import Count
 
 from .models import (FavoriteRecipe, Ingredient, IngredientAmount, Recipe,
-                     ShoppingCart, Tag)
+                     ShoppingCart, ShoppingListItem, Tag)
+from .search import update_search_vectors
+from .snapshots import update_snapshots
 
 
 class IngredientAmountAdmin(admin.TabularInline):
@@ -38,23 +39,30 @@ class RecipeAdmin(admin.ModelAdmin):
     """Отображение рецептов в админке."""
     inlines = (IngredientAmountAdmin,)
     list_display = (
-        'id', 'name', 'author', 'text', 'favorite_count', 'pub_date'
+        'id', 'name', 'author', 'text', 'favorites_count', 'in_carts_count',
+        'pub_date'
     )
     search_fields = ('name', 'author', 'tags')
     list_filter = ('name', 'author', 'tags', 'pub_date')
     filter_vertical = ('tags',)
     empy_value_display = '-пусто-'
 
-    def favorite_count(self, obj):
-        """Количество избранных рецептов."""
-        return obj.obj_count
-
     def get_queryset(self, request):
         """Метод получения queryset."""
-        queryset = super().get_queryset(request)
-        return queryset.annotate(
-            obj_count=Count("favorite_recipe", distinct=True),
+        return super().get_queryset(request).select_related('author')
+
+    def save_related(self, request, form, formsets, change):
+        """Сохранение связей с пересборкой снимка, поиска и списков покупок."""
+        recipe = form.instance
+        amounts = recipe.recipe.values_list('ingredient_id', 'amount')
+        old_amounts = dict(amounts)
+        super().save_related(request, form, formsets, change)
+        ShoppingListItem.objects.change_recipe(
+            recipe, old_amounts, dict(amounts.all())
         )
+        recipes = Recipe.objects.filter(pk=recipe.pk)
+        update_snapshots(recipes)
+        update_search_vectors(recipes)
 
 
 @admin.register(FavoriteRecipe)
@@ -77,3 +85,11 @@ class ShoppingCartAdmin(admin.ModelAdmin):
     search_fields = ('user', 'recipe')
     list_filter = ('user', 'recipe')
     empy_value_display = '-пусто-'
+
+    def save_model(self, request, obj, form, change):
+        """Сохранение корзины с пересчётом списков покупок."""
+        if change:
+            old = ShoppingCart.objects.get(pk=obj.pk)
+            ShoppingListItem.objects.remove_recipe(old.user, old.recipe_id)
+        super().save_model(request, obj, form, change)
+        ShoppingListItem.objects.add_recipe(obj.user, obj.recipe_id)
@@ -5,3 +5,6 @@ class RecipesConfig(AppConfig):
     """Конфигурация приложения recipes."""
     name = 'recipes'
     default_auto_field = 'django.db.models.BigAutoField'
+
+    def ready(self):
+        from . import signals  # noqa: F401
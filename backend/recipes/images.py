@@ -0,0 +1,141 @@
+"""Обработка изображений рецептов.
+
+Загруженное изображение сохраняется как есть, а уменьшенные копии
+строятся в фоне. Копии называются по хэшу исходного файла, поэтому
+одинаковые изображения обрабатываются и хранятся один раз. Рядом с
+каждой копией лежит WebP-вариант с суффиксом ``.webp``.
+"""
+
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from hashlib import sha256
+from io import BytesIO
+from threading import Lock
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from PIL import Image, ImageOps
+
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+IMAGE_SIZES = {
+    'small': 480,
+    'large': 1280,
+}
+VARIANTS_DIR = 'recipes/variants'
+JPEG_QUALITY = 85
+WEBP_QUALITY = 80
+TRANSPARENT_MODES = ('RGBA', 'LA', 'P')
+
+_executor = None
+_executor_lock = Lock()
+
+
+def save_variant(image, name, image_format, **options):
+    """Сохранение копии изображения без метаданных."""
+    if default_storage.exists(name):
+        return
+    buffer = BytesIO()
+    image.save(buffer, image_format, **options)
+    default_storage.save(name, ContentFile(buffer.getvalue()))
+
+
+def build_variants(image_file):
+    """Уменьшенные копии изображения: имена файлов по размерам."""
+    with image_file.open('rb'):
+        content = image_file.read()
+    digest = sha256(content).hexdigest()
+    with Image.open(BytesIO(content)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode in TRANSPARENT_MODES:
+            image = image.convert('RGBA')
+            image_format, extension, options = 'PNG', 'png', {}
+        else:
+            image = image.convert('RGB')
+            image_format, extension = 'JPEG', 'jpg'
+            options = {'quality': JPEG_QUALITY, 'optimize': True}
+        variants = {}
+        for size, width in IMAGE_SIZES.items():
+            variant = image.copy()
+            variant.thumbnail((width, width))
+            name = f'{VARIANTS_DIR}/{digest[:2]}/{digest}-{size}.{extension}'
+            save_variant(variant, name, image_format, **options)
+            save_variant(
+                variant, f'{name}.webp', 'WEBP', quality=WEBP_QUALITY
+            )
+            variants[size] = name
+    return variants
+
+
+def process_recipe_image(recipe_id):
+    """Построение копий изображения рецепта, если они ещё не готовы.
+
+    Возвращает ``False``, если рецепт уже обработан, удалён или
+    обрабатывается другим процессом.
+    """
+    with transaction.atomic():
+        recipe = Recipe.objects.select_for_update(skip_locked=True).filter(
+            pk=recipe_id, image_variants__isnull=True
+        ).first()
+        if recipe is None:
+            return False
+        try:
+            recipe.image_variants = build_variants(recipe.image)
+        except (OSError, ValueError, Image.DecompressionBombError):
+            logger.exception('Не удалось обработать изображение рецепта %s',
+                             recipe_id)
+            recipe.image_variants = {}
+        recipe.save(update_fields=('image_variants',))
+    return True
+
+
+def process_pending_images(limit):
+    """Обработка рецептов без готовых копий изображений."""
+    return sum(
+        process_recipe_image(recipe_id)
+        for recipe_id in Recipe.objects.filter(
+            image_variants__isnull=True
+        ).order_by('id').values_list('id', flat=True)[:limit]
+    )
+
+
+def _process_in_thread(recipe_id):
+    try:
+        process_recipe_image(recipe_id)
+    except Exception:
+        logger.exception('Ошибка обработки изображения рецепта %s',
+                         recipe_id)
+    finally:
+        connection.close()
+
+
+def get_executor():
+    """Пул потоков для обработки изображений внутри процесса."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_WORKER_THREADS,
+                thread_name_prefix='recipe-images',
+            )
+    return _executor
+
+
+def schedule_image_processing(recipe_id):
+    """Постановка изображения рецепта в обработку после коммита.
+
+    В режиме ``inline`` копии строятся сразу, в режиме ``thread`` — в пуле
+    потоков процесса, в режиме ``worker`` их строит команда
+    ``process_images``, запущенная отдельным процессом.
+    """
+    mode = settings.IMAGE_PROCESSING_MODE
+    if mode == 'inline':
+        transaction.on_commit(lambda: process_recipe_image(recipe_id))
+    elif mode == 'thread':
+        transaction.on_commit(
+            lambda: get_executor().submit(_process_in_thread, recipe_id)
+        )
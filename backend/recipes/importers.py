@@ -0,0 +1,346 @@
+"""Загрузка справочных данных из файлов.
+
+Файлы CSV (с заголовком или без), JSON-массивы и JSONL читаются потоком
+и загружаются пачками. Существующие записи находятся по уникальному
+ключу и обновляются, новые добавляются; одинаковые записи и строки
+с пропущенными полями пропускаются. Строки, чьи уникальные поля вне
+ключа заняты другими записями, не загружаются и считаются конфликтами.
+"""
+
+import csv
+import json
+import os
+from itertools import islice
+
+from django.db import connections, transaction
+
+from .models import Ingredient, Tag
+
+BATCH_SIZE = 1000
+JSON_CHUNK_SIZE = 64 * 1024
+
+
+def read_json_array(source, chunk_size):
+    """Элементы JSON-массива, прочитанные из файла по частям.
+
+    Элемент разбирается из буфера, только когда за ним уже прочитан
+    разделитель: так числа и литералы на границе частей не обрываются.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ''
+    finished = False
+
+    def fill():
+        nonlocal buffer, finished
+        chunk = source.read(chunk_size)
+        finished = not chunk
+        buffer = buffer.lstrip() + chunk
+
+    while not buffer.lstrip() and not finished:
+        fill()
+    buffer = buffer.lstrip()
+    if not buffer.startswith('['):
+        raise ValueError('Ожидается JSON-массив')
+    buffer = buffer[1:]
+    expect_value = False
+    while True:
+        buffer = buffer.lstrip()
+        if not expect_value and buffer.startswith(']'):
+            return
+        try:
+            value, end = decoder.raw_decode(buffer)
+            separator = buffer[end:].lstrip()[:1]
+            if separator not in (',', ']'):
+                raise ValueError('Неверный JSON-массив')
+        except ValueError:
+            if finished:
+                raise
+            fill()
+            continue
+        yield value
+        buffer = buffer[end:].lstrip()[1:]
+        if separator == ']':
+            return
+        expect_value = True
+
+
+class ImportResult:
+    """Количество записей по итогам загрузки."""
+
+    def __init__(self):
+        self.inserted = 0
+        self.updated = 0
+        self.skipped = 0
+        self.conflicts = 0
+
+    def __str__(self):
+        return (
+            f'добавлено {self.inserted}, обновлено {self.updated}, '
+            f'пропущено {self.skipped}, конфликтов {self.conflicts}'
+        )
+
+
+class ReferenceImporter:
+    """Загрузка записей модели с обновлением по уникальному ключу."""
+
+    def __init__(self, model, fields, key_fields, batch_size=BATCH_SIZE,
+                 unique_fields=()):
+        self.model = model
+        self.fields = fields
+        self.key_fields = key_fields
+        self.unique_fields = unique_fields
+        self.update_fields = tuple(
+            field for field in fields if field not in key_fields
+        )
+        self.batch_size = batch_size
+
+    def read(self, path):
+        """Записи файла в виде словарей."""
+        extension = os.path.splitext(path)[1].lower()
+        with open(path, encoding='utf-8') as source:
+            if extension == '.csv':
+                yield from self.read_csv(source)
+            elif extension == '.jsonl':
+                for line in source:
+                    if line.strip():
+                        yield json.loads(line)
+            elif extension == '.json':
+                yield from read_json_array(source, JSON_CHUNK_SIZE)
+            else:
+                raise ValueError(f'Неизвестный формат файла: {path}')
+
+    def read_csv(self, source):
+        reader = csv.reader(source)
+        first = next(reader, None)
+        if first is None:
+            return
+        if set(first) == set(self.fields):
+            columns = first
+        else:
+            columns = self.fields
+            yield dict(zip(columns, first))
+        for row in reader:
+            yield dict(zip(columns, row))
+
+    def run(self, path, dry_run=False, copy=False):
+        """Загрузка файла, при ``dry_run`` изменения откатываются."""
+        result = ImportResult()
+        with transaction.atomic():
+            if copy:
+                self.copy(path, result)
+            else:
+                rows = iter(self.read(path))
+                while True:
+                    batch = list(islice(rows, self.batch_size))
+                    if not batch:
+                        break
+                    self.upsert(batch, result)
+            if dry_run:
+                transaction.set_rollback(True)
+        return result
+
+    def clean(self, batch, result):
+        """Строки пачки без пропусков и повторов по ключу."""
+        rows = {}
+        for row in batch:
+            values = {
+                field: str(row.get(field) or '').strip()
+                for field in self.fields
+            }
+            if not all(values.values()):
+                result.skipped += 1
+                continue
+            key = tuple(values[field] for field in self.key_fields)
+            if key in rows:
+                result.skipped += 1
+            rows[key] = values
+        return rows
+
+    def drop_conflicts(self, rows, result):
+        """Строки без конфликтов по уникальным полям вне ключа.
+
+        Значение уникального поля занято, если оно есть у записи
+        с другим ключом в базе или у более ранней строки пачки.
+        """
+        if not self.unique_fields:
+            return rows
+        owners = {field: {} for field in self.unique_fields}
+        for field in self.unique_fields:
+            for values in self.model.objects.filter(**{
+                f'{field}__in': {row[field] for row in rows.values()},
+            }).values(field, *self.key_fields):
+                owners[field][values[field]] = tuple(
+                    values[key_field] for key_field in self.key_fields
+                )
+        kept = {}
+        for key, values in rows.items():
+            if any(
+                owners[field].get(values[field], key) != key
+                for field in self.unique_fields
+            ):
+                result.conflicts += 1
+                continue
+            for field in self.unique_fields:
+                owners[field][values[field]] = key
+            kept[key] = values
+        return kept
+
+    def upsert(self, batch, result):
+        rows = self.drop_conflicts(self.clean(batch, result), result)
+        if not rows:
+            return
+        if connections[self.model.objects.db].vendor == 'postgresql':
+            self.upsert_postgres(rows, result)
+        else:
+            self.upsert_orm(rows, result)
+
+    def conflict_sql(self):
+        """Часть INSERT для конфликта по ключу.
+
+        Запись возвращается, только если она добавлена или изменена.
+        """
+        table = self.model._meta.db_table
+        key = ', '.join(self.key_fields)
+        if not self.update_fields:
+            return f'ON CONFLICT ({key}) DO NOTHING RETURNING true'
+        assignments = ', '.join(
+            f'{field} = EXCLUDED.{field}' for field in self.update_fields
+        )
+        changed = ' OR '.join(
+            f'{table}.{field} IS DISTINCT FROM EXCLUDED.{field}'
+            for field in self.update_fields
+        )
+        return (
+            f'ON CONFLICT ({key}) DO UPDATE SET {assignments} '
+            f'WHERE {changed} RETURNING (xmax = 0)'
+        )
+
+    def count_returned(self, cursor, total, result):
+        returned = [inserted for inserted, in cursor.fetchall()]
+        inserted = sum(returned)
+        result.inserted += inserted
+        result.updated += len(returned) - inserted
+        result.skipped += total - len(returned)
+
+    def upsert_postgres(self, rows, result):
+        """Одна вставка с ON CONFLICT на пачку."""
+        columns = ', '.join(self.fields)
+        placeholders = ', '.join(
+            '(' + ', '.join(['%s'] * len(self.fields)) + ')'
+            for _ in rows
+        )
+        params = [
+            values[field] for values in rows.values() for field in self.fields
+        ]
+        with connections[self.model.objects.db].cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {self.model._meta.db_table} ({columns}) '
+                f'VALUES {placeholders} {self.conflict_sql()}',
+                params,
+            )
+            self.count_returned(cursor, len(rows), result)
+
+    def upsert_orm(self, rows, result):
+        """Поиск существующих записей и раздельные вставка и обновление."""
+        existing = {
+            tuple(getattr(obj, field) for field in self.key_fields): obj
+            for obj in self.model.objects.filter(**{
+                f'{self.key_fields[0]}__in': {
+                    key[0] for key in rows
+                },
+            })
+        }
+        created = []
+        changed = []
+        for key, values in rows.items():
+            obj = existing.get(key)
+            if obj is None:
+                created.append(self.model(**values))
+            elif any(
+                getattr(obj, field) != values[field]
+                for field in self.update_fields
+            ):
+                for field in self.update_fields:
+                    setattr(obj, field, values[field])
+                changed.append(obj)
+            else:
+                result.skipped += 1
+        self.model.objects.bulk_create(created)
+        if changed:
+            self.model.objects.bulk_update(changed, self.update_fields)
+        result.inserted += len(created)
+        result.updated += len(changed)
+
+    def copy(self, path, result):
+        """Загрузка CSV через COPY во временную таблицу (PostgreSQL)."""
+        connection = connections[self.model.objects.db]
+        if connection.vendor != 'postgresql':
+            raise ValueError('COPY доступен только в PostgreSQL')
+        if not path.lower().endswith('.csv'):
+            raise ValueError('COPY загружает только CSV')
+        with open(path, encoding='utf-8') as source:
+            header = set(next(csv.reader(source), ())) == set(self.fields)
+        table = self.model._meta.db_table
+        columns = ', '.join(self.fields)
+        key = ', '.join(self.key_fields)
+        not_empty = ' AND '.join(
+            f"coalesce(trim({field}), '') <> ''" for field in self.fields
+        )
+        with connection.cursor() as cursor, open(
+            path, encoding='utf-8'
+        ) as source:
+            cursor.execute(
+                f'CREATE TEMPORARY TABLE import_rows '
+                f'(LIKE {table} INCLUDING DEFAULTS)'
+            )
+            cursor.cursor.copy_expert(
+                f'COPY import_rows ({columns}) FROM STDIN '
+                f'WITH (FORMAT csv, HEADER {str(header).lower()})',
+                source,
+            )
+            total = cursor.rowcount
+            if self.unique_fields:
+                total -= self.copy_conflicts(cursor, table, result)
+            cursor.execute(
+                f'INSERT INTO {table} ({columns}) '
+                f'SELECT DISTINCT ON ({key}) {columns} FROM import_rows '
+                f'WHERE {not_empty} {self.conflict_sql()}'
+            )
+            self.count_returned(cursor, total, result)
+            cursor.execute('DROP TABLE import_rows')
+
+    def copy_conflicts(self, cursor, table, result):
+        """Удаление загружаемых строк с занятыми уникальными полями.
+
+        Возвращает количество удалённых строк.
+        """
+        key = ' AND '.join(
+            f'rows.{field} = other.{field}' for field in self.key_fields
+        )
+        taken = ' OR '.join(
+            f'rows.{field} = other.{field}' for field in self.unique_fields
+        )
+        cursor.execute(
+            f'DELETE FROM import_rows rows USING {table} other '
+            f'WHERE ({taken}) AND NOT ({key})'
+        )
+        conflicts = cursor.rowcount
+        cursor.execute(
+            f'DELETE FROM import_rows rows USING import_rows other '
+            f'WHERE ({taken}) AND NOT ({key}) AND rows.ctid > other.ctid'
+        )
+        conflicts += cursor.rowcount
+        result.conflicts += conflicts
+        return conflicts
+
+
+IMPORTERS = {
+    'ingredients': lambda batch_size: ReferenceImporter(
+        Ingredient, ('name', 'measurement_unit'),
+        ('name', 'measurement_unit'), batch_size,
+    ),
+    'tags': lambda batch_size: ReferenceImporter(
+        Tag, ('name', 'color', 'slug'), ('slug',), batch_size,
+        unique_fields=('name', 'color'),
+    ),
+}
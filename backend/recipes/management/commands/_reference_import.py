@@ -0,0 +1,57 @@
+from api.cache import bump_version
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DatabaseError
+from recipes.importers import BATCH_SIZE, IMPORTERS
+from recipes.models import Recipe
+from recipes.snapshots import update_snapshots
+
+
+class ReferenceImportCommand(BaseCommand):
+    """Общая команда загрузки справочных данных."""
+    dataset = None
+    title = None
+    recipe_lookup = None
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path',
+            default=f'{settings.BASE_DIR}/data/{self.dataset}.csv',
+            help='Файл CSV, JSON или JSONL',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество записей в одной пачке',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Посчитать изменения и откатить их',
+        )
+        parser.add_argument(
+            '--copy',
+            action='store_true',
+            help='Загрузить CSV через COPY (только PostgreSQL)',
+        )
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        importer = IMPORTERS[self.dataset](options['batch_size'])
+        try:
+            result = importer.run(
+                options['path'],
+                dry_run=options['dry_run'],
+                copy=options['copy'],
+            )
+        except (OSError, ValueError, KeyError, DatabaseError) as error:
+            raise CommandError(f'Ошибка загрузки: {error}')
+        if not options['dry_run'] and (result.inserted or result.updated):
+            bump_version(self.dataset)
+        if not options['dry_run'] and result.updated and self.recipe_lookup:
+            update_snapshots(Recipe.objects.filter(
+                **{f'{self.recipe_lookup}__isnull': False}
+            ).distinct())
+        prefix = 'Проверка без изменений' if options['dry_run'] else 'Готово'
+        return f'{self.title}. {prefix}: {result}'
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.snapshots import SNAPSHOT_BATCH_SIZE, update_snapshots
+
+
+class Command(BaseCommand):
+    """Заполнение снимков рецептов для отображения."""
+    help = 'Заполнение снимков рецептов пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=SNAPSHOT_BATCH_SIZE,
+            help='Количество рецептов в одной пачке',
+        )
+        parser.add_argument(
+            '--all',
+            action='store_true',
+            help='Пересобрать и уже заполненные снимки',
+        )
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        recipes = Recipe.objects.all()
+        if not options['all']:
+            recipes = recipes.filter(snapshot__isnull=True)
+        updated = update_snapshots(recipes, options['batch_size'])
+        return f'Обновлено снимков: {updated}'
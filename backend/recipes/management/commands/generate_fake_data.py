@@ -0,0 +1,218 @@
+import random
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Max
+from PIL import Image
+from recipes.images import build_variants
+from recipes.models import (FavoriteRecipe, FeedItem, Ingredient,
+                            IngredientAmount, Recipe, ShoppingCart, Tag)
+from recipes.search import update_search_vectors
+from recipes.snapshots import update_snapshots
+from users.models import CustomUser, Subscribe
+
+BATCH_SIZE = 5000
+FAKE_IMAGE = 'recipes/images/fake.png'
+FAKE_PASSWORD = 'fake-password'
+
+
+def batched(objects, batch_size):
+    """Пачки объектов из генератора."""
+    batch = []
+    for obj in objects:
+        batch.append(obj)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Command(BaseCommand):
+    """Генерация синтетических данных для нагрузочного тестирования.
+
+    Пользователи, рецепты, ингредиенты рецептов, избранное, корзины и
+    подписки создаются через ``bulk_create`` пачками, после чего
+    пересчитываются денормализованные данные: счётчики, списки
+    покупок, рейтинги, ленты и поисковые векторы.
+    """
+    help = 'Генерация синтетических данных'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument(
+            '--ingredients-per-recipe',
+            type=int,
+            default=10,
+            help='Количество ингредиентов в каждом рецепте',
+        )
+        parser.add_argument('--favorites', type=int, default=50000)
+        parser.add_argument('--carts', type=int, default=20000)
+        parser.add_argument('--subscriptions', type=int, default=20000)
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--seed', type=int, default=None)
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        self.random = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        tag_ids = list(Tag.objects.values_list('id', flat=True))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        if not tag_ids or not ingredient_ids:
+            raise CommandError(
+                'Сначала загрузите теги и ингредиенты: '
+                'import_tags, import_ingredients'
+            )
+        if options['ingredients_per_recipe'] > len(ingredient_ids):
+            raise CommandError('Ингредиентов в базе меньше, чем в рецепте')
+
+        user_ids = self.create_users(options['users'])
+        recipe_ids = self.create_recipes(
+            options['recipes'], user_ids, tag_ids, ingredient_ids,
+            options['ingredients_per_recipe'],
+        )
+        self.create_pairs(
+            FavoriteRecipe, 'favorite_recipe_id', options['favorites'],
+            user_ids, recipe_ids,
+        )
+        self.create_pairs(
+            ShoppingCart, 'recipe_id', options['carts'], user_ids, recipe_ids
+        )
+        self.create_pairs(
+            Subscribe, 'author_id', options['subscriptions'],
+            user_ids, user_ids,
+        )
+        self.stdout.write('Пересчёт производных данных...')
+        call_command('reconcile_counters', stdout=self.stdout)
+        call_command('rebuild_shopping_lists', stdout=self.stdout)
+        call_command('refresh_rankings', stdout=self.stdout)
+        self.fill_feeds(user_ids)
+        for batch in batched(recipe_ids, self.batch_size):
+            update_search_vectors(Recipe.objects.filter(id__in=batch))
+            update_snapshots(Recipe.objects.filter(id__in=batch))
+        return (
+            f'Создано пользователей: {len(user_ids)}, '
+            f'рецептов: {len(recipe_ids)}'
+        )
+
+    def create_users(self, count):
+        """Пользователи с одним общим паролем."""
+        start = (CustomUser.objects.aggregate(last=Max('id'))['last'] or 0)
+        password = make_password(FAKE_PASSWORD)
+        users = (
+            CustomUser(
+                username=f'fake{number}',
+                email=f'fake{number}@example.com',
+                first_name='Тест',
+                last_name=f'Пользователь {number}',
+                password=password,
+            )
+            for number in range(start + 1, start + count + 1)
+        )
+        for batch in batched(users, self.batch_size):
+            CustomUser.objects.bulk_create(batch)
+        return list(CustomUser.objects.filter(
+            username__startswith='fake', id__gt=start
+        ).values_list('id', flat=True))
+
+    def fake_image(self):
+        """Общее для всех рецептов изображение и его копии."""
+        if not default_storage.exists(FAKE_IMAGE):
+            buffer = BytesIO()
+            Image.new('RGB', (800, 600), 'orange').save(buffer, 'PNG')
+            default_storage.save(FAKE_IMAGE, ContentFile(buffer.getvalue()))
+        return build_variants(default_storage.open(FAKE_IMAGE))
+
+    def create_recipes(self, count, user_ids, tag_ids, ingredient_ids,
+                       ingredients_per_recipe):
+        """Рецепты с тегами и ингредиентами."""
+        variants = self.fake_image()
+        start = Recipe.objects.aggregate(last=Max('id'))['last'] or 0
+        recipes = (
+            Recipe(
+                author_id=self.random.choice(user_ids),
+                name=f'Рецепт {number}',
+                text=f'Описание рецепта {number}',
+                cooking_time=self.random.randint(1, 180),
+                image=FAKE_IMAGE,
+                image_variants=variants,
+            )
+            for number in range(start + 1, start + count + 1)
+        )
+        recipe_ids = []
+        for batch in batched(recipes, self.batch_size):
+            Recipe.objects.bulk_create(batch)
+            ids = list(Recipe.objects.filter(
+                id__gt=recipe_ids[-1] if recipe_ids else start
+            ).order_by('id').values_list('id', flat=True))
+            recipe_ids += ids
+            Recipe.tags.through.objects.bulk_create(
+                Recipe.tags.through(recipe_id=recipe_id, tag_id=tag_id)
+                for recipe_id in ids
+                for tag_id in self.random.sample(
+                    tag_ids, self.random.randint(1, len(tag_ids))
+                )
+            )
+            for amounts in batched(
+                (
+                    IngredientAmount(
+                        recipe_id=recipe_id,
+                        ingredient_id=ingredient_id,
+                        amount=self.random.randint(1, 1000),
+                    )
+                    for recipe_id in ids
+                    for ingredient_id in self.random.sample(
+                        ingredient_ids, ingredients_per_recipe
+                    )
+                ),
+                self.batch_size,
+            ):
+                IngredientAmount.objects.bulk_create(amounts)
+        return recipe_ids
+
+    def create_pairs(self, model, field, count, user_ids, target_ids):
+        """Случайные уникальные связи пользователей с объектами."""
+        pairs = (
+            model(user_id=user_id, **{field: target_id})
+            for user_id, target_id in (
+                (self.random.choice(user_ids), self.random.choice(target_ids))
+                for _ in range(count)
+            )
+            if model is not Subscribe or user_id != target_id
+        )
+        for batch in batched(pairs, self.batch_size):
+            model.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def fill_feeds(self, user_ids):
+        """Ленты подписчиков по последним рецептам авторов."""
+        for author in CustomUser.objects.filter(id__in=user_ids).iterator():
+            if not FeedItem.objects.fans_out(author):
+                continue
+            follower_ids = list(Subscribe.objects.filter(
+                author=author
+            ).values_list('user_id', flat=True))
+            if not follower_ids:
+                continue
+            recipes = list(Recipe.objects.filter(
+                author=author
+            ).order_by('-pub_date', '-id').values_list('id', 'pub_date')[
+                :settings.FEED_BACKFILL_SIZE
+            ])
+            for batch in batched(
+                (
+                    FeedItem(
+                        user_id=user_id, recipe_id=recipe_id,
+                        pub_date=pub_date,
+                    )
+                    for user_id in follower_ids
+                    for recipe_id, pub_date in recipes
+                ),
+                self.batch_size,
+            ):
+                FeedItem.objects.bulk_create(batch, ignore_conflicts=True)
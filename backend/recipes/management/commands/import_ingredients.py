@@ -1,29 +1,9 @@
-import csv
+from ._reference_import import ReferenceImportCommand
 
-from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
-from recipes.models import Ingredient
 
-
-class Command(BaseCommand):
-    """Загрузка данных из csv файлов."""
-    help = 'Загрузка данных из csv файлов'
-
-    def handle(self, *args, **options):
-        """Метод обработчик."""
-        with open(
-            f'{settings.BASE_DIR}/data/ingredients.csv',
-            'r',
-            encoding='utf-8'
-        ) as csv_file:
-            reader = csv.DictReader(csv_file)
-            try:
-                Ingredient.objects.bulk_create(
-                    Ingredient(**items) for items in reader
-                )
-            except IntegrityError:
-                return 'Такие ингредиенты уже есть...'
-        return (
-            f'Ингредиенты успешно загружены: {Ingredient.objects.count()}'
-        )
+class Command(ReferenceImportCommand):
+    """Загрузка ингредиентов из файла."""
+    help = 'Загрузка ингредиентов из файла CSV, JSON или JSONL'
+    dataset = 'ingredients'
+    title = 'Ингредиенты'
+    recipe_lookup = 'recipe__ingredient'
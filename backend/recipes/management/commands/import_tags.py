@@ -1,30 +1,9 @@
-import csv
+from ._reference_import import ReferenceImportCommand
 
-from django.conf import settings
-from django.core.management.base import BaseCommand
-from django.db import IntegrityError
-from recipes.models import Tag
 
-
-class Command(BaseCommand):
-    """Загрузка данных из csv файлов."""
-    help = 'Загрузка данных из csv файлов'
-
-    def handle(self, *args, **options):
-        """Метод обработчик."""
-        with open(
-            f'{settings.BASE_DIR}/data/tags.csv',
-            'r',
-            encoding='utf-8'
-        ) as csv_file:
-            reader = csv.DictReader(csv_file)
-            try:
-                Tag.objects.bulk_create(
-                    Tag(**items) for items in reader
-                )
-            except IntegrityError:
-                return 'Такие Теги уже есть...'
-        return (
-            f'Теги успешно загружены:'
-            f'{(", ").join([_.get("name") for _ in Tag.objects.values()])}'
-        )
+class Command(ReferenceImportCommand):
+    """Загрузка тегов из файла."""
+    help = 'Загрузка тегов из файла CSV, JSON или JSONL'
+    dataset = 'tags'
+    title = 'Теги'
+    recipe_lookup = 'tags'
@@ -0,0 +1,35 @@
+import time
+
+from django.core.management.base import BaseCommand
+from recipes.images import process_pending_images
+
+
+class Command(BaseCommand):
+    """Фоновая обработка изображений рецептов."""
+    help = 'Построение уменьшенных копий изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Обработать очередь и завершиться',
+        )
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--interval',
+            type=float,
+            default=2,
+            help='Пауза в секундах, когда очередь пуста',
+        )
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        total = 0
+        while True:
+            processed = process_pending_images(options['batch_size'])
+            total += processed
+            if processed:
+                continue
+            if options['once']:
+                return f'Обработано изображений: {total}'
+            time.sleep(options['interval'])
@@ -0,0 +1,64 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes.models import ShoppingListItem
+
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Пересборка или проверка суммарных списков покупок."""
+    help = 'Пересборка или проверка суммарных списков покупок'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify',
+            action='store_true',
+            help='Только сравнить таблицу с пересчётом по корзинам',
+        )
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        if options['verify']:
+            return self.verify()
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (
+                    ShoppingListItem(
+                        user_id=user_id,
+                        ingredient_id=ingredient_id,
+                        total_amount=total_amount,
+                    )
+                    for user_id, ingredient_id, total_amount
+                    in ShoppingListItem.objects.computed().iterator()
+                ),
+                batch_size=BATCH_SIZE,
+            )
+        return (
+            f'Списки покупок пересобраны: '
+            f'{ShoppingListItem.objects.count()}'
+        )
+
+    def verify(self):
+        """Сравнение таблицы с полным пересчётом."""
+        expected = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingListItem.objects.computed().iterator()
+        }
+        actual = {
+            (user_id, ingredient_id): total_amount
+            for user_id, ingredient_id, total_amount
+            in ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            ).iterator()
+        }
+        mismatches = [
+            key for key in expected.keys() | actual.keys()
+            if expected.get(key) != actual.get(key)
+        ]
+        if mismatches:
+            raise CommandError(
+                f'Расхождений в списках покупок: {len(mismatches)}'
+            )
+        return 'Списки покупок совпадают с корзинами'
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from recipes.models import FavoriteRecipe, Recipe, ShoppingCart
+from users.models import CustomUser, Subscribe
+
+BATCH_SIZE = 1000
+
+COUNTERS = (
+    (Recipe, 'favorites_count', FavoriteRecipe, 'favorite_recipe'),
+    (Recipe, 'in_carts_count', ShoppingCart, 'recipe'),
+    (CustomUser, 'recipes_count', Recipe, 'author'),
+    (CustomUser, 'followers_count', Subscribe, 'author'),
+)
+
+
+def actual_count(model, field):
+    """Подзапрос с реальным количеством связанных объектов."""
+    return Coalesce(Subquery(
+        model.objects.filter(**{field: OuterRef('pk')}).order_by().values(
+            field
+        ).annotate(count=Count('id')).values('count')
+    ), 0)
+
+
+class Command(BaseCommand):
+    """Исправление расхождений денормализованных счётчиков."""
+    help = 'Исправление расхождений денормализованных счётчиков'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=BATCH_SIZE,
+            help='Количество объектов в одной пачке',
+        )
+
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        report = []
+        for model, counter, related_model, field in COUNTERS:
+            fixed = self.reconcile(
+                model, counter, related_model, field, options['batch_size']
+            )
+            report.append(f'{model.__name__}.{counter}: {fixed}')
+        return 'Исправлено счётчиков: ' + ', '.join(report)
+
+    @staticmethod
+    def reconcile(model, counter, related_model, field, batch_size):
+        """Пересчёт одного счётчика пачками по id.
+
+        Строки пачки сначала блокируются, затем исправляются одним
+        UPDATE с подзапросом. Изменения, зафиксированные до блокировки,
+        попадают в подсчёт, а последующие ``F()`` ждут её снятия, поэтому
+        параллельные изменения счётчика не теряются.
+        """
+        fixed = 0
+        last_id = 0
+        while True:
+            ids = list(model.objects.filter(pk__gt=last_id).order_by(
+                'pk'
+            ).values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                return fixed
+            batch = model.objects.filter(pk__gt=last_id, pk__lte=ids[-1])
+            actual = actual_count(related_model, field)
+            with transaction.atomic():
+                list(batch.select_for_update().order_by('pk').values_list(
+                    'pk', flat=True
+                ))
+                fixed += batch.exclude(
+                    **{counter: actual}
+                ).update(**{counter: actual})
+            last_id = ids[-1]
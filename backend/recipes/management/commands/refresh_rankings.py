@@ -0,0 +1,112 @@
+from collections import Counter
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.utils import timezone
+from recipes.models import (FavoriteRecipe, RankingCheckpoint, Recipe,
+                            RecipeRanking, ShoppingCart)
+
+BATCH_SIZE = 1000
+FAVORITE_WEIGHT = 1
+CART_WEIGHT = 0.5
+
+
+class Command(BaseCommand):
+    """Пересчёт рейтингов рецептов.
+
+    Популярность копируется из счётчика избранного. Оценка «в тренде»
+    затухает экспоненциально и пополняется только избранным и покупками,
+    добавленными после прошлого пересчёта.
+
+    Строка с меньшим id может зафиксироваться позже строк с большими,
+    поэтому пропуски в прочитанных id запоминаются в отметке пересчёта
+    и проверяются следующими пересчётами, пока не истечёт
+    ``RANKING_PENDING_ID_TIMEOUT``.
+    """
+    help = 'Пересчёт рейтингов рецептов'
+
+    @transaction.atomic
+    def handle(self, *args, **options):
+        """Метод обработчик."""
+        now = timezone.now()
+        checkpoint = RankingCheckpoint.objects.first()
+        RecipeRanking.objects.bulk_create(
+            (
+                RecipeRanking(recipe_id=recipe_id)
+                for recipe_id in Recipe.objects.filter(
+                    ranking__isnull=True
+                ).values_list('id', flat=True).iterator()
+            ),
+            batch_size=BATCH_SIZE,
+        )
+        decay = 1
+        if checkpoint is not None:
+            hours = (now - checkpoint.refreshed_at).total_seconds() / 3600
+            decay = 0.5 ** (hours / settings.TRENDING_HALF_LIFE_HOURS)
+        RecipeRanking.objects.update(
+            trending_score=F('trending_score') * decay,
+            popularity=Subquery(Recipe.objects.filter(
+                pk=OuterRef('recipe_id')
+            ).values('favorites_count')),
+        )
+        scores = Counter()
+        last_favorite_id, pending_favorite_ids = self.scan(
+            FavoriteRecipe.objects.all(), 'favorite_recipe_id',
+            checkpoint and checkpoint.last_favorite_id,
+            checkpoint and checkpoint.pending_favorite_ids,
+            now, FAVORITE_WEIGHT, scores,
+        )
+        last_cart_id, pending_cart_ids = self.scan(
+            ShoppingCart.objects.all(), 'recipe_id',
+            checkpoint and checkpoint.last_cart_id,
+            checkpoint and checkpoint.pending_cart_ids,
+            now, CART_WEIGHT, scores,
+        )
+        rankings = list(RecipeRanking.objects.filter(recipe_id__in=scores))
+        for ranking in rankings:
+            ranking.trending_score += scores[ranking.recipe_id]
+        RecipeRanking.objects.bulk_update(
+            rankings, ('trending_score',), batch_size=BATCH_SIZE
+        )
+        RankingCheckpoint.objects.create(
+            refreshed_at=now,
+            last_favorite_id=last_favorite_id,
+            last_cart_id=last_cart_id,
+            pending_favorite_ids=pending_favorite_ids,
+            pending_cart_ids=pending_cart_ids,
+        )
+        return f'Рейтинги пересчитаны: {len(rankings)} рецептов в тренде'
+
+    @staticmethod
+    def scan(queryset, field, last_id, pending, now, weight, scores):
+        """Учёт строк после ``last_id`` и появившихся пропущенных.
+
+        ``pending`` — пары из пропущенного id и времени, когда пропуск
+        заметили. Без прошлой отметки учитываются все строки, а пропуски
+        не запоминаются. Возвращает новую отметку и пропуски.
+        """
+        timestamp = now.timestamp()
+        pending = {
+            row_id: seen for row_id, seen in pending or ()
+            if timestamp - seen < settings.RANKING_PENDING_ID_TIMEOUT
+        }
+        new_ids = set()
+        max_id = last_id or 0
+        for row_id, recipe_id in queryset.filter(
+            Q(id__gt=max_id) | Q(id__in=pending)
+        ).values_list('id', field).iterator():
+            scores[recipe_id] += weight
+            if row_id in pending:
+                del pending[row_id]
+            else:
+                new_ids.add(row_id)
+                max_id = max(max_id, row_id)
+        if last_id is not None:
+            pending.update(
+                (row_id, timestamp)
+                for row_id in range(last_id + 1, max_id)
+                if row_id not in new_ids
+            )
+        return max_id, sorted(pending.items())
@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 12:00
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_shopping_lists(apps, schema_editor):
+    IngredientAmount = apps.get_model('recipes', 'IngredientAmount')
+    ShoppingListItem = apps.get_model('recipes', 'ShoppingListItem')
+    totals = IngredientAmount.objects.filter(
+        recipe__recipe_shopping_cart__isnull=False
+    ).values(
+        'ingredient_id',
+        user_id=models.F('recipe__recipe_shopping_cart__user'),
+    ).annotate(total_amount=models.Sum('amount')).order_by()
+    ShoppingListItem.objects.bulk_create(
+        (ShoppingListItem(**item) for item in totals.iterator()),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ShoppingListItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_amount', models.PositiveIntegerField(verbose_name='Количество')),
+                ('ingredient', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list_items', to='recipes.ingredient', verbose_name='Ингредиент')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shopping_list', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Ингредиент списка покупок',
+                'verbose_name_plural': 'Ингредиенты списка покупок',
+                'ordering': ('id',),
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='shoppinglistitem',
+            constraint=models.UniqueConstraint(fields=('user', 'ingredient'), name='unique shopping list ingredient'),
+        ),
+        migrations.RunPython(fill_shopping_lists, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 3.2 on 2026-10-18 12:30
+
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+INDEX_NAME = 'recipes_ingredient_name_trgm'
+
+
+def create_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON recipes_ingredient USING gin (name gin_trgm_ops)'
+    )
+
+
+def drop_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.RunPython(create_trigram_index, drop_trigram_index),
+    ]
@@ -0,0 +1,51 @@
+# Generated by Django 3.2 on 2026-10-18 13:00
+
+import django.contrib.postgres.search
+from django.db import migrations
+
+INDEX_NAME = 'recipes_recipe_search_vector'
+
+FILL_SEARCH_VECTOR = '''
+UPDATE recipes_recipe AS recipe SET search_vector =
+    setweight(to_tsvector('russian', coalesce(recipe.name, '')), 'A')
+    || setweight(to_tsvector('russian', coalesce((
+        SELECT string_agg(ingredient.name, ' ')
+        FROM recipes_ingredientamount AS amount
+        JOIN recipes_ingredient AS ingredient
+            ON ingredient.id = amount.ingredient_id
+        WHERE amount.recipe_id = recipe.id
+    ), '')), 'B')
+    || setweight(to_tsvector('russian', coalesce(recipe.text, '')), 'C')
+'''
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(FILL_SEARCH_VECTOR)
+    schema_editor.execute(
+        f'CREATE INDEX IF NOT EXISTS {INDEX_NAME} '
+        f'ON recipes_recipe USING gin (search_vector)'
+    )
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'DROP INDEX IF EXISTS {INDEX_NAME}')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_ingredient_name_trigram_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 3.2 on 2026-10-18 02:26
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FavoriteRecipe = apps.get_model('recipes', 'FavoriteRecipe')
+    ShoppingCart = apps.get_model('recipes', 'ShoppingCart')
+    Recipe.objects.update(
+        favorites_count=Coalesce(models.Subquery(
+            FavoriteRecipe.objects.filter(
+                favorite_recipe=models.OuterRef('pk')
+            ).order_by().values('favorite_recipe').annotate(
+                count=models.Count('id')
+            ).values('count')
+        ), 0),
+        in_carts_count=Coalesce(models.Subquery(
+            ShoppingCart.objects.filter(
+                recipe=models.OuterRef('pk')
+            ).order_by().values('recipe').annotate(
+                count=models.Count('id')
+            ).values('count')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='in_carts_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='В списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 02:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_counters'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RankingCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('refreshed_at', models.DateTimeField(verbose_name='Время пересчёта')),
+                ('last_favorite_id', models.PositiveBigIntegerField(default=0, verbose_name='Последнее учтённое избранное')),
+                ('last_cart_id', models.PositiveBigIntegerField(default=0, verbose_name='Последняя учтённая покупка')),
+            ],
+            options={
+                'verbose_name': 'Пересчёт рейтингов',
+                'verbose_name_plural': 'Пересчёты рейтингов',
+                'ordering': ('-refreshed_at',),
+            },
+        ),
+        migrations.CreateModel(
+            name='RecipeRanking',
+            fields=[
+                ('recipe', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ranking', serialize=False, to='recipes.recipe', verbose_name='Рецепт')),
+                ('popularity', models.PositiveIntegerField(default=0, verbose_name='Популярность')),
+                ('trending_score', models.FloatField(default=0, verbose_name='Набирает популярность')),
+            ],
+            options={
+                'verbose_name': 'Рейтинг рецепта',
+                'verbose_name_plural': 'Рейтинги рецептов',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-popularity', '-recipe'], name='ranking_popularity_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='reciperanking',
+            index=models.Index(fields=['-trending_score', '-recipe'], name='ranking_trending_idx'),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 3.2 on 2026-10-18 02:29
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0008_recipe_ranking'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('recipe', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_items', to='recipes.recipe', verbose_name='Рецепт')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed', to=settings.AUTH_USER_MODEL, verbose_name='Пользователь')),
+            ],
+            options={
+                'verbose_name': 'Запись ленты',
+                'verbose_name_plural': 'Лента подписок',
+            },
+        ),
+        migrations.AddConstraint(
+            model_name='feeditem',
+            constraint=models.UniqueConstraint(fields=('user', 'recipe'), name='unique feed item'),
+        ),
+    ]
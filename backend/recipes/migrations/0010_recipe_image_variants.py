@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 02:31
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0009_feed_item'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Копии изображения'),
+        ),
+    ]
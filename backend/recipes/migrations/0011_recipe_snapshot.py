@@ -0,0 +1,18 @@
+# Generated by Django 3.2 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='snapshot',
+            field=models.JSONField(blank=True, editable=False, null=True, verbose_name='Снимок для отображения'),
+        ),
+    ]
@@ -0,0 +1,42 @@
+# Generated by Django 3.2 on 2026-10-18 03:40
+
+from django.db import migrations, models
+
+
+def fill_pub_date(apps, schema_editor):
+    FeedItem = apps.get_model('recipes', 'FeedItem')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    FeedItem.objects.update(pub_date=models.Subquery(
+        Recipe.objects.filter(
+            pk=models.OuterRef('recipe_id')
+        ).values('pub_date')
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='feeditem',
+            name='pub_date',
+            field=models.DateTimeField(null=True, verbose_name='Дата публикации рецепта'),
+        ),
+        migrations.RunPython(fill_pub_date, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='feeditem',
+            name='pub_date',
+            field=models.DateTimeField(verbose_name='Дата публикации рецепта'),
+        ),
+        migrations.AddIndex(
+            model_name='feeditem',
+            index=models.Index(fields=['user', '-pub_date', '-recipe'], name='feed_user_pub_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='recipe',
+            index=models.Index(fields=['author', '-pub_date', '-id'], name='recipe_author_pub_date_idx'),
+        ),
+    ]
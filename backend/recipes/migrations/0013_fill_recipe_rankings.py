@@ -0,0 +1,30 @@
+# Generated by Django 3.2 on 2026-10-18 04:01
+
+from django.db import migrations
+
+BATCH_SIZE = 1000
+
+
+def fill_rankings(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    RecipeRanking = apps.get_model('recipes', 'RecipeRanking')
+    RecipeRanking.objects.bulk_create(
+        (
+            RecipeRanking(recipe_id=recipe_id)
+            for recipe_id in Recipe.objects.filter(
+                ranking__isnull=True
+            ).values_list('id', flat=True).iterator()
+        ),
+        batch_size=BATCH_SIZE,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_feed_item_pub_date'),
+    ]
+
+    operations = [
+        migrations.RunPython(fill_rankings, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2 on 2026-10-18 04:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_fill_recipe_rankings'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rankingcheckpoint',
+            name='pending_cart_ids',
+            field=models.JSONField(default=list, verbose_name='Пропущенные id покупок'),
+        ),
+        migrations.AddField(
+            model_name='rankingcheckpoint',
+            name='pending_favorite_ids',
+            field=models.JSONField(default=list, verbose_name='Пропущенные id избранного'),
+        ),
+    ]
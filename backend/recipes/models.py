@@ -1,13 +1,22 @@
 from colorfield.fields import ColorField
 from core.const import (MIN_COOKING_TIME, MIN_RECIPE_NAME,
                         RECIPES_CHAR_FIELD_LENGTH, RECIPES_SLUG_FIELD_LENGTH)
+from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.search import SearchVectorField
 from django.core.exceptions import ValidationError
 from django.core.validators import MinValueValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import (Case, Exists, F, OuterRef, Prefetch, Sum, Value,
+                              When, prefetch_related_objects)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest
+from users.models import Subscribe
 
 User = get_user_model()
 
+FEED_BATCH_SIZE = 1000
+
 
 class Tag(models.Model):
     """Модель тега."""
@@ -60,6 +69,62 @@ class Ingredient(models.Model):
         return f'{self.name} - {self.measurement_unit}'
 
 
+class RecipeQuerySet(models.QuerySet):
+    """Queryset рецептов."""
+
+    def with_user_annotations(self, user):
+        """Рецепты с флагами пользователя.
+
+        Теги, автор и ингредиенты берутся из снимка ``snapshot``, поэтому
+        связанные таблицы не загружаются.
+        """
+        queryset = self.defer('search_vector')
+        if not user.is_authenticated:
+            return queryset.annotate(
+                is_favorited=Value(False),
+                is_in_shopping_cart=Value(False),
+                author_is_subscribed=Value(False),
+            )
+        return queryset.annotate(
+            is_favorited=Exists(FavoriteRecipe.objects.filter(
+                user=user, favorite_recipe=OuterRef('pk'))),
+            is_in_shopping_cart=Exists(ShoppingCart.objects.filter(
+                user=user, recipe=OuterRef('pk'))),
+            author_is_subscribed=Exists(Subscribe.objects.filter(
+                user=user, author=OuterRef('author'))),
+        )
+
+    def latest_for_authors(self, author_ids, limit=None):
+        """Последние рецепты каждого автора одним запросом."""
+        author_ids = list(author_ids)
+        if not limit:
+            return self.filter(author_id__in=author_ids)
+        placeholders = ', '.join(['%s'] * len(author_ids)) or 'NULL'
+        ranked = RawSQL(
+            f'SELECT id FROM ('
+            f'SELECT id, ROW_NUMBER() OVER ('
+            f'PARTITION BY author_id ORDER BY pub_date DESC, id DESC'
+            f') AS row_number FROM {self.model._meta.db_table} '
+            f'WHERE author_id IN ({placeholders})'
+            f') AS ranked WHERE row_number <= %s',
+            (*author_ids, limit),
+        )
+        return self.filter(pk__in=ranked)
+
+
+def prefetch_recipe_relations(recipes):
+    """Подгрузка автора, тегов и ингредиентов для списка рецептов."""
+    prefetch_related_objects(
+        recipes,
+        'author',
+        'tags',
+        Prefetch(
+            'recipe',
+            queryset=IngredientAmount.objects.select_related('ingredient'),
+        ),
+    )
+
+
 class Recipe(models.Model):
     """Модель рецепта."""
     author = models.ForeignKey(
@@ -82,6 +147,18 @@ class Recipe(models.Model):
         upload_to='recipes/images',
         verbose_name='Изображение'
     )
+    image_variants = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Копии изображения'
+    )
+    snapshot = models.JSONField(
+        null=True,
+        blank=True,
+        editable=False,
+        verbose_name='Снимок для отображения'
+    )
     name = models.CharField(
         max_length=RECIPES_CHAR_FIELD_LENGTH,
         verbose_name='Название рецепта'
@@ -98,15 +175,44 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         ordering = ('-pub_date',)
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
+        indexes = [
+            models.Index(
+                fields=('-pub_date', '-id'),
+                name='recipe_pub_date_id_idx'),
+            models.Index(
+                fields=('author', '-pub_date', '-id'),
+                name='recipe_author_pub_date_idx')]
 
     def __str__(self):
         return self.name
 
+    def get_image_name(self, size):
+        """Копия изображения нужного размера или исходный файл,
+        пока копии не построены."""
+        return (self.image_variants or {}).get(size, self.image.name)
+
     def save(self, *args, **kwargs):
         self.full_clean()
         super().save(*args, **kwargs)
@@ -205,3 +311,330 @@ class ShoppingCart(models.Model):
 
     def __str__(self):
         return f'{self.user.username} - {self.recipe.name}'
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """Queryset суммарного списка покупок."""
+
+    @transaction.atomic
+    def apply_delta(self, user_ids, delta):
+        """Изменение количества ингредиентов в списках пользователей.
+
+        ``delta`` сопоставляет id ингредиента и изменение количества.
+        Недостающие строки вставляются с нулём без учёта конфликтов,
+        а количество меняется через ``F()``, поэтому параллельные
+        изменения одной строки складываются, а не перезаписываются.
+        """
+        user_ids = sorted(set(user_ids))
+        delta = {key: value for key, value in delta.items() if value}
+        if not user_ids or not delta:
+            return
+        self.bulk_create(
+            [
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id,
+                    total_amount=0,
+                )
+                for user_id in user_ids
+                for ingredient_id, amount in sorted(delta.items())
+                if amount > 0
+            ],
+            ignore_conflicts=True,
+        )
+        items = self.filter(user_id__in=user_ids, ingredient_id__in=delta)
+        list(items.select_for_update().order_by(
+            'user_id', 'ingredient_id'
+        ).values_list('id', flat=True))
+        items.update(total_amount=Greatest(
+            F('total_amount') + Case(
+                *(
+                    When(ingredient_id=ingredient_id, then=Value(amount))
+                    for ingredient_id, amount in delta.items()
+                ),
+                output_field=models.IntegerField(),
+            ),
+            0,
+        ))
+        items.filter(total_amount=0).delete()
+
+    def add_recipe(self, user, recipe, sign=1):
+        """Добавление ингредиентов рецепта в список пользователя."""
+        self.add_recipes(user, (recipe,), sign)
+
+    def add_recipes(self, user, recipes, sign=1):
+        """Добавление ингредиентов нескольких рецептов одним пересчётом."""
+        self.apply_delta((user.id,), {
+            ingredient_id: sign * amount
+            for ingredient_id, amount in IngredientAmount.objects.filter(
+                recipe__in=recipes
+            ).order_by().values_list('ingredient_id').annotate(
+                Sum('amount')
+            )
+        })
+
+    def remove_recipe(self, user, recipe):
+        """Удаление ингредиентов рецепта из списка пользователя."""
+        self.add_recipe(user, recipe, sign=-1)
+
+    def change_recipe(self, recipe, old_amounts, new_amounts):
+        """Пересчёт списков всех, у кого рецепт в корзине."""
+        delta = {
+            ingredient_id: (
+                new_amounts.get(ingredient_id, 0)
+                - old_amounts.get(ingredient_id, 0)
+            )
+            for ingredient_id in {*old_amounts, *new_amounts}
+        }
+        self.apply_delta(
+            ShoppingCart.objects.filter(recipe=recipe).values_list(
+                'user_id', flat=True
+            ),
+            delta,
+        )
+
+    def remove_from_carts(self, recipe):
+        """Удаление рецепта из всех корзин одним пересчётом списков.
+
+        Корзины удаляются без сигналов; возвращает id их владельцев.
+        """
+        carts = ShoppingCart.objects.filter(recipe=recipe)
+        user_ids = list(carts.values_list('user_id', flat=True))
+        self.apply_delta(user_ids, {
+            ingredient_id: -amount
+            for ingredient_id, amount in recipe.recipe.values_list(
+                'ingredient_id', 'amount'
+            )
+        })
+        carts._raw_delete(carts.db)
+        return user_ids
+
+    def computed(self):
+        """Список покупок, заново посчитанный по корзинам."""
+        return IngredientAmount.objects.filter(
+            recipe__recipe_shopping_cart__isnull=False
+        ).values(
+            'ingredient_id',
+            user_id=F('recipe__recipe_shopping_cart__user'),
+        ).annotate(
+            total_amount=Sum('amount')
+        ).values_list(
+            'user_id', 'ingredient_id', 'total_amount'
+        ).order_by()
+
+
+class ShoppingListItem(models.Model):
+    """Модель суммарного количества ингредиента в списке покупок."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        verbose_name='Количество'
+    )
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('id',)
+        verbose_name = 'Ингредиент списка покупок'
+        verbose_name_plural = 'Ингредиенты списка покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'ingredient'),
+                name='unique shopping list ingredient')]
+
+    def __str__(self):
+        return f'{self.user} - {self.ingredient} - {self.total_amount}'
+
+
+class RecipeRanking(models.Model):
+    """Модель рейтинга рецепта для сортировки по популярности."""
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='ranking',
+        verbose_name='Рецепт'
+    )
+    popularity = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Популярность'
+    )
+    trending_score = models.FloatField(
+        default=0,
+        verbose_name='Набирает популярность'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = [
+            models.Index(
+                fields=('-popularity', '-recipe'),
+                name='ranking_popularity_idx'),
+            models.Index(
+                fields=('-trending_score', '-recipe'),
+                name='ranking_trending_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} - {self.popularity} - {self.trending_score}'
+
+
+class RankingCheckpoint(models.Model):
+    """Модель отметки последнего пересчёта рейтингов."""
+    refreshed_at = models.DateTimeField(
+        verbose_name='Время пересчёта'
+    )
+    last_favorite_id = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Последнее учтённое избранное'
+    )
+    last_cart_id = models.PositiveBigIntegerField(
+        default=0,
+        verbose_name='Последняя учтённая покупка'
+    )
+    pending_favorite_ids = models.JSONField(
+        default=list,
+        verbose_name='Пропущенные id избранного'
+    )
+    pending_cart_ids = models.JSONField(
+        default=list,
+        verbose_name='Пропущенные id покупок'
+    )
+
+    class Meta:
+        ordering = ('-refreshed_at',)
+        verbose_name = 'Пересчёт рейтингов'
+        verbose_name_plural = 'Пересчёты рейтингов'
+
+    def __str__(self):
+        return f'{self.refreshed_at}'
+
+
+class FeedItemQuerySet(models.QuerySet):
+    """Queryset ленты рецептов подписок."""
+
+    @staticmethod
+    def fans_out(author):
+        """Раскладываются ли рецепты автора по лентам подписчиков.
+
+        Рецепты авторов с большим числом подписчиков не раскладываются,
+        а выбираются при чтении ленты.
+        """
+        return author.followers_count < settings.FEED_FANOUT_MAX_FOLLOWERS
+
+    def fan_out(self, recipe):
+        """Добавление нового рецепта в ленты подписчиков автора."""
+        if not self.fans_out(recipe.author):
+            return
+        self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id, recipe=recipe, pub_date=recipe.pub_date
+                )
+                for user_id in Subscribe.objects.filter(
+                    author_id=recipe.author_id
+                ).values_list('user_id', flat=True).iterator()
+            ),
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, user, author):
+        """Последние рецепты автора в ленте нового подписчика."""
+        if not self.fans_out(author):
+            return
+        self.bulk_create(
+            (
+                self.model(user=user, recipe_id=recipe_id, pub_date=pub_date)
+                for recipe_id, pub_date in Recipe.objects.filter(
+                    author=author
+                ).order_by('-pub_date', '-id').values_list(
+                    'id', 'pub_date'
+                )[:settings.FEED_BACKFILL_SIZE]
+            ),
+            ignore_conflicts=True,
+        )
+
+    def trim(self, user, author):
+        """Удаление рецептов автора из ленты отписавшегося.
+
+        ``author`` передаётся с числом подписчиков до отписки: если после
+        неё рецепты автора снова раскладываются, ленты остальных
+        подписчиков дополняются его последними рецептами.
+        """
+        self.filter(user=user, recipe__author=author).delete()
+        if author.followers_count == settings.FEED_FANOUT_MAX_FOLLOWERS:
+            author.followers_count -= 1
+            for follower in Subscribe.objects.filter(
+                author=author
+            ).exclude(user=user).select_related('user').iterator():
+                self.backfill(follower.user, author)
+
+    @staticmethod
+    def pulled_authors(user):
+        """Авторы подписок, рецепты которых выбираются при чтении."""
+        return Subscribe.objects.filter(
+            user=user,
+            author__followers_count__gte=settings.FEED_FANOUT_MAX_FOLLOWERS,
+        ).values('author')
+
+    def recipes(self, user, queryset=None):
+        """Рецепты ленты пользователя.
+
+        Разложенные по ленте рецепты дополняются рецептами авторов,
+        для которых раскладка не выполняется.
+        """
+        if queryset is None:
+            queryset = Recipe.objects.all()
+        return queryset.filter(
+            models.Q(pk__in=self.filter(user=user).values('recipe'))
+            | models.Q(author__in=self.pulled_authors(user))
+        )
+
+
+class FeedItem(models.Model):
+    """Модель записи ленты рецептов подписок."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_items',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации рецепта'
+    )
+
+    objects = FeedItemQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Лента подписок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=('user', 'recipe'),
+                name='unique feed item')
+        ]
+        indexes = [
+            models.Index(
+                fields=('user', '-pub_date', '-recipe'),
+                name='feed_user_pub_date_idx')
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.recipe}'
@@ -0,0 +1,197 @@
+"""Поиск ингредиентов и рецептов."""
+
+from bisect import bisect_left
+from collections import Counter, defaultdict
+from threading import Lock
+
+from api.cache import get_version
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connections
+from django.db.models import (Case, Exists, F, IntegerField, OuterRef, Q,
+                              Subquery, Value, When)
+
+from .models import Ingredient, IngredientAmount
+
+TRIGRAM_SIMILARITY_THRESHOLD = 0.3
+SEARCH_CONFIG = 'russian'
+
+
+def trigrams(text):
+    """Триграммы строки по правилам pg_trgm."""
+    result = set()
+    for word in text.lower().split():
+        padded = f'  {word} '
+        result.update(
+            padded[index:index + 3] for index in range(len(padded) - 2)
+        )
+    return result
+
+
+class IngredientSearchIndex:
+    """Индекс названий ингредиентов в памяти процесса.
+
+    Хранит отсортированный список названий для поиска по префиксу и
+    триграммы для поиска с опечатками. Индекс строится при первом запросе
+    и привязан к версии ``ingredients`` в общем кэше: её увеличивают
+    сигналы и команды импорта любого процесса, после чего индекс
+    перестраивается. Сигналы текущего процесса сбрасывают его сразу.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshot = None
+
+    def invalidate(self):
+        """Сброс индекса."""
+        with self._lock:
+            self._snapshot = None
+
+    def _get_snapshot(self):
+        version = get_version('ingredients')
+        snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] == version:
+            return snapshot[1]
+        with self._lock:
+            if self._snapshot is None or self._snapshot[0] != version:
+                self._snapshot = version, self._build()
+            return self._snapshot[1]
+
+    @staticmethod
+    def _build():
+        names = []
+        name_trigrams = {}
+        postings = defaultdict(list)
+        for ingredient_id, name in Ingredient.objects.values_list(
+            'id', 'name'
+        ).iterator():
+            names.append((name.lower(), ingredient_id))
+            name_trigrams[ingredient_id] = trigrams(name)
+            for trigram in name_trigrams[ingredient_id]:
+                postings[trigram].append(ingredient_id)
+        names.sort()
+        return names, name_trigrams, postings
+
+    def search(self, query, limit):
+        """Id ингредиентов: сначала по префиксу, затем по подстроке,
+        затем похожие по триграммам."""
+        query = query.lower().strip()
+        names, name_trigrams, postings = self._get_snapshot()
+        found = []
+        seen = set()
+
+        def add(ingredient_id):
+            if ingredient_id not in seen:
+                seen.add(ingredient_id)
+                found.append(ingredient_id)
+            return len(found) >= limit
+
+        index = bisect_left(names, (query,))
+        while index < len(names) and names[index][0].startswith(query):
+            if add(names[index][1]):
+                return found
+            index += 1
+        for name, ingredient_id in names:
+            if query in name and add(ingredient_id):
+                return found
+
+        query_trigrams = trigrams(query)
+        shared = Counter(
+            ingredient_id
+            for trigram in query_trigrams
+            for ingredient_id in postings.get(trigram, ())
+            if ingredient_id not in seen
+        )
+        similar = []
+        for ingredient_id, count in shared.items():
+            similarity = count / (
+                len(query_trigrams) + len(name_trigrams[ingredient_id])
+                - count
+            )
+            if similarity >= TRIGRAM_SIMILARITY_THRESHOLD:
+                similar.append((-similarity, ingredient_id))
+        for _, ingredient_id in sorted(similar):
+            if add(ingredient_id):
+                break
+        return found
+
+
+ingredient_search_index = IngredientSearchIndex()
+
+
+def search_ingredients(queryset, query):
+    """Поиск ингредиентов выбранным в настройках способом."""
+    limit = settings.INGREDIENT_SEARCH_LIMIT
+    if settings.INGREDIENT_SEARCH_BACKEND == 'postgres':
+        return queryset.annotate(
+            is_prefix=Case(
+                When(name__istartswith=query, then=Value(1)),
+                default=Value(0),
+                output_field=IntegerField(),
+            ),
+            similarity=TrigramSimilarity('name', query),
+        ).filter(
+            Q(name__icontains=query) | Q(name__trigram_similar=query)
+        ).order_by('-is_prefix', '-similarity', 'name')[:limit]
+    ids = ingredient_search_index.search(query, limit)
+    return queryset.filter(pk__in=ids).order_by(Case(
+        *(When(pk=pk, then=Value(position))
+          for position, pk in enumerate(ids)),
+        output_field=IntegerField(),
+    ))
+
+
+def uses_postgres(queryset):
+    """Работает ли queryset с PostgreSQL."""
+    return connections[queryset.db].vendor == 'postgresql'
+
+
+def update_search_vectors(recipes):
+    """Пересчёт поисковых векторов рецептов.
+
+    Вектор включает название, названия ингредиентов и описание рецепта.
+    На других базах данных поиск работает без вектора.
+    """
+    if not uses_postgres(recipes):
+        return
+    ingredient_names = IngredientAmount.objects.filter(
+        recipe=OuterRef('pk')
+    ).values('recipe').annotate(
+        names=StringAgg('ingredient__name', ' ')
+    ).values('names')
+    recipes.update(search_vector=(
+        SearchVector('name', weight='A', config=SEARCH_CONFIG)
+        + SearchVector(
+            Subquery(ingredient_names), weight='B', config=SEARCH_CONFIG
+        )
+        + SearchVector('text', weight='C', config=SEARCH_CONFIG)
+    ))
+
+
+def search_recipes(queryset, query):
+    """Полнотекстовый поиск рецептов с сортировкой по релевантности."""
+    if uses_postgres(queryset):
+        search_query = SearchQuery(
+            query, config=SEARCH_CONFIG, search_type='websearch'
+        )
+        return queryset.filter(search_vector=search_query).annotate(
+            rank=SearchRank(F('search_vector'), search_query)
+        ).order_by('-rank', '-pub_date')
+    rank = Value(0)
+    for term in query.split():
+        in_ingredients = Exists(IngredientAmount.objects.filter(
+            recipe=OuterRef('pk'), ingredient__name__icontains=term
+        ))
+        queryset = queryset.filter(
+            Q(name__icontains=term) | Q(text__icontains=term)
+            | Q(in_ingredients)
+        )
+        rank = rank + Case(
+            When(name__icontains=term, then=Value(3)),
+            When(in_ingredients, then=Value(2)),
+            default=Value(1),
+            output_field=IntegerField(),
+        )
+    return queryset.annotate(rank=rank).order_by('-rank', '-pub_date')
@@ -0,0 +1,87 @@
+"""Сигналы приложения recipes."""
+
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .models import (Ingredient, Recipe, RecipeRanking, ShoppingCart,
+                     ShoppingListItem, Tag)
+from .search import ingredient_search_index, update_search_vectors
+from .snapshots import AUTHOR_FIELDS, update_snapshots
+
+RECIPE_LOOKUPS = {
+    Tag: 'tags',
+    Ingredient: 'recipe__ingredient',
+}
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def invalidate_ingredient_search(**kwargs):
+    """Сброс индекса поиска после изменения ингредиентов."""
+    ingredient_search_index.invalidate()
+
+
+@receiver(post_save, sender=Ingredient)
+def update_recipes_search(instance, created, **kwargs):
+    """Обновление поиска рецептов после переименования ингредиента."""
+    if not created:
+        update_search_vectors(
+            Recipe.objects.filter(recipe__ingredient=instance)
+        )
+
+
+@receiver(post_save, sender=Recipe)
+def create_ranking(instance, created, **kwargs):
+    """Пустой рейтинг нового рецепта для сортировки по популярности."""
+    if created:
+        RecipeRanking.objects.create(recipe=instance)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_save, sender=Ingredient)
+def update_recipe_snapshots(sender, instance, created, **kwargs):
+    """Пересборка снимков рецептов после изменения тега или ингредиента."""
+    if not created:
+        update_snapshots(
+            Recipe.objects.filter(**{RECIPE_LOOKUPS[sender]: instance})
+        )
+
+
+@receiver(pre_delete, sender=Tag)
+@receiver(pre_delete, sender=Ingredient)
+def remember_snapshot_recipes(sender, instance, **kwargs):
+    """Запоминание рецептов, чьи снимки изменит удаление."""
+    instance.snapshot_recipe_ids = list(Recipe.objects.filter(
+        **{RECIPE_LOOKUPS[sender]: instance}
+    ).values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+@receiver(post_delete, sender=Ingredient)
+def update_snapshots_after_delete(instance, **kwargs):
+    """Пересборка снимков рецептов после удаления тега или ингредиента."""
+    recipe_ids = getattr(instance, 'snapshot_recipe_ids', None)
+    if recipe_ids:
+        update_snapshots(Recipe.objects.filter(id__in=recipe_ids))
+
+
+@receiver(post_save, sender=get_user_model())
+def update_author_snapshots(instance, created, update_fields, **kwargs):
+    """Пересборка снимков рецептов после изменения данных автора."""
+    if created or (
+        update_fields is not None
+        and not set(update_fields) & set(AUTHOR_FIELDS)
+    ):
+        return
+    update_snapshots(Recipe.objects.filter(author=instance))
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(instance, **kwargs):
+    """Вычитание рецепта из списка покупок при удалении из корзины.
+
+    Срабатывает при удалении из админки и каскадном удалении рецепта
+    или пользователя; API удаляет корзины без сигналов и сам
+    пересчитывает списки.
+    """
+    ShoppingListItem.objects.remove_recipe(instance.user, instance.recipe_id)
@@ -0,0 +1,56 @@
+"""Снимки рецептов для отображения без соединения таблиц."""
+
+from django.db import transaction
+
+from .models import prefetch_recipe_relations
+
+SNAPSHOT_BATCH_SIZE = 500
+TAG_FIELDS = ('id', 'name', 'color', 'slug')
+AUTHOR_FIELDS = ('email', 'id', 'username', 'first_name', 'last_name')
+
+
+def build_snapshot(recipe):
+    """Не зависящая от пользователя часть ответа API: теги, автор
+    и ингредиенты рецепта."""
+    return {
+        'tags': [
+            {field: getattr(tag, field) for field in TAG_FIELDS}
+            for tag in recipe.tags.all()
+        ],
+        'author': {
+            field: getattr(recipe.author, field) for field in AUTHOR_FIELDS
+        },
+        'ingredients': [
+            {
+                'id': ingredient_amount.ingredient.id,
+                'name': ingredient_amount.ingredient.name,
+                'measurement_unit': (
+                    ingredient_amount.ingredient.measurement_unit
+                ),
+                'amount': ingredient_amount.amount,
+            }
+            for ingredient_amount in recipe.recipe.all()
+        ],
+    }
+
+
+def update_snapshots(recipes, batch_size=SNAPSHOT_BATCH_SIZE):
+    """Пересборка снимков рецептов пачками по возрастанию id.
+
+    Возвращает количество обновлённых рецептов.
+    """
+    updated = 0
+    last_id = 0
+    while True:
+        batch = list(recipes.filter(pk__gt=last_id).order_by('pk').only(
+            'id', 'author'
+        )[:batch_size])
+        if not batch:
+            return updated
+        prefetch_recipe_relations(batch)
+        for recipe in batch:
+            recipe.snapshot = build_snapshot(recipe)
+        with transaction.atomic():
+            recipes.model.objects.bulk_update(batch, ('snapshot',))
+        updated += len(batch)
+        last_id = batch[-1].pk
@@ -0,0 +1,443 @@
+"""Тесты приложения recipes."""
+
+import json
+import os
+import shutil
+import tempfile
+import threading
+from unittest import skipUnless
+from unittest.mock import patch
+
+from api.cache import version_key
+from api.tests import (APITestCase, ConcurrencyTestCase, create_recipe,
+                       create_user)
+from api.utils import shopping_list_etag
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from users.models import CustomUser
+
+from .models import (FavoriteRecipe, Ingredient, RankingCheckpoint, Recipe,
+                     RecipeRanking, ShoppingCart, ShoppingListItem, Tag)
+from .search import ingredient_search_index, search_recipes
+
+
+class ShoppingListTest(APITestCase):
+    """Инкрементальный список покупок совпадает с полным пересчётом."""
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        author = cls.users[1]
+        cls.recipes = [
+            create_recipe(
+                author, cls.ingredients[number:number + 5], cls.tags[:1],
+                name=f'Рецепт {number}',
+            )
+            for number in range(0, 20, 2)
+        ]
+
+    def assert_totals(self):
+        self.assertEqual(
+            set(ShoppingListItem.objects.values_list(
+                'user_id', 'ingredient_id', 'total_amount'
+            )),
+            set(ShoppingListItem.objects.computed()),
+        )
+
+    def add(self, client, recipe):
+        response = client.post(f'/api/recipes/{recipe.id}/shopping_cart/')
+        self.assertEqual(response.status_code, 201, response.data)
+
+    def test_add_and_remove(self):
+        for recipe in self.recipes[:6]:
+            self.add(self.client, recipe)
+            self.assert_totals()
+        for recipe in self.recipes[:6:2]:
+            response = self.client.delete(
+                f'/api/recipes/{recipe.id}/shopping_cart/'
+            )
+            self.assertEqual(response.status_code, 204)
+            self.assert_totals()
+
+    def test_bulk_and_clear(self):
+        self.add(self.client, self.recipes[0])
+        response = self.client.post('/api/recipes/shopping_cart/', {
+            'recipes': [recipe.id for recipe in self.recipes[:8]],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals()
+        response = self.client.delete('/api/recipes/shopping_cart/', {
+            'recipes': [recipe.id for recipe in self.recipes[4:]],
+        }, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assert_totals()
+        response = self.client.delete('/api/recipes/shopping_cart/clear/')
+        self.assertEqual(response.status_code, 204)
+        self.assertFalse(ShoppingListItem.objects.filter(user=self.user))
+        self.assert_totals()
+
+    def test_recipe_change_and_delete(self):
+        recipe = self.recipes[3]
+        self.add(self.client, recipe)
+        self.add(self.client, self.recipes[4])
+        viewer = self.client
+        for user in self.users[2:]:
+            viewer.force_authenticate(user)
+            self.add(viewer, recipe)
+        self.assert_totals()
+        viewer.force_authenticate(recipe.author)
+        response = viewer.patch(f'/api/recipes/{recipe.id}/', {
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 7}
+                for ingredient in self.ingredients[4:12]
+            ],
+            'tags': [self.tags[0].id],
+            'cooking_time': 5,
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assert_totals()
+        response = viewer.delete(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(response.status_code, 204)
+        self.assert_totals()
+
+    def test_admin_and_cascades(self):
+        """Список пересчитывается при изменениях в обход API."""
+        recipe, other = self.recipes[5], self.recipes[6]
+        viewer = self.client
+        for user in self.users[:3]:
+            viewer.force_authenticate(user)
+            self.add(viewer, recipe)
+            self.add(viewer, other)
+        admin = CustomUser.objects.create_superuser(
+            username='admin', email='admin@example.com',
+            password='password-123', first_name='Админ', last_name='Админ',
+        )
+        viewer.force_login(admin)
+        amounts = list(recipe.recipe.order_by('id'))
+        data = {
+            'author': recipe.author_id,
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [tag.id for tag in self.tags[:1]],
+            'recipe-TOTAL_FORMS': len(amounts) + 1,
+            'recipe-INITIAL_FORMS': len(amounts),
+            'recipe-0-DELETE': 'on',
+            'recipe-5-recipe': recipe.id,
+            'recipe-5-ingredient': self.ingredients[50].id,
+            'recipe-5-amount': 3,
+        }
+        for number, amount in enumerate(amounts):
+            data.update({
+                f'recipe-{number}-id': amount.id,
+                f'recipe-{number}-recipe': recipe.id,
+                f'recipe-{number}-ingredient': amount.ingredient_id,
+                f'recipe-{number}-amount': amount.amount + number,
+            })
+        response = viewer.post(
+            f'/admin/recipes/recipe/{recipe.id}/change/', data
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals()
+        cart = ShoppingCart.objects.get(user=self.users[1], recipe=other)
+        response = viewer.post(
+            f'/admin/recipes/shoppingcart/{cart.id}/delete/', {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals()
+        response = viewer.post(
+            f'/admin/recipes/recipe/{recipe.id}/delete/', {'post': 'yes'}
+        )
+        self.assertEqual(response.status_code, 302)
+        self.assert_totals()
+        self.users[2].delete()
+        self.assert_totals()
+        other.author.delete()
+        self.assert_totals()
+        self.assertFalse(ShoppingListItem.objects.exists())
+
+    def set_list(self, amounts):
+        ShoppingListItem.objects.filter(user=self.user).delete()
+        ShoppingListItem.objects.bulk_create(
+            ShoppingListItem(
+                user=self.user, ingredient=ingredient, total_amount=amount
+            )
+            for ingredient, amount in amounts
+        )
+        return shopping_list_etag(self.user, 'txt')
+
+    def test_etag(self):
+        """ETag различает списки с одинаковыми суммами и переименования."""
+        first, second, third, fourth = self.ingredients[:4]
+        etag = self.set_list(((first, 2), (fourth, 2)))
+        self.assertNotEqual(etag, self.set_list(((second, 2), (third, 2))))
+        etag = self.set_list(((first, 2),))
+        first.name = 'Переименованный ингредиент'
+        with self.captureOnCommitCallbacks(execute=True):
+            first.save()
+        self.assertNotEqual(etag, shopping_list_etag(self.user, 'txt'))
+        self.assertIsNone(self.set_list(()))
+
+    def test_pdf(self):
+        self.set_list((ingredient, 10) for ingredient in self.ingredients)
+        response = self.client.get(
+            '/api/recipes/download_shopping_cart/?format=pdf'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'application/pdf')
+        self.assertTrue(response.streaming)
+        content = b''.join(response.streaming_content)
+        self.assertTrue(content.startswith(b'%PDF'))
+        self.assertIn(b'DejaVuSans', content)
+        self.assertIn(b'/Count 2', content)
+
+
+class ShoppingListConcurrencyTest(ConcurrencyTestCase):
+    """Параллельные изменения одной строки списка покупок."""
+
+    def test_concurrent_create(self):
+        user = create_user(0)
+        ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {number}', measurement_unit='г')
+            for number in range(3)
+        )
+        delta = {ingredient.id: 2 for ingredient in ingredients}
+        self.run_threads(
+            lambda _: ShoppingListItem.objects.apply_delta((user.id,), delta)
+        )
+        self.assertEqual(
+            sorted(ShoppingListItem.objects.values_list(
+                'ingredient_id', 'total_amount'
+            )),
+            [(ingredient.id, 2 * self.THREADS) for ingredient in ingredients],
+        )
+        self.run_threads(
+            lambda _: ShoppingListItem.objects.apply_delta(
+                (user.id,), {ingredients[0].id: -2}
+            )
+        )
+        self.assertFalse(
+            ShoppingListItem.objects.filter(ingredient=ingredients[0])
+        )
+
+
+class IngredientSearchIndexTest(TestCase):
+    """Индекс поиска ингредиентов следует версии в общем кэше."""
+
+    def setUp(self):
+        cache.clear()
+        Ingredient.objects.create(name='Морковь', measurement_unit='г')
+
+    def search(self):
+        return ingredient_search_index.search('морк', 10)
+
+    def test_rebuild_on_version_change(self):
+        self.assertEqual(len(self.search()), 1)
+        Ingredient.objects.bulk_create(
+            [Ingredient(name='Морковь по-корейски', measurement_unit='г')]
+        )
+        self.assertEqual(len(self.search()), 1)
+        cache.incr(version_key('ingredients'))
+        self.assertEqual(len(self.search()), 2)
+
+    def test_rebuild_on_local_signal(self):
+        self.assertEqual(len(self.search()), 1)
+        Ingredient.objects.create(name='Морковь мытая', measurement_unit='г')
+        self.assertEqual(len(self.search()), 2)
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Поиск по вектору PostgreSQL')
+class RecipeAdminSearchTest(APITestCase):
+    """Правка рецепта в админке обновляет поисковый вектор."""
+
+    def test_save_related(self):
+        recipe = create_recipe(self.users[1], self.ingredients[:1], self.tags)
+        ingredient = Ingredient.objects.create(
+            name='Щавель', measurement_unit='г'
+        )
+        admin = CustomUser.objects.create_superuser(
+            username='admin', email='admin@example.com',
+            password='password-123', first_name='Админ', last_name='Админ',
+        )
+        self.client.force_login(admin)
+        amount = recipe.recipe.get()
+        response = self.client.post(
+            f'/admin/recipes/recipe/{recipe.id}/change/',
+            {
+                'author': recipe.author_id,
+                'name': 'Зелёный борщ',
+                'text': recipe.text,
+                'cooking_time': recipe.cooking_time,
+                'tags': [tag.id for tag in self.tags],
+                'recipe-TOTAL_FORMS': 2,
+                'recipe-INITIAL_FORMS': 1,
+                'recipe-0-id': amount.id,
+                'recipe-0-recipe': recipe.id,
+                'recipe-0-ingredient': amount.ingredient_id,
+                'recipe-0-amount': amount.amount,
+                'recipe-1-recipe': recipe.id,
+                'recipe-1-ingredient': ingredient.id,
+                'recipe-1-amount': 100,
+            },
+        )
+        self.assertEqual(response.status_code, 302)
+        for query in ('борщ', 'щавель'):
+            with self.subTest(query=query):
+                self.assertQuerysetEqual(
+                    search_recipes(Recipe.objects.all(), query), [recipe]
+                )
+
+
+class ReferenceImportTest(TestCase):
+    """Загрузка справочников из файлов."""
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as output:
+            output.write(content)
+        return path
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def test_json_array_in_chunks(self):
+        rows = [
+            {'name': f'соль {number}', 'measurement_unit': 'г'}
+            for number in range(30)
+        ]
+        path = self.write(
+            'ingredients.json', json.dumps(rows, ensure_ascii=False, indent=2)
+        )
+        with patch('recipes.importers.JSON_CHUNK_SIZE', 7):
+            call_command('import_ingredients', '--path', path, stdout=None)
+        self.assertEqual(
+            sorted(Ingredient.objects.values_list('name', flat=True)),
+            sorted(row['name'] for row in rows),
+        )
+
+    def test_tag_conflicts(self):
+        """Теги с занятыми названием или цветом считаются конфликтами."""
+        Tag.objects.create(name='Завтрак', color='#E26C2D', slug='breakfast')
+        path = self.write('tags.csv', '\n'.join((
+            'name,color,slug',
+            'Завтрак,#49B64E,morning',
+            'Обед,#E26C2D,lunch',
+            'Ужин,#8775D2,dinner',
+            'Ужин,#000000,supper',
+            'Утро,#E26C2D,breakfast',
+        )))
+        for copy in (False, True):
+            with self.subTest(copy=copy), transaction.atomic():
+                args = ['import_tags', '--path', path]
+                if copy:
+                    args.append('--copy')
+                self.assertIn(
+                    'добавлено 1, обновлено 1, пропущено 0, конфликтов 3',
+                    call_command(*args, stdout=None),
+                )
+                self.assertEqual(
+                    dict(Tag.objects.values_list('slug', 'name')),
+                    {'breakfast': 'Утро', 'dinner': 'Ужин'},
+                )
+                transaction.set_rollback(True)
+
+
+class RankingOrderingTest(APITestCase):
+    """Сортировка по рейтингу идёт по индексу рейтингов."""
+
+    def test_popular(self):
+        recipes = [
+            create_recipe(self.users[1], (), (), name=f'Рецепт {number}')
+            for number in range(4)
+        ]
+        for popularity, recipe in zip((1, 5, 0, 5), recipes):
+            RecipeRanking.objects.filter(recipe=recipe).update(
+                popularity=popularity
+            )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get('/api/recipes/?ordering=popular')
+        self.assertEqual(
+            [recipe['id'] for recipe in response.data['results']],
+            [recipe.id for recipe in (
+                recipes[3], recipes[1], recipes[0], recipes[2]
+            )],
+        )
+        self.assertFalse(any(
+            'LEFT OUTER JOIN "recipes_reciperanking"' in query['sql']
+            for query in queries
+        ))
+
+
+class RefreshRankingsTest(APITestCase):
+    """Инкрементальный пересчёт рейтингов."""
+
+    def test_rows_added_during_refresh(self):
+        """Избранное, добавленное во время пересчёта, учитывается позже."""
+        recipe = create_recipe(self.users[1], (), ())
+        FavoriteRecipe.objects.create(user=self.user, favorite_recipe=recipe)
+        bulk_update = RecipeRanking.objects.bulk_update
+
+        def add_during_refresh(*args, **kwargs):
+            FavoriteRecipe.objects.create(
+                user=self.users[2], favorite_recipe=recipe
+            )
+            return bulk_update(*args, **kwargs)
+
+        with patch.object(
+            RecipeRanking.objects, 'bulk_update', add_during_refresh
+        ):
+            call_command('refresh_rankings')
+        call_command('refresh_rankings')
+        self.assertAlmostEqual(
+            RecipeRanking.objects.get(recipe=recipe).trending_score, 2,
+            places=3,
+        )
+
+
+class LateCommitRankingsTest(ConcurrencyTestCase):
+    """Строка с меньшим id, зафиксированная позже, учитывается."""
+
+    def test_late_commit(self):
+        recipe = create_recipe(create_user(0), (), ())
+        users = [create_user(number) for number in range(1, 4)]
+        FavoriteRecipe.objects.create(user=users[0], favorite_recipe=recipe)
+        call_command('refresh_rankings')
+        inserted = threading.Event()
+        refreshed = threading.Event()
+
+        def slow_favorite():
+            with transaction.atomic():
+                FavoriteRecipe.objects.create(
+                    user=users[1], favorite_recipe=recipe
+                )
+                inserted.set()
+                refreshed.wait(10)
+
+        thread = threading.Thread(target=self.in_thread(slow_favorite))
+        thread.start()
+        inserted.wait(10)
+        FavoriteRecipe.objects.create(user=users[2], favorite_recipe=recipe)
+        call_command('refresh_rankings')
+        refreshed.set()
+        thread.join()
+        call_command('refresh_rankings')
+        self.assertAlmostEqual(
+            RecipeRanking.objects.get(recipe=recipe).trending_score, 3,
+            places=3,
+        )
+        self.assertEqual(
+            RankingCheckpoint.objects.first().pending_favorite_ids, []
+        )
+
+    @staticmethod
+    def in_thread(function):
+        def run():
+            try:
+                function()
+            finally:
+                connection.close()
+        return run
@@ -7,7 +7,8 @@ from .models import CustomUser, Subscribe
 class UserAdmin(admin.ModelAdmin):
     """Отображение пользователей в админке."""
     list_display = (
-        'id', 'email', 'username', 'first_name', 'last_name'
+        'id', 'email', 'username', 'first_name', 'last_name',
+        'recipes_count', 'followers_count'
     )
     search_fields = ('username', 'first_name', 'last_name')
     list_filter = ('first_name', 'email')
@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 02:26
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+
+
+def fill_counters(apps, schema_editor):
+    CustomUser = apps.get_model('users', 'CustomUser')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscribe = apps.get_model('users', 'Subscribe')
+    CustomUser.objects.update(
+        recipes_count=Coalesce(models.Subquery(
+            Recipe.objects.filter(
+                author=models.OuterRef('pk')
+            ).order_by().values('author').annotate(
+                count=models.Count('id')
+            ).values('count')
+        ), 0),
+        followers_count=Coalesce(models.Subquery(
+            Subscribe.objects.filter(
+                author=models.OuterRef('pk')
+            ).order_by().values('author').annotate(
+                count=models.Count('id')
+            ).values('count')
+        ), 0),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0002_initial'),
+        ('users', '0002_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='customuser',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='customuser',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
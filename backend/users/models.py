@@ -23,6 +23,16 @@ class CustomUser(AbstractUser):
         max_length=USERS_CHAR_FIELD_LENGTH,
         verbose_name='Фамилия',
     )
+    recipes_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Рецептов',
+    )
+    followers_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Подписчиков',
+    )
 
     class Meta:
         ordering = ('username',)
@@ -60,6 +70,11 @@ class Subscribe(models.Model):
                 fields=('user', 'author'),
                 name='unique_subscription')
         ]
+        indexes = [
+            models.Index(
+                fields=('user', '-id'),
+                name='subscribe_user_id_idx')
+        ]
 
     def __str__(self):
         return f'{self.user} - {self.author}'